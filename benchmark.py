@@ -13,6 +13,7 @@ RESULT_CSV  = "benchmark_results.csv"
 
 REPETICOES_POR_NPROC = 1
 PROCESSOS_TESTADOS = [1, 2, 3, 4]
+BACKENDS_TESTADOS = ["python", "sql"]   # --backend do Pipeline.py
 TIMEMOCK = 60
 mock_processes = {}
 
@@ -40,45 +41,46 @@ def encerrar_mocks():
             proc.kill()
     mock_processes.clear()
 
-def executar_pipeline(nproc: int) -> float:
-    print(f" Executando pipeline com {nproc} processo(s)...")
+def executar_pipeline(nproc: int, backend: str = "python") -> float:
+    print(f" Executando pipeline com {nproc} processo(s), backend {backend}...")
     start = time.time()
     try:
-        subprocess.run(["python", PIPELINE, str(nproc)], check=True)
+        subprocess.run(["python", PIPELINE, str(nproc), f"--backend={backend}"], check=True)
     except subprocess.CalledProcessError as e:
-        print(f" Falha ao executar pipeline com {nproc} processos.")
+        print(f" Falha ao executar pipeline com {nproc} processos (backend {backend}).")
         return -1
     return round(time.time() - start, 2)
 
 def salvar_resultados(resultados):
     with open(RESULT_CSV, "w", newline="", encoding="utf-8") as f:
         writer = csv.writer(f)
-        writer.writerow(["processos", "execucao", "tempo_segundos"])
+        writer.writerow(["processos", "execucao", "tempo_segundos", "backend"])
         writer.writerows(resultados)
     print(f"\n Resultados salvos em {RESULT_CSV}")
 
 def main():
     resultados = []
 
-    for n in PROCESSOS_TESTADOS:
-        for execucao in range(1, REPETICOES_POR_NPROC + 1):
-            print(f"\n Execução {execucao} com {n} processo(s)")
-            executar_reset()
-            iniciar_mock("mock_stream", MOCK_STREAM)
-            iniciar_mock("mock_db", MOCK_DB)
-            print(f" Aguardando {TIMEMOCK} segundos para geração de dados...")
-            time.sleep(TIMEMOCK)
-            tempo = executar_pipeline(n)
-            encerrar_mocks()
-            if tempo > 0:
-                resultados.append([n, execucao, tempo])
-            time.sleep(1)
+    for backend in BACKENDS_TESTADOS:
+        for n in PROCESSOS_TESTADOS:
+            for execucao in range(1, REPETICOES_POR_NPROC + 1):
+                print(f"\n Execução {execucao} com {n} processo(s), backend {backend}")
+                executar_reset()
+                iniciar_mock("mock_stream", MOCK_STREAM)
+                iniciar_mock("mock_db", MOCK_DB)
+                print(f" Aguardando {TIMEMOCK} segundos para geração de dados...")
+                time.sleep(TIMEMOCK)
+                tempo = executar_pipeline(n, backend)
+                encerrar_mocks()
+                if tempo > 0:
+                    resultados.append([n, execucao, tempo, backend])
+                time.sleep(1)
 
     salvar_resultados(resultados)
 
     print("\n Resumo final:")
     for linha in resultados:
-        print(f" - {linha[1]}ª execução | {linha[0]} processo(s) → {linha[2]}s")
+        print(f" - {linha[1]}ª execução | {linha[0]} processo(s) | {linha[3]} → {linha[2]}s")
 
 if __name__ == "__main__":
     main()
@@ -283,7 +283,9 @@ with st.sidebar:
         # 1) carrega CSV sem cabeçalho
         df_runs = pd.read_csv(
             runs_path,
-            names=["start_time", "stage", "processes", "duration_sec"],
+            names=["start_time", "stage", "processes", "duration_sec",
+                   "parent_rss_mb", "parent_tracemalloc_mb",
+                   "workers", "worker_rss_mb", "worker_tracemalloc_mb"],
             parse_dates=["start_time"],
             infer_datetime_format=True,
         )
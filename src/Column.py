@@ -0,0 +1,645 @@
+import struct
+import sys
+from array import array
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from itertools import accumulate, islice
+from pickle import PickleBuffer
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Supported physical types. Numeric columns live in `array` buffers, strings in a
+# single UTF-8 byte buffer indexed by an offsets array, everything else (None,
+# bools, mixed values) falls back to a plain Python list. `category` columns
+# store one small integer code per row plus a dictionary of the distinct values;
+# they are never inferred, only declared (see `is_low_cardinality`).
+# `timestamp` columns are never inferred either: they hold int64 microseconds
+# since the epoch (see `to_epoch`) and read back as naive datetimes; NULL is
+# stored as `NULL_EPOCH` and reads back as None.
+INT64 = 'int64'
+FLOAT64 = 'float64'
+STRING = 'string'
+OBJECT = 'object'
+CATEGORY = 'category'
+TIMESTAMP = 'timestamp'
+DTYPES = (INT64, FLOAT64, STRING, OBJECT, CATEGORY, TIMESTAMP)
+
+# Default cardinality limit for automatically dictionary-encoding a column.
+MAX_CATEGORIES = 32
+
+_TYPECODES = {INT64: 'q', FLOAT64: 'd', TIMESTAMP: 'q'}
+_COERCE = {INT64: int, FLOAT64: float, STRING: str}
+_PY_TYPES = {INT64: int, FLOAT64: float, STRING: str}
+_POINTER_SIZE = struct.calcsize('P')
+_ENCODING = 'utf-8'
+_ERRORS = 'surrogatepass'
+
+
+def _array_from_buffer(typecode: str, buffer: Any) -> array:
+    new = array(typecode)
+    new.frombytes(memoryview(buffer).cast('B'))
+    return new
+
+
+def _code_typecode(num_categories: int) -> str:
+    return 'h' if num_categories <= 1 << 15 else 'i'
+
+
+# Timestamps are local wall-clock time: microseconds since 1970-01-01 00:00,
+# the way a naive datetime reads. Bucketing by hour or day is then plain
+# integer division, and naive values round-trip exactly.
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_ORDINAL = _EPOCH.toordinal()
+_MICROSECOND = timedelta(microseconds=1)
+HOUR_US = 3_600_000_000
+DAY_US = 24 * HOUR_US
+# Epoch of a NULL timestamp: the smallest int64, far outside any real date.
+NULL_EPOCH = -(1 << 63)
+
+
+def to_epoch(value: Any) -> int:
+    """
+    Converts a timestamp to microseconds since the epoch (local wall-clock time).
+
+    Args:
+        value (Any): A `datetime` (aware ones are converted to local time first,
+            as `datetime.astimezone` does), a `date` (its midnight), an ISO 8601
+            string, an int, taken as already converted, or None (NULL).
+
+    Returns:
+        int: Microseconds since 1970-01-01 00:00, or `NULL_EPOCH` for None.
+
+    Raises:
+        ValueError: If a string is not a valid ISO 8601 timestamp.
+        TypeError: If `value` is of any other type.
+    """
+    if type(value) is int:
+        return value
+    if type(value) is str:
+        return _parse_epoch(value)
+    if value is None:
+        return NULL_EPOCH
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone().replace(tzinfo=None)
+        return (value - _EPOCH) // _MICROSECOND
+    if isinstance(value, date):
+        return (value.toordinal() - _EPOCH_ORDINAL) * DAY_US
+    raise TypeError(f"Cannot convert {type(value).__name__} to a timestamp.")
+
+
+@lru_cache(maxsize=1 << 16)
+def _parse_epoch(text: str) -> int:
+    # Log timestamps repeat at second granularity, and consecutive chunks
+    # overlap, so parsed strings are kept across batches.
+    return to_epoch(datetime.fromisoformat(text))
+
+
+def from_epoch(us: int) -> Optional[datetime]:
+    """
+    Converts microseconds since the epoch back to a naive `datetime` (None for `NULL_EPOCH`).
+    """
+    if us == NULL_EPOCH:
+        return None
+    return _EPOCH + timedelta(microseconds=us)
+
+
+def is_low_cardinality(values: Iterable[Any], max_categories: int = MAX_CATEGORIES) -> bool:
+    """
+    Tells whether `values` are worth storing as a `category` column: at most
+    `max_categories` distinct strings, each repeated at least twice on average.
+
+    Args:
+        values (Iterable[Any]): The values to inspect.
+        max_categories (int): The largest dictionary to accept. Defaults to `MAX_CATEGORIES`.
+
+    Returns:
+        bool: True if the values should be dictionary-encoded.
+    """
+    values = values if isinstance(values, (list, tuple)) else list(values)
+    distinct = set(values)
+    return (0 < len(distinct) <= max_categories and 2 * len(distinct) <= len(values)
+            and all(type(v) is str for v in distinct))
+
+
+def infer_dtype(values: List[Any]) -> str:
+    """
+    Infers the narrowest dtype able to hold every value in `values`.
+
+    Args:
+        values (List[Any]): The values to inspect.
+
+    Returns:
+        str: One of `int64`, `float64`, `string` or `object`.
+    """
+    kinds = set(map(type, values))
+    if kinds == {int}:
+        return INT64
+    if kinds == {float} or kinds == {int, float}:
+        return FLOAT64
+    if kinds == {str}:
+        return STRING
+    return OBJECT
+
+
+def common_dtype(left: Optional[str], right: Optional[str]) -> Optional[str]:
+    """
+    Returns the dtype both `left` and `right` can be promoted to.
+
+    Args:
+        left (Optional[str]): The first dtype (None means "not decided yet").
+        right (Optional[str]): The second dtype.
+
+    Returns:
+        Optional[str]: The promoted dtype.
+    """
+    if left is None or left == right:
+        return right
+    if right is None:
+        return left
+    if {left, right} == {INT64, FLOAT64}:
+        return FLOAT64
+    return OBJECT
+
+
+class Column:
+    """
+    A typed, append-only column of values.
+
+    A column either owns its buffers or borrows them (read-only `memoryview`s
+    over another column's buffers, see `slice`). Buffers that may be seen by
+    another column are copied before the first write (copy-on-write).
+
+    Attributes:
+        _dtype (Optional[str]): Physical type of the column. None while the column
+            is empty and no dtype was declared; inferred from the first batch.
+        _declared (bool): Whether the dtype was declared by the caller. Declared
+            columns coerce incoming values instead of promoting their dtype.
+        _store (array | bytearray | memoryview | List[Any]): The value buffer
+            (the codes, for `category` columns).
+        _offsets (Optional[array | memoryview]): For `string` columns, `len(self) + 1`
+            byte offsets into `_store`; None for every other dtype.
+        _shared (bool): Whether the buffers may be referenced by another column.
+        _categories (Optional[List[Any]]): For `category` columns, the distinct
+            values in order of first appearance (code `i` is `_categories[i]`).
+            Each column owns its dictionary; None for every other dtype.
+        _lookup (Optional[Dict[Any, int]]): Value to code, built on first use.
+    """
+
+    __slots__ = ('_dtype', '_declared', '_store', '_offsets', '_shared', '_categories', '_lookup')
+
+    def __init__(self, values: Optional[Iterable[Any]] = None, dtype: Optional[str] = None) -> None:
+        """
+        Initializes a column, optionally filling it with `values`.
+
+        Args:
+            values (Optional[Iterable[Any]]): Initial values. Defaults to None.
+            dtype (Optional[str]): Declared dtype. If None, the dtype is inferred
+                from the data. Defaults to None.
+
+        Raises:
+            ValueError: If `dtype` is not a supported dtype.
+        """
+        if dtype is not None and dtype not in DTYPES:
+            raise ValueError(f"Unsupported dtype '{dtype}'. Expected one of {DTYPES}.")
+        self._declared = dtype is not None
+        self._dtype = None
+        self._store = []
+        self._offsets = None
+        self._shared = False
+        self._categories = None
+        self._lookup = None
+        if dtype is not None:
+            self._reset(dtype)
+        if values is not None:
+            self.extend(values)
+
+    def _reset(self, dtype: str) -> None:
+        self._dtype = dtype
+        self._offsets = None
+        self._shared = False
+        self._categories = None
+        self._lookup = None
+        if dtype == CATEGORY:
+            self._store = array(_code_typecode(0))
+            self._categories = []
+        elif dtype in _TYPECODES:
+            self._store = array(_TYPECODES[dtype])
+        elif dtype == STRING:
+            self._store = bytearray()
+            self._offsets = array('q', [0])
+        else:
+            self._store = []
+
+    @property
+    def dtype(self) -> Optional[str]:
+        """
+        Returns the physical dtype of the column (None if still undecided).
+        """
+        return self._dtype
+
+    @property
+    def categories(self) -> List[Any]:
+        """
+        Returns the dictionary of a `category` column: code `i` stands for `categories[i]`.
+
+        Raises:
+            TypeError: If the column is not a `category` column.
+        """
+        if self._dtype != CATEGORY:
+            raise TypeError(f"Column of dtype '{self._dtype}' has no categories.")
+        return self._categories
+
+    @property
+    def codes(self) -> array | memoryview:
+        """
+        Returns the per-row codes of a `category` column (read-only use only).
+
+        Raises:
+            TypeError: If the column is not a `category` column.
+        """
+        if self._dtype != CATEGORY:
+            raise TypeError(f"Column of dtype '{self._dtype}' has no codes.")
+        return self._store
+
+    @property
+    def epochs(self) -> array | memoryview:
+        """
+        Returns the per-row epoch microseconds of a `timestamp` column (read-only use only).
+
+        Raises:
+            TypeError: If the column is not a `timestamp` column.
+        """
+        if self._dtype != TIMESTAMP:
+            raise TypeError(f"Column of dtype '{self._dtype}' has no epochs.")
+        return self._store
+
+    def code_of(self, value: Any) -> int:
+        """
+        Returns the code of `value` in a `category` column, or -1 if it is not a category.
+        """
+        return self._code_lookup().get(value, -1)
+
+    def _code_lookup(self) -> Dict[Any, int]:
+        if self._lookup is None:
+            self._lookup = {v: i for i, v in enumerate(self.categories)}
+        return self._lookup
+
+    def _typecode(self) -> Optional[str]:
+        if self._dtype == CATEGORY:
+            return _code_typecode(len(self._categories))
+        return _TYPECODES.get(self._dtype)
+
+    def __len__(self) -> int:
+        if self._dtype == STRING:
+            return len(self._offsets) - 1
+        return len(self._store)
+
+    def __repr__(self) -> str:
+        preview = self[:5]
+        more = ', ...' if len(self) > 5 else ''
+        return f"Column(dtype={self._dtype}, len={len(self)}, [{', '.join(map(repr, preview))}{more}])"
+
+    def __getitem__(self, index: int | slice) -> Any:
+        """
+        Returns a single value, or a list of values for a slice.
+
+        Raises:
+            IndexError: If `index` is out of range.
+        """
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if self._dtype == CATEGORY:
+            return self._categories[self._store[index]]
+        if self._dtype == TIMESTAMP:
+            return from_epoch(self._store[index])
+        if self._dtype != STRING:
+            return self._store[index]
+        n = len(self)
+        if index < 0:
+            index += n
+        if index < 0 or index >= n:
+            raise IndexError('Column index out of range.')
+        return str(self._store[self._offsets[index]:self._offsets[index + 1]], _ENCODING, _ERRORS)
+
+    def __iter__(self) -> Iterator[Any]:
+        if self._dtype == CATEGORY:
+            return map(self._categories.__getitem__, self._store)
+        if self._dtype == TIMESTAMP:
+            return map(from_epoch, self._store)
+        if self._dtype != STRING:
+            return iter(self._store)
+        return self._iter_strings()
+
+    def _iter_strings(self) -> Iterator[str]:
+        store, offsets = self._store, self._offsets
+        for i in range(len(offsets) - 1):
+            yield str(store[offsets[i]:offsets[i + 1]], _ENCODING, _ERRORS)
+
+    def to_list(self) -> List[Any]:
+        """
+        Returns the column values as a new Python list.
+        """
+        return list(self)
+
+    def copy(self) -> 'Column':
+        """
+        Returns an independent copy of the column.
+        """
+        return self._with_buffers(*self._owned_buffers())
+
+    def slice(self, start: int, stop: int) -> 'Column':
+        """
+        Returns a zero-copy view over the rows `[start, stop)`.
+
+        The view shares this column's buffers. Whichever of the two is written
+        to first copies its data, so neither ever observes the other's writes.
+        `object` columns have no flat buffer and are sliced by copying references.
+
+        Args:
+            start (int): First row of the view (Python slice semantics).
+            stop (int): Row after the last row of the view.
+
+        Returns:
+            Column: A column of `max(0, stop - start)` rows.
+        """
+        start, stop, _ = slice(start, stop).indices(len(self))
+        stop = max(start, stop)
+        if self._dtype == STRING:
+            view = self._with_buffers(memoryview(self._store), memoryview(self._offsets)[start:stop + 1])
+        elif self._typecode() is not None:
+            view = self._with_buffers(memoryview(self._store)[start:stop])
+        else:
+            return self._with_buffers(self._store[start:stop])
+        self._shared = view._shared = True
+        return view
+
+    def _owned_buffers(self) -> Tuple[Any, Optional[array]]:
+        """
+        Returns private copies of the buffers, trimmed to the rows of this column.
+        """
+        store = self._store
+        if self._dtype == STRING:
+            offsets = self._offsets
+            base = offsets[0]
+            new_store = bytearray(store[base:offsets[-1]])
+            if base == 0:
+                return new_store, _array_from_buffer('q', offsets)
+            return new_store, array('q', [o - base for o in offsets])
+        typecode = self._typecode()
+        if typecode is not None:
+            return _array_from_buffer(typecode, store), None
+        return list(store), None
+
+    def memory_usage(self, deep: bool = False) -> int:
+        """
+        Returns the bytes held by the column's rows.
+
+        Views only count their own rows, not the buffer they share. The dictionary
+        of a `category` column and the values of an `object` column are Python
+        objects; they are only counted when `deep` is True (an `object` column
+        otherwise counts one pointer per row).
+
+        Args:
+            deep (bool): Also count the Python objects referenced by the column.
+                Defaults to False.
+
+        Returns:
+            int: Estimated size in bytes.
+        """
+        store, offsets = self._contiguous_buffers()
+        if self._dtype == STRING:
+            return memoryview(store).nbytes + memoryview(offsets).nbytes
+        if self._typecode() is not None:
+            nbytes = memoryview(store).nbytes
+            if deep and self._dtype == CATEGORY:
+                nbytes += sys.getsizeof(self._categories) + sum(map(sys.getsizeof, self._categories))
+            return nbytes
+        nbytes = _POINTER_SIZE * len(store)
+        if deep:
+            nbytes += sum(map(sys.getsizeof, store))
+        return nbytes
+
+    def _prepare_write(self) -> None:
+        if self._shared:
+            self._store, self._offsets = self._owned_buffers()
+            self._shared = False
+
+    def _contiguous_buffers(self) -> Tuple[Any, Any]:
+        """
+        Returns the buffers trimmed to the rows of this column, copying only
+        the offsets of a string view that does not start at byte 0.
+        """
+        store, offsets = self._store, self._offsets
+        if self._dtype == STRING:
+            base, end = offsets[0], offsets[-1]
+            if base or end != len(store):
+                store = memoryview(store)[base:end]
+            if base:
+                offsets = array('q', [o - base for o in offsets])
+        return store, offsets
+
+    def __reduce_ex__(self, protocol: int) -> Tuple[Any, ...]:
+        """
+        Pickles the column as raw contiguous buffers (never value by value).
+
+        With protocol 5 the buffers are wrapped in `PickleBuffer`, so a pickler
+        with a `buffer_callback` can ship them out-of-band without copying them
+        into the stream. Views only serialize their own rows.
+        """
+        store, offsets = self._contiguous_buffers()
+        if self._dtype == STRING or self._typecode() is not None:
+            if protocol >= 5:
+                store = PickleBuffer(store)
+                offsets = PickleBuffer(offsets) if offsets is not None else None
+            else:
+                store = memoryview(store).tobytes()
+                offsets = memoryview(offsets).tobytes() if offsets is not None else None
+        return (_rebuild_column, (self._dtype, self._declared, store, offsets, self._categories))
+
+    def take(self, indices: Iterable[int]) -> 'Column':
+        """
+        Gathers the values at `indices` into a new column of the same dtype.
+
+        String values are copied as raw bytes, without decoding them, and
+        `category` columns gather their codes.
+
+        Args:
+            indices (Iterable[int]): Row positions to gather, in output order.
+
+        Returns:
+            Column: A new column with `len(indices)` values.
+        """
+        store = self._store
+        if self._dtype == STRING:
+            offsets = self._offsets
+            pieces = [store[offsets[i]:offsets[i + 1]] for i in indices]
+            return self._with_buffers(bytearray(b''.join(pieces)),
+                                      array('q', accumulate(map(len, pieces), initial=0)))
+        typecode = self._typecode()
+        if typecode is not None:
+            return self._with_buffers(array(typecode, [store[i] for i in indices]))
+        return self._with_buffers([store[i] for i in indices])
+
+    def _with_buffers(self, store: Any, offsets: Optional[array] = None) -> 'Column':
+        new = Column.__new__(Column)
+        new._dtype = self._dtype
+        new._declared = self._declared
+        new._store = store
+        new._offsets = offsets
+        new._shared = False
+        new._categories = list(self._categories) if self._categories is not None else None
+        new._lookup = None
+        return new
+
+    def append(self, value: Any) -> None:
+        """
+        Appends a single value, promoting (or coercing, if declared) the dtype.
+        """
+        if self._shared:
+            self._prepare_write()
+        dtype = self._dtype
+        if dtype == OBJECT:
+            self._store.append(value)
+            return
+        if dtype == CATEGORY:
+            code = self._code_lookup().get(value)
+            if code is not None:
+                self._store.append(code)
+                return
+        if type(value) is _PY_TYPES.get(dtype):
+            if dtype == STRING:
+                self._store += value.encode(_ENCODING, _ERRORS)
+                self._offsets.append(len(self._store))
+                return
+            try:
+                self._store.append(value)
+                return
+            except OverflowError:
+                pass
+        self.extend([value])
+
+    def extend(self, values: Iterable[Any]) -> None:
+        """
+        Appends a batch of values. Type validation happens once for the batch.
+
+        Args:
+            values (Iterable[Any]): Values to append. Another `Column` with the
+                same dtype is appended buffer-to-buffer; an empty column without
+                a declared dtype adopts the dtype of the column appended to it.
+
+        Raises:
+            ValueError | TypeError: If the column has a declared dtype and a value
+                cannot be coerced to it (None never is, for `int64`, `float64` and
+                `string`), or, for `category`, is not hashable.
+        """
+        self._prepare_write()
+        if isinstance(values, Column):
+            if self._dtype is None and values._dtype is not None:
+                self._reset(values._dtype)
+            if values._dtype is not None and values._dtype == self._dtype:
+                self._extend_column(values if values is not self else values.copy())
+                return
+            values = values.to_list()
+        elif not isinstance(values, list):
+            values = list(values)
+        if not values:
+            return
+
+        if self._declared or self._dtype in (CATEGORY, TIMESTAMP):
+            coerce = _COERCE.get(self._dtype)
+            if coerce is not None:
+                # str(None) would store the text 'None'; NULLs need an `object` column.
+                if None in values:
+                    raise TypeError(f"Column of dtype '{self._dtype}' cannot hold None; "
+                                    f"declare it as '{OBJECT}' to keep NULLs.")
+                values = [v if type(v) is coerce else coerce(v) for v in values]
+            self._extend_values(values)
+            return
+
+        target = common_dtype(self._dtype, infer_dtype(values))
+        if target == INT64:
+            try:
+                array('q', values)
+            except OverflowError:
+                target = OBJECT
+        if target != self._dtype:
+            self._convert(target)
+        self._extend_values(values)
+
+    def _convert(self, dtype: str) -> None:
+        existing = self.to_list() if self._dtype is not None else []
+        self._reset(dtype)
+        if existing:
+            self._extend_values(existing)
+
+    def _extend_values(self, values: List[Any]) -> None:
+        if self._dtype == STRING:
+            encoded = [v.encode(_ENCODING, _ERRORS) for v in values]
+            self._store += b''.join(encoded)
+            self._offsets.extend(islice(accumulate(map(len, encoded), initial=self._offsets[-1]), 1, None))
+        elif self._dtype == CATEGORY:
+            lookup = self._add_categories(values)
+            self._store.extend(map(lookup.__getitem__, values))
+        elif self._dtype == TIMESTAMP:
+            # Convert each distinct value once.
+            epochs = {v: to_epoch(v) for v in set(values)}
+            self._store.extend(map(epochs.__getitem__, values))
+        else:
+            self._store.extend(values)
+
+    def _add_categories(self, values: Iterable[Any]) -> Dict[Any, int]:
+        """
+        Adds the unseen `values` to the dictionary, widening the codes if needed.
+        """
+        lookup = self._code_lookup()
+        categories = self._categories
+        for value in dict.fromkeys(values):
+            if value not in lookup:
+                lookup[value] = len(categories)
+                categories.append(value)
+        typecode = _code_typecode(len(categories))
+        if self._store.typecode != typecode:
+            self._store = array(typecode, self._store)
+        return lookup
+
+    def _extend_column(self, other: 'Column') -> None:
+        if self._dtype == CATEGORY:
+            lookup = self._add_categories(other._categories)
+            remap = [lookup[v] for v in other._categories]
+            if remap == list(range(len(remap))) and self._store.typecode == memoryview(other._store).format:
+                self._store.frombytes(memoryview(other._store).cast('B'))
+            else:
+                self._store.extend(map(remap.__getitem__, other._store))
+        elif self._dtype == STRING:
+            other_offsets = other._offsets
+            shift = self._offsets[-1] - other_offsets[0]
+            self._store += other._store[other_offsets[0]:other_offsets[-1]]
+            self._offsets.extend([o + shift for o in other_offsets[1:]])
+        elif self._dtype in _TYPECODES:
+            self._store.frombytes(memoryview(other._store).cast('B'))
+        else:
+            self._store.extend(other._store)
+
+
+def _rebuild_column(dtype: Optional[str], declared: bool, store: Any, offsets: Any,
+                    categories: Optional[List[Any]]) -> Column:
+    """
+    Unpickles a column. Buffers are wrapped in `memoryview`s instead of being
+    copied; the column is marked shared, so the first write copies them.
+    """
+    column = Column.__new__(Column)
+    column._dtype = dtype
+    column._declared = declared
+    column._categories = categories
+    column._lookup = None
+    column._offsets = None
+    column._shared = False
+    column._store = store
+    if dtype == STRING:
+        column._store = memoryview(store).cast('B')
+        column._offsets = memoryview(offsets).cast('B').cast('q')
+        column._shared = True
+    elif column._typecode() is not None:
+        column._store = memoryview(store).cast('B').cast(column._typecode())
+        column._shared = True
+    return column
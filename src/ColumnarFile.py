@@ -0,0 +1,284 @@
+import io
+import json
+import mmap
+import os
+import pickle
+import struct
+import sys
+import tempfile
+from array import array
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+from Column import Column, CATEGORY, OBJECT, STRING, _TYPECODES, _code_typecode, _rebuild_column
+from DataFrame import DataFrame
+
+# File layout:
+#   magic (8 bytes) | schema length (u32) | JSON schema header | padding
+#   the column buffers, each on an 8-byte boundary
+#   optional footer: JSON index | index length (u64) | footer magic (8 bytes)
+#
+# A string column has two buffers (offsets, then UTF-8 bytes) and an object
+# column one pickled list prefixed with its length. Every other column has one
+# raw buffer (values, codes or epochs). Without the footer, buffer positions are
+# found by walking the columns in order. With it, any column is located directly.
+MAGIC = b'DFCOL\x00\x01\n'
+FOOTER_MAGIC = b'DFCOLIDX'
+EXTENSION = '.dfc'
+
+_ALIGN = 8
+_SCHEMA_LEN = struct.Struct('<I')
+_LENGTH = struct.Struct('<Q')
+_JSON_SCALARS = (str, int, float, bool, type(None))
+
+
+def _align(n: int) -> int:
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def _column_buffers(column: Column) -> Tuple[str, List[Any], Optional[List[Any]]]:
+    """
+    Returns the dtype a column is stored as, its buffers and its categories.
+    """
+    dtype = column.dtype
+    if dtype == CATEGORY and not all(type(v) in _JSON_SCALARS for v in column.categories):
+        dtype = OBJECT
+    if dtype == STRING or (dtype != OBJECT and column._typecode() is not None):
+        store, offsets = column._contiguous_buffers()
+        buffers = [offsets, store] if dtype == STRING else [store]
+        return dtype, buffers, column.categories if dtype == CATEGORY else None
+    payload = pickle.dumps(column.to_list(), protocol=pickle.HIGHEST_PROTOCOL)
+    return OBJECT, [_LENGTH.pack(len(payload)) + payload], None
+
+
+def _encode(df: DataFrame, metadata: Optional[Dict[str, Any]] = None) -> Tuple[bytes, List[List[Any]]]:
+    """
+    Returns the JSON schema header of `df` and the buffers of each column.
+    """
+    schema: Dict[str, Any] = {'num_rows': len(df), 'byteorder': sys.byteorder, 'columns': []}
+    if metadata:
+        schema['metadata'] = metadata
+    all_buffers: List[List[Any]] = []
+    for name in df.columns:
+        column = df[name]
+        dtype, buffers, categories = _column_buffers(column)
+        entry = {'name': name, 'dtype': dtype, 'declared': column._declared}
+        if categories is not None:
+            entry['categories'] = categories
+        schema['columns'].append(entry)
+        all_buffers.append(buffers)
+    return json.dumps(schema, separators=(',', ':')).encode('utf-8'), all_buffers
+
+
+def _write_to(f: BinaryIO, df: DataFrame, index: bool, metadata: Optional[Dict[str, Any]] = None) -> int:
+    """
+    Writes `df` in the columnar format to the binary stream `f`; returns the bytes written.
+    """
+    header, all_buffers = _encode(df, metadata)
+    spans: List[List[Tuple[int, int]]] = []
+    f.write(MAGIC + _SCHEMA_LEN.pack(len(header)) + header)
+    pos = len(MAGIC) + _SCHEMA_LEN.size + len(header)
+    for buffers in all_buffers:
+        column_spans = []
+        for buffer in buffers:
+            f.write(b'\x00' * (_align(pos) - pos))
+            pos = _align(pos)
+            nbytes = memoryview(buffer).nbytes
+            f.write(buffer)
+            column_spans.append((pos, nbytes))
+            pos += nbytes
+        spans.append(column_spans)
+    if index:
+        footer = json.dumps(spans, separators=(',', ':')).encode('utf-8')
+        f.write(footer + _LENGTH.pack(len(footer)) + FOOTER_MAGIC)
+        pos += len(footer) + _LENGTH.size + len(FOOTER_MAGIC)
+    return pos
+
+
+def write_columnar(df: DataFrame, path: str, index: bool = True,
+                   metadata: Optional[Dict[str, Any]] = None) -> int:
+    """
+    Writes `df` to `path` in the columnar binary format.
+
+    Buffers are written as they are held in memory, without formatting a single
+    value. The file is written to a uniquely named temporary file next to
+    `path`, flushed to disk with `fsync` and then moved into place, so readers
+    (including mmaps of the previous version) never see a partial file and a
+    crash leaves either the old or the new contents at `path`.
+
+    Args:
+        df (DataFrame): The DataFrame to write.
+        path (str): Destination file (conventionally with the `.dfc` extension).
+        index (bool): Append the footer index, so readers can locate any column
+            without walking the ones before it. Defaults to True.
+        metadata (Optional[Dict[str, Any]]): JSON-serializable values stored in
+            the schema header, read back with `read_schema`. Defaults to None.
+
+    Returns:
+        int: The size of the file in bytes.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path), suffix='.tmp')
+    try:
+        with open(fd, 'wb') as f:
+            size = _write_to(f, df, index, metadata)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return size
+
+
+def dumps_columnar(df: DataFrame, index: bool = True) -> bytes:
+    """
+    Returns `df` in the columnar binary format, as `write_columnar` would write it.
+
+    Used to store a DataFrame somewhere other than its own file (e.g. a BLOB
+    committed in the same transaction as other data).
+    """
+    stream = io.BytesIO()
+    _write_to(stream, df, index)
+    return stream.getvalue()
+
+
+def _walk_spans(buf: memoryview, pos: int, schema: Dict[str, Any]) -> List[List[Tuple[int, int]]]:
+    """
+    Finds the buffers of every column by walking the file (no footer index).
+    """
+    num_rows = schema['num_rows']
+    spans = []
+    for entry in schema['columns']:
+        dtype = entry['dtype']
+        pos = _align(pos)
+        if dtype == STRING:
+            offsets_bytes = (num_rows + 1) * 8
+            data_bytes = struct.unpack_from('<q' if schema['byteorder'] == 'little' else '>q',
+                                            buf, pos + num_rows * 8)[0]
+            column_spans = [(pos, offsets_bytes), (_align(pos + offsets_bytes), data_bytes)]
+        elif dtype == OBJECT:
+            column_spans = [(pos, _LENGTH.size + _LENGTH.unpack_from(buf, pos)[0])]
+        else:
+            column_spans = [(pos, num_rows * array(_stored_typecode(entry)).itemsize)]
+        pos = column_spans[-1][0] + column_spans[-1][1]
+        spans.append(column_spans)
+    return spans
+
+
+def _stored_typecode(entry: Dict[str, Any]) -> str:
+    if entry['dtype'] == CATEGORY:
+        return _code_typecode(len(entry['categories']))
+    return _TYPECODES[entry['dtype']]
+
+
+def _read_column(buf: memoryview, entry: Dict[str, Any], spans: List[Tuple[int, int]],
+                 swap: bool) -> Column:
+    dtype, declared = entry['dtype'], entry['declared']
+    if dtype == OBJECT:
+        start, nbytes = spans[0]
+        values = pickle.loads(buf[start + _LENGTH.size:start + nbytes])
+        return Column(values, dtype=OBJECT if declared else None)
+    views = [buf[start:start + nbytes] for start, nbytes in spans]
+    if swap:
+        # Written on a machine with the other byte order: copy and swap.
+        typecodes = ['q', 'B'] if dtype == STRING else [_stored_typecode(entry)]
+        views = [array(code, view.tobytes()) for code, view in zip(typecodes, views)]
+        views[0].byteswap()
+    if dtype == STRING:
+        return _rebuild_column(STRING, declared, views[1], views[0], None)
+    return _rebuild_column(dtype, declared, views[0], None, entry.get('categories'))
+
+
+def read_columnar(path: str, columns: Optional[List[str]] = None, copy: bool = False) -> DataFrame:
+    """
+    Reads a file written by `write_columnar`.
+
+    The file is memory-mapped and the columns are zero-copy views over it, so
+    only the pages of the requested columns are ever read from disk. Columns
+    are copied on their first write (see `Column.slice`).
+
+    The returned DataFrame keeps the file mapped for as long as any of its
+    columns (or views of them) is alive. On Windows a mapped file cannot be
+    replaced, so read with `copy=True` when the same path will be rewritten
+    while the frame is still in use.
+
+    Args:
+        path (str): The file to read.
+        columns (Optional[List[str]]): Columns to read, in output order. Defaults
+            to every column.
+        copy (bool): Read the file into memory instead of mapping it; nothing
+            keeps the file open afterwards. Defaults to False.
+
+    Returns:
+        DataFrame: The stored DataFrame (or the requested columns of it).
+
+    Raises:
+        FileNotFoundError: If `path` does not exist.
+        ValueError: If the file is not in the columnar format.
+        KeyError: If a requested column does not exist in the file.
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < len(MAGIC) + _SCHEMA_LEN.size:
+            raise ValueError(f"'{path}' is not a columnar DataFrame file.")
+        mapped = f.read() if copy else mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return _decode(memoryview(mapped), columns, f"'{path}'")
+
+
+def loads_columnar(data: bytes, columns: Optional[List[str]] = None) -> DataFrame:
+    """
+    Reads a DataFrame from bytes returned by `dumps_columnar`.
+
+    The columns are zero-copy views over `data`, copied on their first write.
+
+    Raises:
+        ValueError: If `data` is not in the columnar format.
+        KeyError: If a requested column does not exist.
+    """
+    if len(data) < len(MAGIC) + _SCHEMA_LEN.size:
+        raise ValueError("Not in the columnar DataFrame format: the data.")
+    return _decode(memoryview(data), columns, 'the data')
+
+
+def _decode(buf: memoryview, columns: Optional[List[str]], source: str) -> DataFrame:
+    size = buf.nbytes
+    if buf[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"Not in the columnar DataFrame format: {source}.")
+    (header_len,) = _SCHEMA_LEN.unpack_from(buf, len(MAGIC))
+    data_start = len(MAGIC) + _SCHEMA_LEN.size + header_len
+    schema = json.loads(bytes(buf[len(MAGIC) + _SCHEMA_LEN.size:data_start]))
+
+    trailer = len(FOOTER_MAGIC) + _LENGTH.size
+    if size >= data_start + trailer and buf[size - len(FOOTER_MAGIC):] == FOOTER_MAGIC:
+        (footer_len,) = _LENGTH.unpack_from(buf, size - trailer)
+        spans = json.loads(bytes(buf[size - trailer - footer_len:size - trailer]))
+    else:
+        spans = _walk_spans(buf, data_start, schema)
+
+    entries = {entry['name']: (entry, column_spans) for entry, column_spans in zip(schema['columns'], spans)}
+    names = [entry['name'] for entry in schema['columns']] if columns is None else list(columns)
+    swap = schema['byteorder'] != sys.byteorder
+    data = {}
+    for name in names:
+        if name not in entries:
+            raise KeyError(f"Column '{name}' does not exist in {source}.")
+        entry, column_spans = entries[name]
+        data[name] = _read_column(buf, entry, column_spans, swap)
+    return DataFrame._from_column_objects(data, schema['num_rows'])
+
+
+def read_schema(path: str) -> Dict[str, Any]:
+    """
+    Returns the schema header of a columnar file (row count, per-column name,
+    dtype and categories, and the `metadata` given to `write_columnar`, if any)
+    without touching the column data.
+    """
+    with open(path, 'rb') as f:
+        prefix = f.read(len(MAGIC) + _SCHEMA_LEN.size)
+        if prefix[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"'{path}' is not a columnar DataFrame file.")
+        (header_len,) = _SCHEMA_LEN.unpack_from(prefix, len(MAGIC))
+        return json.loads(f.read(header_len))
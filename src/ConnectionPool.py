@@ -0,0 +1,95 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List
+from urllib.parse import quote
+
+# PRAGMAs aplicados a cada conexão de leitura
+MMAP_SIZE      = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))  # bytes
+CACHE_SIZE_KIB = int(os.getenv("SQLITE_CACHE_KIB", str(64 * 1024)))          # cache de páginas
+CACHED_STATEMENTS = 256    # statements preparados mantidos por conexão (chave: texto do SQL)
+
+class ConnectionPool:
+    """
+    Pool de conexões SQLite somente leitura, por processo.
+
+    As conexões são abertas uma vez (URI `mode=ro`), com os PRAGMAs de leitura
+    (mmap_size, cache_size, temp_store) e reaproveitadas entre chamadas; o
+    cache de páginas e os statements preparados (`cached_statements`, reusados
+    quando o mesmo SQL é executado de novo) sobrevivem de uma consulta para a
+    outra.
+
+    Conexões SQLite não podem atravessar um `fork`: um worker que herda o pool
+    abre as próprias conexões no primeiro uso e nunca toca nas do pai.
+    """
+
+    def __init__(self, db_path: str, max_idle: int = 4):
+        self.db_path = os.path.abspath(db_path)
+        self.max_idle = max_idle
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._idle: List[sqlite3.Connection] = []
+        self._inherited: List[sqlite3.Connection] = []
+
+    def __getstate__(self):
+        # Enviado a um worker (spawn/pickle): só a configuração; as conexões são abertas lá
+        return {'db_path': self.db_path, 'max_idle': self.max_idle}
+
+    def __setstate__(self, state):
+        self.__init__(state['db_path'], state['max_idle'])
+
+    def _open(self) -> sqlite3.Connection:
+        uri = f"file:{quote(self.db_path)}?mode=ro"
+        try:
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                                   cached_statements=CACHED_STATEMENTS)
+            conn.execute("PRAGMA schema_version").fetchone()   # força a abertura do arquivo
+        except sqlite3.OperationalError:
+            if not os.path.exists(self.db_path):
+                raise
+            # Banco em WAL cujo -shm ainda não existe: um leitor `mode=ro` não
+            # consegue criá-lo, então abre normal e bloqueia escritas na conexão
+            conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                                   cached_statements=CACHED_STATEMENTS)
+            conn.execute("PRAGMA query_only = ON")
+        conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+        conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KIB}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+
+    def _check_pid(self) -> None:
+        if self._pid != os.getpid():
+            # Pool herdado via fork: as conexões do pai ficam intocadas (nem usadas, nem fechadas)
+            self._inherited.extend(self._idle)
+            self._idle = []
+            self._lock = threading.Lock()
+            self._pid = os.getpid()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Empresta uma conexão do pool (abre uma nova se não houver livre)."""
+        self._check_pid()
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = self._open()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            with self._lock:
+                if len(self._idle) < self.max_idle and self._pid == os.getpid():
+                    self._idle.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+    def close(self) -> None:
+        """Fecha as conexões livres deste processo."""
+        self._check_pid()
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
@@ -1,20 +1,44 @@
-from typing import List, Tuple, Dict, Any, Optional
+import heapq
+from typing import List, Tuple, Dict, Any, Optional, Iterable, Sequence
+from Column import Column, CATEGORY, STRING, TIMESTAMP, MAX_CATEGORIES, is_low_cardinality
+from Expression import Expr
+
+def _rebuild_dataframe(columns: List[str], data: List[Column], num_rows: int) -> 'DataFrame':
+    return DataFrame._from_column_objects(dict(zip(columns, data)), num_rows)
+
+
+def _sort_keys(column: Column) -> List[Any]:
+    """
+    Per-row sort keys of `column` (None for missing values).
+
+    Category columns are ranked once per category and sorted by the rank of
+    each code, so rows are compared as small integers instead of strings.
+    """
+    if column.dtype == CATEGORY:
+        categories = column.categories
+        rank = {value: r for r, value in enumerate(sorted(c for c in categories if c is not None))}
+        per_code = [rank.get(value) for value in categories]
+        return list(map(per_code.__getitem__, column.codes))
+    if column.dtype == TIMESTAMP:
+        return column.epochs.tolist()
+    return column.to_list()
+
 
 class DataFrame:
     """
     An implementation of a dataframe-like structure for storing tabular data.
 
     Attributes:
-        _data (Dict[str, List[Any]]): Internal dictionary to store column data.
-            Keys are column names (str), and values are lists containing the
-            data for each row in that column.
+        _data (Dict[str, Column]): Internal dictionary to store column data.
+            Keys are column names (str), and values are typed `Column` buffers
+            containing the data for each row in that column.
         _columns (List[str]): An ordered list of column names, maintaining the
             insertion order of columns.
         _num_rows (int): The total number of rows currently in the DataFrame.
         _num_cols (int): The total number of columns currently in the DataFrame.
     """
 
-    def __init__(self, columns: Optional[List[str]] = None) -> None:
+    def __init__(self, columns: Optional[List[str]] = None, dtypes: Optional[Dict[str, str]] = None) -> None:
         """
         Initializes a DataFrame with the specified columns.
 
@@ -23,11 +47,15 @@ class DataFrame:
                 the DataFrame. If None, an empty DataFrame is created, and columns
                 can be added later via `vconcat` or by adding rows after defining
                 columns. Defaults to None.
+            dtypes (Optional[Dict[str, str]]): Declared dtype per column name
+                (`int64`, `float64`, `string`, `object`, `category` or `timestamp`). Columns left out have
+                their dtype inferred from the first values added. Defaults to None.
 
         Raises:
             TypeError: If `columns` is provided but is not a list of strings.
+            ValueError: If a declared dtype is not supported.
         """
-        self._data: Dict[str, List[Any]] = {}
+        self._data: Dict[str, Column] = {}
         self._columns: List[str] = []
         self._num_rows: int = 0
         self._num_cols: int = 0
@@ -36,10 +64,20 @@ class DataFrame:
             if not isinstance(columns, list) or not all(isinstance(c, str) for c in columns):
                 raise TypeError('Argument `columns` must be a list of strings.')
             
-            self._columns = columns
+            dtypes = dtypes or {}
+            self._columns = list(columns)
             self._num_cols = len(columns)
             for col in self._columns:
-                self._data[col] = []
+                self._data[col] = Column(dtype=dtypes.get(col))
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        """
+        Pickles the DataFrame as its column names, row count and `Column`
+        objects, each serialized as contiguous typed buffers (see
+        `Column.__reduce_ex__`). This is what crosses process boundaries in
+        `multiprocessing` queues and pools.
+        """
+        return (_rebuild_dataframe, (self._columns, [self._data[c] for c in self._columns], self._num_rows))
 
     def __repr__(self) -> str:
         """
@@ -65,7 +103,8 @@ class DataFrame:
         Retrieves data from the DataFrame using various key types.
 
         This method supports flexible data access:
-        - By **column name**: `df['column_name']` returns a list of all values in that column.
+        - By **column name**: `df['column_name']` returns the `Column` holding all values
+          in that column (indexable and iterable like a list).
         - By **row index**: `df[row_index]` returns a dictionary representing the row,
           where keys are column names and values are the cell data for that row.
         - By **specific cell**: `df['column_name', row_index]` returns the single
@@ -78,7 +117,7 @@ class DataFrame:
                 - If a **tuple** `(column_name, row_index)`, it specifies a single cell.
 
         Returns:
-            Any: The retrieved data, which can be a list (for a column), a dictionary
+            Any: The retrieved data, which can be a `Column`, a dictionary
                  (for a row), or a single value (for a cell).
 
         Raises:
@@ -126,53 +165,90 @@ class DataFrame:
             Tuple[int, int]: A tuple representing the (rows, columns) of the DataFrame.
         """
         return (self._num_rows, self._num_cols)
+
+    @property
+    def dtypes(self) -> Dict[str, Optional[str]]:
+        """
+        Returns the physical dtype of each column, in column order.
+
+        Returns:
+            Dict[str, Optional[str]]: Column name to dtype (None for an empty
+                column whose dtype was neither declared nor inferred yet).
+        """
+        return {col: self._data[col].dtype for col in self._columns}
+
+    def memory_usage(self, deep: bool = False) -> Dict[str, int]:
+        """
+        Returns the estimated bytes held by each column (see `Column.memory_usage`).
+
+        Example:
+            `total_mb = sum(df.memory_usage(deep=True).values()) / 2**20`
+
+        Args:
+            deep (bool): Also count the Python objects referenced by `object`
+                columns and category dictionaries. Defaults to False.
+
+        Returns:
+            Dict[str, int]: Column name to size in bytes, in column order.
+        """
+        return {col: self._data[col].memory_usage(deep) for col in self._columns}
+
+    def add_column(self, name: str, values: List[Any], dtype: Optional[str] = None) -> None:
+        """
+        Appends a new column to the DataFrame.
+
+        Args:
+            name (str): The name of the new column.
+            values (List[Any]): One value per existing row.
+            dtype (Optional[str]): Declared dtype of the column. Inferred if None.
+
+        Raises:
+            KeyError: If a column called `name` already exists.
+            ValueError: If `values` does not have one value per row.
+        """
+        if name in self._data:
+            raise KeyError(f"Column '{name}' already exists in the DataFrame.")
+        if len(values) != self._num_rows:
+            raise ValueError(f"Column '{name}' has {len(values)} values, but the DataFrame has {self._num_rows} rows.")
+        self._data[name] = Column(values, dtype=dtype)
+        self._columns.append(name)
+        self._num_cols += 1
     
-    def merge(self, other: 'DataFrame', on: str) -> 'DataFrame':
+    def merge(self, other: 'DataFrame | JoinIndex', on: str | List[str], how: str = 'inner',
+              fill_value: Any = None) -> 'DataFrame':
         """
-        Performs an inner join operation with another DataFrame on a specified common column.
+        Performs a hash join with another DataFrame on one or more common columns.
 
-        This method creates a new DataFrame containing rows where the value in the
-        `on` column matches in both DataFrames. The resulting DataFrame will include
-        all columns from both original DataFrames, with duplicate columns (other than
-        the `on` column) from the `other` DataFrame being excluded.
+        The resulting DataFrame includes all columns from both DataFrames, with the
+        `on` columns of the `other` DataFrame excluded. Matching row positions are
+        collected first and each output column is then gathered in one pass.
 
         Args:
-            other (DataFrame): The DataFrame to merge with the current DataFrame.
-            on (str): The name of the column to join on. This column must exist
+            other (DataFrame | JoinIndex): The DataFrame to merge with, or a
+                `Join.JoinIndex` prebuilt over it on the same key(s) (reusable
+                across calls, so the lookup is built only once).
+            on (str | List[str]): The column(s) to join on. They must exist
                       in both DataFrames.
+            how (str): `inner` (default), `left` (keep unmatched rows of this
+                      DataFrame, filling with `fill_value`) or `semi` (rows of this
+                      DataFrame that have a match, no columns from `other`).
+            fill_value (Any): Fill for `other`'s columns in unmatched `left` rows.
 
         Returns:
-            DataFrame: A new DataFrame resulting from the inner join.
+            DataFrame: A new DataFrame resulting from the join.
 
         Raises:
             KeyError: If the `on` column does not exist in either the current
                       DataFrame or the `other` DataFrame.
         """
-        if on not in self._columns or on not in other._columns:
-            raise KeyError(f"Column '{on}' must exist in both DataFrames to merge.")
-        
-        # Determine the new set of columns for the merged DataFrame
-        new_columns = list(self._columns) + [c for c in other._columns if c != on]
-        result_df = DataFrame(new_columns)
-
-        # Build a lookup table for efficient matching in the `other` DataFrame
-        # Key: value in the 'on' column, Value: list of row indices in 'other' DataFrame
-        lookup: Dict[Any, List[int]] = {}
-        for j in range(len(other)):
-            key = other[on][j]
-            lookup.setdefault(key, []).append(j)
-        for i in range(len(self)):
-            left_row_dict = self[i]
-            key = left_row_dict[on]
-
-            if key in lookup:
-                for j in lookup[key]:
-                    right_row_dict = other[j]
-                    row_values = [left_row_dict[col] for col in self._columns]
-                    row_values.extend([right_row_dict[col] for col in other._columns if col != on])
-                    
-                    result_df.add_row(row_values)
-        return result_df
+        from Join import JoinIndex, join
+
+        keys = [on] if isinstance(on, str) else list(on)
+        other_columns = other.df._columns if isinstance(other, JoinIndex) else other._columns
+        for key in keys:
+            if key not in self._columns or key not in other_columns:
+                raise KeyError(f"Column '{key}' must exist in both DataFrames to merge.")
+        return join(self, other, keys, how=how, fill_value=fill_value)
 
     def head(self, n: int = 5) -> None:
         """
@@ -228,6 +304,41 @@ class DataFrame:
             self._data[col_name].append(row_values[i])
 
         self._num_rows += 1
+
+    def extend_rows(self, rows: Iterable[Sequence[Any]]) -> None:
+        """
+        Appends a batch of rows, filling each column in a single pass.
+
+        Row lengths are validated once for the whole batch before any column is
+        touched, so a failing batch leaves the DataFrame unchanged.
+
+        Args:
+            rows (Iterable[Sequence[Any]]): Rows whose values follow the order
+                of `self._columns` (lists, tuples or sqlite3 rows).
+
+        Raises:
+            ValueError: If columns have not been defined for the DataFrame, or if
+                        any row does not have one value per column.
+        """
+        if not self._columns:
+            raise ValueError('Columns must be defined before adding rows.')
+
+        rows = rows if isinstance(rows, list) else list(rows)
+        if not rows:
+            return
+
+        num_cols = len(self._columns)
+        for i, row in enumerate(rows):
+            if len(row) != num_cols:
+                raise ValueError(
+                    f'Mismatched number of column values in row {i}: '
+                    f'expected {num_cols}, got {len(row)}.'
+                )
+
+        for col_name, values in zip(self._columns, zip(*rows)):
+            self._data[col_name].extend(list(values))
+
+        self._num_rows += len(rows)
     
     @classmethod
     def from_rows(cls, columns: List[str], rows: List[Tuple]) -> 'DataFrame':
@@ -252,13 +363,212 @@ class DataFrame:
             raise TypeError('Argument `rows` must be a list of tuples.')
         
         df = cls(columns)
-        for i, row in enumerate(rows):
-            if len(row) != len(columns):
-                raise ValueError(f"Row {i} has {len(row)} values, but expected {len(columns)} based on columns: {columns}.")
-            # Convert the tuple to a list of cell values before adding
-            df.add_row(list(row))
+        df.extend_rows(rows)
+        return df
+
+    @classmethod
+    def from_columns(cls, data: Dict[str, Iterable[Any]], dtypes: Optional[Dict[str, str]] = None) -> 'DataFrame':
+        """
+        Creates a new DataFrame from whole columns at once.
+
+        Example:
+            `DataFrame.from_columns({'event': ['play', 'stop'], 'quantidade': [3, 1]})`
+
+        Args:
+            data (Dict[str, Iterable[Any]]): Column name to column values, in
+                column order. Values may be lists or existing `Column` objects.
+            dtypes (Optional[Dict[str, str]]): Declared dtype per column name.
+                Defaults to None (infer every dtype).
+
+        Returns:
+            DataFrame: A new DataFrame instance holding the provided columns.
+
+        Raises:
+            TypeError: If a column name is not a string.
+            ValueError: If the columns do not all have the same length.
+        """
+        df = cls(list(data.keys()), dtypes)
+        lengths = set()
+        for name, values in data.items():
+            column = df._data[name]
+            column.extend(values)
+            lengths.add(len(column))
+        if len(lengths) > 1:
+            raise ValueError(f"All columns must have the same length, got lengths {sorted(lengths)}.")
+        df._num_rows = lengths.pop() if lengths else 0
+        return df
+
+    @classmethod
+    def from_cursor(cls, cursor, size: Optional[int] = None, dtypes: Optional[Dict[str, str]] = None) -> 'DataFrame':
+        """
+        Creates a new DataFrame from the pending rows of an executed DB-API cursor.
+
+        Column names are taken from `cursor.description`.
+
+        Args:
+            cursor: A cursor on which `execute` has already been called.
+            size (Optional[int]): Fetch at most this many rows (`fetchmany`). If
+                None, every remaining row is fetched (`fetchall`). Defaults to None.
+            dtypes (Optional[Dict[str, str]]): Declared dtype per column name.
+
+        Returns:
+            DataFrame: A DataFrame with the fetched rows (possibly empty).
+        """
+        columns = [d[0] for d in cursor.description]
+        rows = cursor.fetchall() if size is None else cursor.fetchmany(size)
+        df = cls(columns, dtypes)
+        df.extend_rows(rows)
+        return df
+
+    @classmethod
+    def _from_column_objects(cls, data: Dict[str, Column], num_rows: int) -> 'DataFrame':
+        """
+        Wraps already-built `Column` objects (all of length `num_rows`) without copying.
+        """
+        df = cls()
+        df._columns = list(data.keys())
+        df._data = dict(data)
+        df._num_cols = len(df._columns)
+        df._num_rows = num_rows
         return df
 
+    def slice(self, start: int, stop: int) -> 'DataFrame':
+        """
+        Returns a lightweight view over the rows `[start, stop)`.
+
+        The view shares the column buffers of this DataFrame instead of copying
+        them; data is only copied when either side is mutated or when the view
+        is pickled (which serializes just its own rows).
+
+        Args:
+            start (int): First row of the view (Python slice semantics).
+            stop (int): Row after the last row of the view.
+
+        Returns:
+            DataFrame: A DataFrame over the selected rows.
+        """
+        start, stop, _ = slice(start, stop).indices(self._num_rows)
+        return DataFrame._from_column_objects(
+            {col: self._data[col].slice(start, stop) for col in self._columns}, max(0, stop - start)
+        )
+
+    def take(self, indices: Iterable[int]) -> 'DataFrame':
+        """
+        Returns a new DataFrame with the rows at `indices`, gathered column by column.
+
+        Args:
+            indices (Iterable[int]): Row positions to keep, in output order.
+
+        Returns:
+            DataFrame: A new DataFrame with the selected rows.
+        """
+        indices = indices if isinstance(indices, (list, range)) else list(indices)
+        return DataFrame._from_column_objects(
+            {col: self._data[col].take(indices) for col in self._columns}, len(indices)
+        )
+
+    def _sort_columns(self, by: str | List[str]) -> List[str]:
+        names = [by] if isinstance(by, str) else list(by)
+        if not names:
+            raise ValueError("At least one column must be given to sort by.")
+        for name in names:
+            if name not in self._data:
+                raise KeyError(f"Column '{name}' does not exist in the DataFrame.")
+        return names
+
+    def argsort(self, by: str | List[str], ascending: bool | List[bool] = True) -> List[int]:
+        """
+        Returns the row positions that sort the DataFrame by the given column(s).
+
+        The sort is stable: rows with equal keys keep their current order. Missing
+        values (None) are placed last regardless of the direction.
+
+        Args:
+            by (str | List[str]): Column name(s) to sort by, most significant first.
+            ascending (bool | List[bool]): Sort direction, for all keys or one per key.
+
+        Returns:
+            List[int]: Row positions in sorted order.
+
+        Raises:
+            KeyError: If a column does not exist.
+            ValueError: If `ascending` does not have one entry per key.
+        """
+        names = self._sort_columns(by)
+        orders = [ascending] * len(names) if isinstance(ascending, bool) else list(ascending)
+        if len(orders) != len(names):
+            raise ValueError(f"Expected {len(names)} values for `ascending`, got {len(orders)}.")
+
+        # Least significant key first; each pass is a stable sort, so the earlier
+        # keys end up deciding the order and later ones only break ties.
+        order = list(range(self._num_rows))
+        for name, asc in zip(reversed(names), reversed(orders)):
+            values = _sort_keys(self._data[name])
+            nulls = [i for i in order if values[i] is None] if None in values else []
+            if nulls:
+                order = [i for i in order if values[i] is not None]
+            order.sort(key=values.__getitem__, reverse=not asc)
+            order.extend(nulls)
+        return order
+
+    def sort_values(self, by: str | List[str], ascending: bool | List[bool] = True) -> 'DataFrame':
+        """
+        Returns a new DataFrame sorted by the given column(s).
+
+        The row order is computed on the key columns only (see `argsort`) and the
+        result is built with a single gather per column.
+
+        Args:
+            by (str | List[str]): Column name(s) to sort by, most significant first.
+            ascending (bool | List[bool]): Sort direction, for all keys or one per key.
+
+        Returns:
+            DataFrame: The sorted DataFrame.
+        """
+        return self.take(self.argsort(by, ascending))
+
+    def _top(self, n: int, columns: str | List[str], select) -> List[int]:
+        names = self._sort_columns(columns)
+        keys = [_sort_keys(self._data[name]) for name in names]
+        rows: Iterable[int] = range(self._num_rows)
+        if any(None in values for values in keys):
+            rows = [i for i in rows if all(values[i] is not None for values in keys)]
+        if len(keys) == 1:
+            return select(n, rows, key=keys[0].__getitem__)
+        return select(n, rows, key=lambda i: tuple(values[i] for values in keys))
+
+    def nlargest(self, n: int, columns: str | List[str]) -> 'DataFrame':
+        """
+        Returns the `n` rows with the largest values in `columns`, in descending order.
+
+        Only a heap of `n` candidates is kept while scanning, so ranking the top
+        rows of a large table costs O(rows * log n) instead of a full sort. Ties
+        keep the row that comes first; rows with missing keys are skipped.
+
+        Args:
+            n (int): Number of rows to return.
+            columns (str | List[str]): Column name(s) to rank by, most significant first.
+
+        Returns:
+            DataFrame: At most `n` rows.
+        """
+        return self.take(self._top(n, columns, heapq.nlargest))
+
+    def nsmallest(self, n: int, columns: str | List[str]) -> 'DataFrame':
+        """
+        Returns the `n` rows with the smallest values in `columns`, in ascending order.
+
+        See `nlargest`.
+
+        Args:
+            n (int): Number of rows to return.
+            columns (str | List[str]): Column name(s) to rank by, most significant first.
+
+        Returns:
+            DataFrame: At most `n` rows.
+        """
+        return self.take(self._top(n, columns, heapq.nsmallest))
+
     def vconcat(self, other_df: 'DataFrame') -> None:
         """
         Vertically concatenates another DataFrame to the current DataFrame.
@@ -276,9 +586,10 @@ class DataFrame:
 
         if not self._columns:
             self._columns = list(other_df.columns)
+            self._num_cols = len(self._columns)
             for col in self._columns:
                 if col not in self._data:
-                    self._data[col] = []
+                    self._data[col] = Column()
         elif set(self.columns) != set(other_df.columns):
             raise ValueError("DataFrames must have the same columns to vertically concatenate.")
 
@@ -300,26 +611,158 @@ class DataFrame:
 
         The `predicate` function should accept a dictionary representing a row
         (where keys are column names and values are cell data) and return a boolean.
+        A column expression (see `where`) is also accepted and is much faster,
+        since it never builds per-row dictionaries.
 
         Example:
             To get rows where the 'value' column is greater than 100:
             `recent_data = df.filter(lambda r: r["value"] > 100)`
 
         Args:
-            predicate (Callable[[Dict[str, Any]], bool]): A function that takes
+            predicate (Callable[[Dict[str, Any]], bool] | Expr): A function that takes
                 a row (as a dictionary) and returns True if the row should be
                 included in the new DataFrame, False otherwise.
 
         Returns:
             DataFrame: A new DataFrame containing only the rows that satisfy the predicate.
         """
-        new_df = DataFrame(self._columns.copy())
-        for i in range(self._num_rows):
-            row_dict = {col: self._data[col][i] for col in self._columns}
-            if predicate(row_dict):
-                new_df.add_row([row_dict[c] for c in self._columns])
-        return new_df
+        if isinstance(predicate, Expr):
+            return self.where(predicate)
+        columns = [self._data[col] for col in self._columns]
+        keep = [
+            i for i, values in enumerate(zip(*columns))
+            if predicate(dict(zip(self._columns, values)))
+        ]
+        return self.take(keep)
     
+    def where(self, condition: Expr) -> 'DataFrame':
+        """
+        Returns a new DataFrame with the rows for which a column expression is true.
+
+        The condition is evaluated over whole columns into an index list, and the
+        matching rows are then gathered column by column in a single pass.
+
+        Example:
+            `recent = df.where(col('start_date').to_timestamp() >= cutoff)`
+
+        Args:
+            condition (Expr): A boolean column expression built with `Expression.col`.
+
+        Returns:
+            DataFrame: A new DataFrame containing only the matching rows.
+
+        Raises:
+            KeyError: If the expression references a column that does not exist.
+        """
+        return self.take(condition.indices(self))
+
+    def with_column(self, name: str, values: Expr | List[Any]) -> 'DataFrame':
+        """
+        Returns a new DataFrame with an extra (or replaced) column.
+
+        The existing columns are shared with this DataFrame as zero-copy views.
+
+        Args:
+            name (str): Name of the column to add or replace.
+            values (Expr | List[Any]): A column expression evaluated over this
+                DataFrame, or one value per row.
+
+        Returns:
+            DataFrame: A new DataFrame with the column set.
+
+        Raises:
+            ValueError: If `values` does not have one value per row.
+        """
+        if isinstance(values, Expr):
+            values = values.evaluate(self)
+        column = values if isinstance(values, Column) else Column(values)
+        if len(column) != self._num_rows:
+            raise ValueError(f"Column '{name}' has {len(column)} values, but the DataFrame has {self._num_rows} rows.")
+        data = {col: self._data[col].slice(0, self._num_rows) for col in self._columns}
+        data[name] = column
+        return DataFrame._from_column_objects(data, self._num_rows)
+
+    def categorize(self, columns: Optional[List[str]] = None, max_categories: int = MAX_CATEGORIES) -> 'DataFrame':
+        """
+        Returns a new DataFrame with columns dictionary-encoded as `category`.
+
+        Categorical columns store one small integer code per row plus the list
+        of distinct values, so group-bys, equality filters and joins on them work
+        on the codes, and they take far less memory and pickle much smaller.
+
+        Args:
+            columns (Optional[List[str]]): Columns to encode. If None, every string
+                column with at most `max_categories` distinct values (see
+                `Column.is_low_cardinality`) is encoded. Defaults to None.
+            max_categories (int): Cardinality limit used when `columns` is None.
+
+        Returns:
+            DataFrame: A new DataFrame; the other columns are shared as zero-copy views.
+
+        Raises:
+            KeyError: If a column in `columns` does not exist.
+        """
+        if columns is None:
+            columns = [c for c in self._columns
+                       if self._data[c].dtype == STRING and is_low_cardinality(self._data[c], max_categories)]
+        for name in columns:
+            if name not in self._data:
+                raise KeyError(f"Column '{name}' does not exist in the DataFrame.")
+        data = {}
+        for name in self._columns:
+            column = self._data[name]
+            if name in columns and column.dtype != CATEGORY:
+                data[name] = Column(column, dtype=CATEGORY)
+            else:
+                data[name] = column.slice(0, self._num_rows)
+        return DataFrame._from_column_objects(data, self._num_rows)
+
+    def parse_timestamps(self, columns: List[str]) -> 'DataFrame':
+        """
+        Returns a new DataFrame with `columns` parsed into `timestamp` columns.
+
+        Each distinct ISO string is parsed once into int64 epoch microseconds
+        (see `Column.to_epoch`). Later stages then filter with integer
+        comparisons and bucket by period without parsing again.
+
+        Args:
+            columns (List[str]): Columns holding ISO 8601 strings or datetimes.
+
+        Returns:
+            DataFrame: A new DataFrame; the other columns are shared as zero-copy views.
+
+        Raises:
+            KeyError: If a column in `columns` does not exist.
+            ValueError: If a value is not a valid ISO 8601 timestamp.
+        """
+        for name in columns:
+            if name not in self._data:
+                raise KeyError(f"Column '{name}' does not exist in the DataFrame.")
+        data = {}
+        for name in self._columns:
+            column = self._data[name]
+            if name in columns and column.dtype != TIMESTAMP:
+                data[name] = Column(column, dtype=TIMESTAMP)
+            else:
+                data[name] = column.slice(0, self._num_rows)
+        return DataFrame._from_column_objects(data, self._num_rows)
+
+    def groupby(self, keys: str | List[str]) -> 'GroupBy':
+        """
+        Groups the DataFrame by one or more key columns.
+
+        Example:
+            `df.groupby('genre').agg(views=('genre', 'size'))`
+
+        Args:
+            keys (str | List[str]): The key column name(s).
+
+        Returns:
+            GroupBy: An object whose `agg`/`partial` methods run the aggregation.
+        """
+        from GroupBy import GroupBy
+        return GroupBy(self, keys)
+
     def rename_column(self, old_name: str, new_name: str) -> None:
         """
         Renames an existing column in the DataFrame while preserving its data.
@@ -409,6 +852,11 @@ if __name__ == '__main__':
     print("\nDataFrame filtered for age < 30:")
     young_people_df.head()
 
+    from Expression import col
+    older_paulistas_df = df.where((col("age") >= 30) & (col("city") == "São Paulo"))
+    print("\nDataFrame filtered with where(age >= 30 & city == 'São Paulo'):")
+    older_paulistas_df.head()
+
     print("\n--- Testing Merge (Inner Join) ---")
     # Create another DataFrame for merging
     cities_df = DataFrame(['city', 'population'])
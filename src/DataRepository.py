@@ -1,21 +1,212 @@
+import csv
+import gzip
+import io
+import mmap
 import os
 import shutil
 import sqlite3
+import tempfile
+from itertools import repeat
 from DataFrame import DataFrame
+from Column import CATEGORY, is_low_cardinality
+from Query import Query, TableScan, DEFAULT_CHUNK_SIZE, quote_identifier
+from ColumnarFile import read_columnar, write_columnar
+from OffsetStore import OffsetStore
+from ConnectionPool import ConnectionPool
+from DimensionCache import DimensionCache, DIMENSION_TABLES
 
 STREAMING_LOG_DIR = "streaming_logs"
 ARCHIVE_DIR = os.path.join(STREAMING_LOG_DIR, "archive")
 
+# Índices de que as leituras dependem, por tabela: colunas do marcador das
+# leituras incrementais (ViewHistory.start_date: etapas de gênero e sessões),
+# chave do join com Content e datas usadas nos filtros/agrupamentos.
+REQUIRED_INDEXES = [
+    ("ViewHistory", "start_date"),
+    ("ViewHistory", "content_id"),
+    ("Revenue", "date"),
+    ("Rating", "rating_date"),
+]
+
+# Tamanho aproximado dos blocos decodificados de uma vez a partir do mmap
+MMAP_BLOCK_SIZE = 4 * 1024 * 1024
+# Tamanho mínimo de cada intervalo quando um arquivo é dividido entre workers
+MIN_RANGE_BYTES = 8 * 1024 * 1024
+# Linhas de CSV montadas e gravadas por vez em save_dataframe_to_csv
+CSV_WRITE_ROWS = 64 * 1024
+# Caracteres que obrigam a pôr o campo entre aspas (RFC 4180)
+_CSV_SPECIAL = (',', '"', '\n', '\r')
+
+
+def _iter_mapped_blocks(file_path, block_size=MMAP_BLOCK_SIZE, byte_range=None):
+    """
+    Percorre um arquivo texto mapeado em memória.
+
+    O primeiro item é a linha de cabeçalho; os seguintes são blocos de linhas
+    inteiras (~`block_size` bytes, sem a quebra de linha final), decodificados
+    direto do buffer mapeado: uma busca por '\n' e um decode por bloco, em vez
+    de um `readline()` por linha. Arquivo vazio não produz nada.
+
+    `byte_range` = (início, fim) restringe os blocos a um intervalo alinhado a
+    fim de linha (ver `DataRepository.split_byte_ranges`); o padrão é o corpo
+    inteiro, logo após o cabeçalho.
+    """
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return  # mmap não aceita arquivos vazios
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            header_end = mapped.find(b'\n')
+            if header_end < 0:
+                header_end = size
+            yield str(mapped[:header_end], 'utf-8')
+
+            pos, limit = byte_range if byte_range is not None else (header_end + 1, size)
+            limit = min(limit, size)
+            while pos < limit:
+                if pos + block_size >= limit:
+                    end = limit
+                else:
+                    # Corta no último fim de linha do bloco (ou no próximo, se a linha for maior que o bloco)
+                    end = mapped.rfind(b'\n', pos, pos + block_size)
+                    if end < 0:
+                        end = mapped.find(b'\n', pos + block_size, limit)
+                        if end < 0:
+                            end = limit
+                stop = end - 1 if end == limit and mapped[end - 1] == 0x0A else end
+                with memoryview(mapped)[pos:stop] as view:
+                    text = str(view, 'utf-8')
+                if text:
+                    yield text
+                pos = end + 1
+
+
+def _whole_records(blocks):
+    """
+    Junta blocos de `_iter_mapped_blocks` cortados dentro de um campo entre aspas.
+
+    Registros completos têm um número par de aspas (cada campo entre aspas soma
+    duas, cada `""` escapado também); com número ímpar, o corte caiu numa quebra
+    de linha dentro de um campo e o bloco segue junto com o próximo.
+    """
+    pending = None
+    for text in blocks:
+        if pending is not None:
+            text = pending + '\n' + text
+        if text.count('"') % 2:
+            pending = text
+            continue
+        pending = None
+        yield text
+    if pending is not None:
+        yield pending
+
+
+def _split_quoted(text, num_columns):
+    """Como `_split_fields`, para blocos com aspas: o parsing fica com o módulo `csv`."""
+    rows, skipped = [], []
+    for row_values in csv.reader(io.StringIO(text, newline='')):
+        if not row_values or row_values == ['']:
+            continue
+        if len(row_values) == num_columns:
+            rows.append(row_values)
+        else:
+            skipped.append(row_values)
+    columns = [list(values) for values in zip(*rows)] if rows else [[] for _ in range(num_columns)]
+    return columns, skipped
+
+
+def _split_fields(text, num_columns):
+    """
+    Separa um bloco de linhas CSV em uma lista de valores por coluna.
+
+    Caminho rápido: se nenhuma linha precisa de `strip()` e todas têm o número
+    esperado de vírgulas, o bloco inteiro vira uma única lista de campos e cada
+    coluna é uma fatia dela (`fields[i::num_columns]`), sem listas por linha.
+    Caso contrário, cai no tratamento linha a linha de antes (strip, linhas
+    vazias ignoradas). Blocos com aspas (campos gravados entre aspas por
+    `save_dataframe_to_csv`) vão para o módulo `csv`, sem `strip()` nos campos.
+
+    Returns:
+        (colunas, linhas descartadas por número de colunas incorreto)
+    """
+    if '"' in text:
+        return _split_quoted(text, num_columns)
+    lines = text.split('\n')
+    separators = num_columns - 1
+    if (num_columns > 1 and not any(c in text for c in ' \t\r')
+            and all(map(separators.__eq__, map(str.count, lines, repeat(','))))):
+        fields = text.replace('\n', ',').split(',')
+        return [fields[i::num_columns] for i in range(num_columns)], []
+
+    rows, skipped = [], []
+    for line in lines:
+        row_line = line.strip()
+        if not row_line:
+            continue
+        row_values = [val.strip() for val in row_line.split(',')]
+        if len(row_values) == num_columns:
+            rows.append(row_values)
+        else:
+            skipped.append(row_values)
+    columns = [list(values) for values in zip(*rows)] if rows else [[] for _ in range(num_columns)]
+    return columns, skipped
+
+
+def _dataframe_from_columns(header_columns, columns):
+    # Colunas de baixa cardinalidade (event, genre, ...) viram `category`:
+    # códigos inteiros + dicionário, menores para memória e para o pickle.
+    dtypes = {name: CATEGORY for name, values in zip(header_columns, columns) if is_low_cardinality(values)}
+    return DataFrame.from_columns(dict(zip(header_columns, columns)), dtypes)
+
+def _format_csv_values(values):
+    """Formata uma sequência de valores como campos CSV: None vira vazio, aspas só onde preciso."""
+    fields = ['' if v is None else str(v) for v in values]
+    joined = ''.join(fields)
+    if any(c in joined for c in _CSV_SPECIAL):
+        fields = ['"' + f.replace('"', '""') + '"' if any(c in f for c in _CSV_SPECIAL) else f
+                  for f in fields]
+    return fields
+
+def _format_csv_column(column):
+    """Formata a coluna inteira de uma vez; `category` formata só o dicionário."""
+    if column.dtype == CATEGORY:
+        formatted = _format_csv_values(column.categories)
+        return [formatted[code] for code in column.codes]
+    return _format_csv_values(column)
+
 class DataRepository:
-    def __init__(self, db_path: str = None):
+    def __init__(self, db_path: str = None, offsets_path: str = None, dimensions_dir: str = None):
         """
         Inicializa o repositório de dados.
 
         Args:
             db_path: caminho para o arquivo SQLite. Se None, usa `../streaming_mock.db`.
+            offsets_path: banco do `OffsetStore` (progresso das leituras incrementais
+                e estado acumulado de cada etapa).
+                Se None, usa `markers/offsets.sqlite`.
+            dimensions_dir: pasta dos snapshots do `DimensionCache`. Se None, usa
+                `markers/dimensions`.
         """
         base_dir = os.path.dirname(__file__)
         self.db_path = db_path or os.path.join(base_dir, '..', 'streaming_mock.db')
+        self.offsets = OffsetStore(offsets_path or os.path.join(base_dir, 'markers', 'offsets.sqlite'))
+        self.dimensions = DimensionCache(self.db_path, dimensions_dir or os.path.join(base_dir, 'markers', 'dimensions'))
+        self._pools = {}
+
+    def connection(self, db_path: str = None):
+        """
+        Empresta uma conexão somente leitura do pool do banco (`self.db_path` por padrão).
+
+        Uso: `with repo.connection() as conn: ...`. As conexões são reaproveitadas
+        entre chamadas (PRAGMAs, cache de páginas e statements preparados); cada
+        processo worker abre as suas (ver `ConnectionPool`).
+        """
+        path = os.path.abspath(db_path or self.db_path)
+        pool = self._pools.get(path)
+        if pool is None:
+            pool = self._pools[path] = ConnectionPool(path)
+        return pool.connection()
     
     def read_header(self, file_path):
         header_columns = []
@@ -36,47 +227,141 @@ class DataRepository:
             print("Error: header_columns inválido fornecido para _create_dataframe_from_chunk_lines")
             return None
 
-        chunk_df = DataFrame(columns=header_columns)
         num_expected_columns = len(header_columns)
 
-        for line in chunk_lines:
-            row_line = line.strip()
-            if not row_line:
-                continue
-            
-            row_values = [val.strip() for val in row_line.split(',')]
-            
-            if len(row_values) == num_expected_columns:
-                try:
-                    chunk_df.add_row(row_values)
-                except Exception as e_add:
-                    print(f"Erro ao adicionar linha ao DF do chunk: {row_values}, Erro: {e_add}")
-                    pass 
+        columns, _ = _split_fields(''.join(chunk_lines).rstrip('\n'), num_expected_columns)
+        try:
+            return _dataframe_from_columns(header_columns, columns)
+        except Exception as e_add:
+            print(f"Erro ao adicionar linhas ao DF do chunk: {e_add}")
+            return DataFrame(columns=header_columns)
+
+    def split_byte_ranges(self, file_path, parts, min_bytes=MIN_RANGE_BYTES):
+        """
+        Divide o corpo de um arquivo (tudo após a linha de cabeçalho) em até
+        `parts` intervalos de bytes [início, fim) alinhados a fim de linha, para
+        que um arquivo grande seja lido em paralelo por vários workers.
 
-        return chunk_df
+        Cada intervalo tem pelo menos `min_bytes` (exceto o último), então
+        arquivos pequenos resultam num único intervalo. Os intervalos cobrem o
+        corpo inteiro, em ordem e sem sobreposição.
+
+        Returns:
+            Lista de (início, fim); nunca vazia.
+        """
+        with open(file_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return [(0, 0)]
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                header_end = mapped.find(b'\n')
+                body_start = size if header_end < 0 else header_end + 1
+                step = max((size - body_start) // max(1, parts), min_bytes, 1)
+
+                ranges, start = [], body_start
+                while True:
+                    if start + step >= size:
+                        ranges.append((start, size))
+                        return ranges
+                    newline = mapped.find(b'\n', start + step - 1)
+                    end = size if newline < 0 else newline + 1
+                    ranges.append((start, end))
+                    if end >= size:
+                        return ranges
+                    start = end
+
+    def iter_log_chunks(self, file_path, chunk_size, header_columns=None, byte_range=None):
+        """
+        Lê um arquivo de log via mmap e produz DataFrames de até `chunk_size` linhas.
+
+        As quebras de linha são localizadas em bloco sobre o buffer mapeado e as
+        colunas são fatiadas de uma lista única de campos (ver `_split_fields`),
+        sem `readline()`/`strip()`/`split()` por linha quando o arquivo está limpo.
+        Linhas vazias ou com número de colunas diferente do cabeçalho são ignoradas.
+
+        Args:
+            file_path: arquivo CSV/log com linha de cabeçalho.
+            chunk_size: número de linhas por DataFrame.
+            header_columns: nomes das colunas; se None, usa o cabeçalho do arquivo.
+                A primeira linha do arquivo é sempre pulada.
+            byte_range: (início, fim) de `split_byte_ranges`; lê só esse trecho.
+        """
+        blocks = _iter_mapped_blocks(file_path, byte_range=byte_range)
+        header_line = next(blocks, None)
+        if header_columns is None:
+            if not header_line or not header_line.strip():
+                raise ValueError("Arquivo de log não contém cabeçalho (linha vazia).")
+            header_columns = [h.strip() for h in header_line.split(',')]
+
+        pending = None
+        for text in _whole_records(blocks):
+            columns, _ = _split_fields(text, len(header_columns))
+            if pending:
+                columns = [old + new for old, new in zip(pending, columns)]
+            num_rows, start = len(columns[0]), 0
+            while num_rows - start >= chunk_size:
+                yield _dataframe_from_columns(header_columns, [values[start:start + chunk_size] for values in columns])
+                start += chunk_size
+            pending = [values[start:] for values in columns]
+        if pending and pending[0]:
+            yield _dataframe_from_columns(header_columns, pending)
+
+    def scan(self, table_name: str, consumer: str = None, marker_column: str = None,
+             chunk_size: int = DEFAULT_CHUNK_SIZE) -> Query:
+        """
+        Inicia uma consulta preguiçosa (`Query`) sobre uma tabela.
+
+        Projeções e filtros da consulta são empurrados para o SELECT emitido
+        aqui; com `consumer`, a leitura é incremental como em
+        `extract_table_from_db_incremental`.
+        """
+        return Query(TableScan(self, table_name, consumer, marker_column, chunk_size))
 
     def load_content_metadata(self) -> DataFrame:
-        query = "SELECT content_id, content_genre FROM Content"
-        return self.execute_query_to_dataframe(query, expected_columns=['content_id', 'content_genre'])
+        return self.read_table_to_dataframe('Content', ['content_id', 'content_genre'])
 
-    def process_new_log_files(self, chunk_size, task_queue):
-        """Scans STREAMING_LOG_DIR for new .txt files, processes them in chunks, 
-           queues DataFrames, and moves processed files to ARCHIVE_DIR."""
-        
-        processed_chunks_total = 0
-        processed_files_count = 0
-        header_columns = None # Read header from the first valid file
+    def list_new_log_files(self):
+        """
+        Lista os arquivos .txt de STREAMING_LOG_DIR ainda não arquivados.
 
+        Returns:
+            Caminhos dos arquivos; lista vazia se o diretório não puder ser lido.
+        """
         os.makedirs(STREAMING_LOG_DIR, exist_ok=True)
         os.makedirs(ARCHIVE_DIR, exist_ok=True)
 
         try:
-            log_files = [f for f in os.listdir(STREAMING_LOG_DIR) 
-                         if os.path.isfile(os.path.join(STREAMING_LOG_DIR, f)) and f.endswith('.txt')]
+            return [os.path.join(STREAMING_LOG_DIR, f) for f in os.listdir(STREAMING_LOG_DIR)
+                    if os.path.isfile(os.path.join(STREAMING_LOG_DIR, f)) and f.endswith('.txt')]
         except OSError as e:
             print(f"Error listing directory {STREAMING_LOG_DIR}: {e}")
-            return 0 # Cannot proceed if directory listing fails
+            return [] # Cannot proceed if directory listing fails
+
+    def archive_log_files(self, file_paths):
+        """
+        Move os arquivos já processados para ARCHIVE_DIR.
+
+        Returns:
+            Número de arquivos arquivados (os que falharem ficam para a próxima execução).
+        """
+        archived = 0
+        for file_path in file_paths:
+            try:
+                shutil.move(file_path, os.path.join(ARCHIVE_DIR, os.path.basename(file_path)))
+                archived += 1
+            except OSError as e:
+                print(f"Error archiving file {file_path}: {e}")
+        return archived
+
+    def process_new_log_files(self, chunk_size, task_queue):
+        """Scans STREAMING_LOG_DIR for new .txt files, processes them in chunks, 
+           queues DataFrames, and moves processed files to ARCHIVE_DIR."""
+        
+        processed_chunks_total = 0
+        processed_files_count = 0
+        header_columns = None # Read header from the first valid file
 
+        log_files = [os.path.basename(path) for path in self.list_new_log_files()]
         if not log_files:
             # print(f"No new log files found in {STREAMING_LOG_DIR}.") # Optional: Can be noisy
             return 0
@@ -96,27 +381,10 @@ class DataRepository:
                          print(f"Warning: Could not read header from {filename}, skipping subsequent files in this run.")
                          break # Stop processing further files if header is bad
 
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    _ = f.readline() # Skip header row
-                    
-                    while True:
-                        chunk_lines = []
-                        for _ in range(chunk_size):
-                            line = f.readline()
-                            if not line:
-                                break
-                            chunk_lines.append(line)
-                        
-                        if not chunk_lines:
-                            break 
-                            
-                        dataframe_chunk = self._create_dataframe_from_chunk_lines(chunk_lines, header_columns)
-                        
-                        if dataframe_chunk is not None and len(dataframe_chunk) > 0:
-                             task_queue.put(dataframe_chunk)
-                             processed_chunks_file += 1
-                        elif dataframe_chunk is None:
-                             print(f"Warning: Failed to create DataFrame for a chunk in {filename}. Chunk ignored.")
+                # Arquivo mapeado em memória; o cabeçalho de cada arquivo é pulado
+                for dataframe_chunk in self.iter_log_chunks(file_path, chunk_size, header_columns):
+                    task_queue.put(dataframe_chunk)
+                    processed_chunks_file += 1
 
                 # Move file to archive only after successful processing
                 shutil.move(file_path, archive_path)
@@ -135,99 +403,249 @@ class DataRepository:
         print(f"Finished processing run. Processed {processed_files_count} files, {processed_chunks_total} total chunks queued.")
         return processed_chunks_total
 
+    def iter_table_incremental(
+        self,
+        db_path: str,
+        table_name: str,
+        chunk_size: int,
+        consumer,
+        marker_column: str = None,
+        columns: list = None,
+        where: tuple = None
+    ):
+        """
+        Gerador: lê de forma incremental as linhas novas de uma tabela SQLite,
+        entregando um DataFrame a cada `fetchmany` de `chunk_size` linhas.
+
+        Lê só as linhas após o último offset confirmado de `consumer` nesta tabela
+        (`self.offsets`). O novo offset só é preparado depois que o último chunk
+        foi consumido (gerador esgotado); a etapa chama
+        `self.offsets.commit(consumer)` depois de gravar as saídas. Se o consumo
+        for interrompido no meio, nada é preparado e a próxima execução relê.
+
+        `consumer` pode ser uma lista (leitura compartilhada): lê a partir do
+        menor offset entre eles e prepara o novo offset para todos.
+
+        `columns` restringe as colunas lidas (a coluna do marcador é sempre lida) e
+        `where` = (condição SQL, parâmetros) filtra as linhas no próprio SELECT.
+        """
+        if not os.path.exists(db_path):
+            print(f"[extract_incremental] DB não encontrado: {db_path}")
+            return
+
+        consumers = [consumer] if isinstance(consumer, str) else list(consumer)
+        offsets = {c: self.offsets.get(c, table_name, "0" if marker_column else 0) for c in consumers}
+        last_processed = min(offsets.values())
+
+        try:
+            with self.connection(db_path) as conn:
+                if columns is None:
+                    select = "*"
+                else:
+                    wanted = list(columns)
+                    if marker_column and marker_column not in wanted:
+                        wanted.append(marker_column)
+                    select = ", ".join(quote_identifier(c) for c in wanted)
+                extra_where, extra_params = (f"AND ({where[0]})", list(where[1])) if where else ("", [])
+
+                if marker_column:
+                    query = f"""
+                        SELECT {select} FROM {table_name}
+                        WHERE {marker_column} > ? {extra_where}
+                        ORDER BY {marker_column} ASC
+                    """
+                else:
+                    query = f"""
+                        SELECT rowid, {select} FROM {table_name}
+                        WHERE rowid > ? {extra_where}
+                        ORDER BY rowid ASC
+                    """
+
+                plan = self.full_scan_plan(conn, query, (last_processed, *extra_params))
+                if plan is not None:
+                    print(f"[extract_incremental] Aviso: '{table_name}' é lida por varredura completa"
+                          f"{' + ordenação' if 'TEMP B-TREE' in plan else ''} (falta índice em "
+                          f"{marker_column or 'rowid'}?). Plano: {plan}")
+
+                cursor = conn.execute(query, (last_processed, *extra_params))
+                try:
+                    chunk_count = 0
+                    max_marker_seen = last_processed
+
+                    while True:
+                        df_chunk = DataFrame.from_cursor(cursor, chunk_size)
+                        if len(df_chunk) == 0:
+                            break
+
+                        markers = df_chunk[marker_column] if marker_column else df_chunk["rowid"]
+                        chunk_max = max((m for m in markers if m is not None and m != ""), default=None)
+                        if chunk_max is not None and chunk_max > max_marker_seen:
+                            max_marker_seen = chunk_max
+
+                        chunk_count += 1
+                        yield df_chunk
+                        del df_chunk
+                finally:
+                    cursor.close()
+
+                if chunk_count > 0:
+                    for c, offset in offsets.items():
+                        self.offsets.stage(c, table_name, max(offset, max_marker_seen))
+
+                print(f"[extract_incremental] {chunk_count} chunks extraídos da tabela '{table_name}' com marcador > {last_processed}.")
+
+        except sqlite3.Error as e:
+            print(f"[extract_incremental] Erro ao acessar a tabela '{table_name}': {e}")
+
     def extract_table_from_db_incremental(
         self,
         db_path: str,
         table_name: str,
         chunk_size: int,
         task_queue,
-        marker_file: str,
+        consumer: str,
         marker_column: str = None,
-        dry_run: bool = False
+        dry_run: bool = False,
+        columns: list = None,
+        where: tuple = None
     ):
         """
         Extrai dados novos de uma tabela SQLite de forma incremental.
         Pode enviar DataFrames para uma fila (modo tradicional) ou retornar uma lista (modo dry_run).
 
+        Mesma leitura de `iter_table_incremental`, que deve ser preferido: aqui
+        todos os chunks passam pela fila ou ficam na lista de uma vez.
+
         Retorna:
             - int: número de chunks extraídos, se dry_run=False
             - list[DataFrame]: lista de DataFrames, se dry_run=True
         """
-        marker_dir = os.path.dirname(marker_file)
-        if marker_dir:
-            os.makedirs(marker_dir, exist_ok=True)
-
-        if not os.path.exists(db_path):
-            print(f"[extract_incremental] DB não encontrado: {db_path}")
-            return 0 if not dry_run else []
+        chunks = self.iter_table_incremental(db_path, table_name, chunk_size, consumer,
+                                             marker_column, columns=columns, where=where)
+        if dry_run:
+            return list(chunks)
+        chunk_count = 0
+        for df_chunk in chunks:
+            task_queue.put(df_chunk)
+            chunk_count += 1
+        return chunk_count
+
+    def ensure_indexes(self, indexes=REQUIRED_INDEXES) -> list:
+        """
+        Cria (se faltarem) os índices declarados em `indexes`.
 
-        last_processed = "0"
-        if os.path.exists(marker_file):
-            with open(marker_file, "r", encoding="utf-8") as f:
-                last_processed = f.read().strip()
+        Um índice existente cuja primeira coluna seja a pedida já atende; tabelas
+        que ainda não existem são ignoradas. Usa uma conexão de escrita própria,
+        fora do pool somente leitura.
 
+        Returns:
+            Nomes dos índices criados nesta chamada.
+        """
+        if not os.path.exists(self.db_path):
+            return []
+        created = []
+        conn = sqlite3.connect(self.db_path, timeout=30)
         try:
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-
-            if marker_column:
-                query = f"""
-                    SELECT * FROM {table_name}
-                    WHERE {marker_column} > ?
-                    ORDER BY {marker_column} ASC
-                """
-            else:
-                query = f"""
-                    SELECT rowid, * FROM {table_name}
-                    WHERE rowid > ?
-                    ORDER BY rowid ASC
-                """
-
-            cursor.execute(query, (last_processed,))
-            columns = [desc[0] for desc in cursor.description]
-            chunk_count = 0
-            max_marker_seen = last_processed
-            dataframes = [] if dry_run else None
-
-            while True:
-                rows = cursor.fetchmany(chunk_size)
-                if not rows:
-                    break
-
-                df_chunk = DataFrame(columns=columns)
-                for row in rows:
-                    row_dict = dict(zip(columns, row))
-                    df_chunk.add_row(list(row))
-
-                    current_marker = (
-                        row_dict.get(marker_column)
-                        if marker_column else str(row_dict.get("rowid"))
-                    )
-                    if current_marker and current_marker > max_marker_seen:
-                        max_marker_seen = current_marker
-
-                if dry_run:
-                    dataframes.append(df_chunk)
-                else:
-                    task_queue.put(df_chunk)
+            for table_name, column in indexes:
+                existing = conn.execute(f"PRAGMA index_list({quote_identifier(table_name)})").fetchall()
+                if not existing and not conn.execute(
+                        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)).fetchone():
+                    continue
+                leading = {conn.execute(f"PRAGMA index_info({quote_identifier(row[1])})").fetchone()[2]
+                           for row in existing}
+                if column in leading:
+                    continue
+                name = f"idx_{table_name}_{column}".lower()
+                with conn:
+                    conn.execute(f"CREATE INDEX IF NOT EXISTS {quote_identifier(name)} "
+                                 f"ON {quote_identifier(table_name)} ({quote_identifier(column)})")
+                created.append(name)
+        except sqlite3.Error as e:
+            print(f"[ensure_indexes] Erro ao criar índices: {e}")
+        finally:
+            conn.close()
+        if created:
+            print(f"[ensure_indexes] Índices criados: {', '.join(created)}")
+        return created
+
+    def full_scan_plan(self, conn, query: str, params=()) -> str | None:
+        """
+        Roda `EXPLAIN QUERY PLAN` e devolve o plano se alguma tabela for lida
+        por varredura completa (SCAN sem índice), ou None se todas usarem índice.
+        """
+        details = [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", tuple(params))]
+        if any(d.startswith("SCAN") and "USING" not in d for d in details):
+            return "; ".join(details)
+        return None
 
-                chunk_count += 1
+    def table_columns(self, table_name: str) -> list:
+        """Nomes das colunas de uma tabela (lista vazia se ela não existir)."""
+        with self.connection() as conn:
+            return [row[1] for row in conn.execute(f"PRAGMA table_info({quote_identifier(table_name)})")]
 
-            if chunk_count > 0:
-                with open(marker_file, "w", encoding="utf-8") as f:
-                    f.write(max_marker_seen)
+    def _incremental_bound(self, conn, table_name: str, consumer: str, marker_column: str = None) -> tuple:
+        """
+        (condição SQL, parâmetros) das linhas novas de `consumer` em `table_name`,
+        sobre o alias `t`: após o offset confirmado e até o offset já preparado
+        ou, se não houver, o MAX atual do marcador (None se não há linhas novas).
+        """
+        marker = f"t.{quote_identifier(marker_column)}" if marker_column else "t.rowid"
+        last_processed = self.offsets.get(consumer, table_name, "0" if marker_column else 0)
+        high = self.offsets.staged(consumer, table_name)
+        if high is None:
+            high = conn.execute(f"SELECT MAX({marker}) FROM {quote_identifier(table_name)} AS t "
+                                f"WHERE {marker} > ?", (last_processed,)).fetchone()[0]
+        return f"{marker} > ? AND {marker} <= ?", [last_processed, high]
+
+    def incremental_where(self, table_name: str, consumer: str, marker_column: str = None) -> list:
+        """
+        Limite incremental que `aggregate_table_sql` acrescenta ao WHERE, para
+        mostrar a consulta como ela roda (`Query.explain`). Depois da agregação
+        é o limite exato usado: o offset preparado por ela.
+        """
+        with self.connection() as conn:
+            return [self._incremental_bound(conn, table_name, consumer, marker_column)]
 
-            print(f"[extract_incremental] {chunk_count} chunks extraídos da tabela '{table_name}' com marcador > {last_processed}.")
+    def aggregate_table_sql(self, compiled, consumer: str = None, marker_column: str = None) -> DataFrame:
+        """
+        Executa no SQLite uma agregação compilada por `Query` (`SqlAggregate`).
 
-            return dataframes if dry_run else chunk_count
+        Com `consumer`, só as linhas após o último offset confirmado entram na
+        agregação, como em `extract_table_from_db_incremental`: o limite superior
+        (MAX do marcador) é lido antes, na mesma conexão, e vira o novo offset
+        preparado, então linhas inseridas durante a consulta ficam para a próxima.
+        Se o consumidor já tem um offset preparado (outra agregação da mesma
+        etapa), ele é reaproveitado como limite: todas veem as mesmas linhas.
 
+        Returns:
+            DataFrame com as chaves e as agregações (uma linha por grupo).
+        """
+        table_name = compiled.table
+        extra_where = []
+        high = None
+        try:
+            with self.connection() as conn:
+                if consumer:
+                    bound = self._incremental_bound(conn, table_name, consumer, marker_column)
+                    high = bound[1][1]
+                    if high is None:
+                        print(f"[aggregate_sql] Nenhuma linha nova em '{table_name}' com marcador > {bound[1][0]}.")
+                        return DataFrame(columns=compiled.names)
+                    extra_where.append(bound)
+
+                query, params = compiled.statement(extra_where)
+                plan = self.full_scan_plan(conn, query, params) if consumer else None
+                if plan is not None:
+                    print(f"[aggregate_sql] Aviso: agregação incremental em '{table_name}' faz varredura "
+                          f"completa (falta índice em {marker_column or 'rowid'}?). Plano: {plan}")
+                df = DataFrame.from_cursor(conn.execute(query, params))
         except sqlite3.Error as e:
-            print(f"[extract_incremental] Erro ao acessar a tabela '{table_name}': {e}")
-            return [] if dry_run else 0
+            print(f"[aggregate_sql] Erro ao agregar a tabela '{table_name}': {e}")
+            return DataFrame(columns=compiled.names)
 
-        finally:
-            if conn:
-                conn.close()
+        if consumer:
+            self.offsets.stage(consumer, table_name, high)
+        return df
 
     def read_csv_to_dataframe(self, file_path, expected_columns):
         """Reads a CSV file into a DataFrame object.
@@ -241,32 +659,27 @@ class DataRepository:
             return dataframe # Return empty DataFrame if file doesn't exist
             
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                header_line = f.readline().strip()
-                if not header_line:
-                    print(f"Warning: CSV file is empty: {file_path}. Returning empty DataFrame.")
-                    return dataframe # Return empty if only header (or empty file)
-                    
-                # Basic header validation (optional but recommended)
-                read_columns = [h.strip() for h in header_line.split(',')]
-                if read_columns != expected_columns:
-                    print(f"Warning: CSV header {read_columns} does not match expected {expected_columns} in {file_path}. Proceeding, but results may be inconsistent.")
-                    # You might want to return dataframe here or raise an error depending on strictness
-
-                for line in f:
-                    row_line = line.strip()
-                    if not row_line:
-                        continue
-                    row_values = [val.strip() for val in row_line.split(',')]
-                    if len(row_values) == len(expected_columns):
-                        try:
-                            # Attempt to add row - assumes types match DataFrame internal storage
-                            # You might need type conversion here depending on DataFrame.add_row implementation
-                            dataframe.add_row(row_values)
-                        except Exception as e_add:
-                            print(f"Warning: Error adding row from CSV {file_path}: {row_values}. Error: {e_add}")
-                    else:
-                         print(f"Warning: Skipping row with incorrect column count in {file_path}: {row_values}")
+            # The file is memory-mapped and decoded block by block (see `_iter_mapped_blocks`)
+            blocks = _iter_mapped_blocks(file_path)
+            header_line = next(blocks, '').strip()
+            if not header_line:
+                print(f"Warning: CSV file is empty: {file_path}. Returning empty DataFrame.")
+                return dataframe # Return empty if only header (or empty file)
+
+            # Basic header validation (optional but recommended)
+            read_columns = [h.strip() for h in next(csv.reader([header_line]))]
+            if read_columns != expected_columns:
+                print(f"Warning: CSV header {read_columns} does not match expected {expected_columns} in {file_path}. Proceeding, but results may be inconsistent.")
+                # You might want to return dataframe here or raise an error depending on strictness
+
+            for text in _whole_records(blocks):
+                columns, skipped = _split_fields(text, len(expected_columns))
+                for row_values in skipped:
+                    print(f"Warning: Skipping row with incorrect column count in {file_path}: {row_values}")
+                try:
+                    dataframe.vconcat(DataFrame.from_columns(dict(zip(expected_columns, columns))))
+                except Exception as e_add:
+                    print(f"Warning: Error adding rows from CSV {file_path}. Error: {e_add}")
 
         except FileNotFoundError:
              # This case is handled by the os.path.exists check above, but kept for robustness
@@ -282,51 +695,82 @@ class DataRepository:
             
         return dataframe
 
-    def read_table_to_dataframe(self, table_name: str) -> DataFrame:
+    def read_table_to_dataframe(self, table_name: str, columns: list = None) -> DataFrame:
         """
         Lê toda a tabela SQLite especificada e retorna como DataFrame.
 
+        Tabelas de dimensão (`DIMENSION_TABLES`) vêm do `DimensionCache`: se o
+        snapshot confere com o banco, só as linhas inseridas depois dele são
+        lidas; se alguma linha foi alterada ou apagada, a tabela é relida inteira.
+
         Args:
             table_name: nome da tabela no banco.
+            columns: colunas a ler (todas por padrão).
 
         Returns:
-            DataFrame com todas as colunas e linhas da tabela.
+            DataFrame com todas as linhas da tabela. Colunas de texto
+            com poucos valores distintos (gênero, tipo de dispositivo, plano...)
+            são codificadas como `category`.
         """
-        query = f"SELECT * FROM {table_name}"
-        return self.execute_query_to_dataframe(query, expected_columns=None)
-    def execute_query_to_dataframe(self, query: str, expected_columns: list = None) -> DataFrame:
+        if table_name in DIMENSION_TABLES:
+            return self.dimensions.get(table_name, columns)
+        select = "*" if columns is None else ", ".join(quote_identifier(c) for c in columns)
+        query = f"SELECT {select} FROM {quote_identifier(table_name)}"
+        return self.execute_query_to_dataframe(query, expected_columns=None).categorize()
+    def execute_query_to_dataframe(self, query: str, expected_columns: list = None, params: list = ()) -> DataFrame:
         """
-        Executa uma query SQL e converte o resultado para DataFrame.
+        Executa uma query SQL (com parâmetros `?` opcionais) e converte o resultado para DataFrame.
         Parâmetro expected_columns é ignorado, existindo para compatibilidade.
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(query)
-        cols = [d[0] for d in cursor.description]
-        df = DataFrame(columns=cols)
-        for row in cursor.fetchall():
-            df.add_row(list(row))
-        conn.close()
-        return df
+        with self.connection() as conn:
+            cursor = conn.execute(query, tuple(params))
+            return DataFrame.from_cursor(cursor)
+
+    def save_dataframe_to_csv(self, dataframe, file_path, compress: bool = None):
+        """
+        Grava o DataFrame em CSV, trocando o arquivo de forma atômica.
+
+        As colunas são formatadas inteiras (campos com vírgula, aspas ou quebra
+        de linha vão entre aspas; None vira campo vazio) e as linhas são gravadas
+        em blocos de `CSV_WRITE_ROWS`. O conteúdo vai para um arquivo temporário
+        na mesma pasta, com fsync, e só então substitui `file_path` com
+        `os.replace`: quem lê (o dashboard) vê o relatório anterior ou o novo,
+        nunca um arquivo pela metade.
 
-    def save_dataframe_to_csv(self, dataframe, file_path):
+        Args:
+            dataframe: DataFrame a gravar.
+            file_path: caminho de destino.
+            compress: grava com gzip; se None, só quando `file_path` termina em `.gz`.
+        """
         if not isinstance(dataframe, DataFrame):
             raise TypeError("O argumento 'dataframe' deve ser uma instância da classe DataFrame.")
 
         if not file_path or not isinstance(file_path, str):
              raise ValueError("O argumento 'file_path' deve ser uma string não vazia.")
 
-        try:
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
-
-            with open(file_path, 'w', encoding='utf-8', newline='') as f:
-                header_line = ','.join(dataframe.columns)
-                f.write(header_line + '\n')
+        if compress is None:
+            compress = file_path.endswith('.gz')
 
-                for row_index in range(len(dataframe)):
-                    row_values = [str(dataframe[col][row_index]) for col in dataframe.columns]
-                    row_line = ','.join(row_values)
-                    f.write(row_line + '\n')
+        tmp_path = None
+        try:
+            directory = os.path.dirname(os.path.abspath(file_path))
+            os.makedirs(directory, exist_ok=True)
+            columns = [_format_csv_column(dataframe[col]) for col in dataframe.columns]
+
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(file_path), suffix='.tmp')
+            with open(fd, 'wb') as raw:
+                out = gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6, mtime=0) if compress else raw
+                out.write((','.join(_format_csv_values(dataframe.columns)) + '\n').encode('utf-8'))
+                for start in range(0, len(dataframe), CSV_WRITE_ROWS):
+                    rows = zip(*(values[start:start + CSV_WRITE_ROWS] for values in columns))
+                    out.write(''.join([','.join(row) + '\n' for row in rows]).encode('utf-8'))
+                if compress:
+                    out.close()
+                raw.flush()
+                os.fsync(raw.fileno())
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, file_path)
+            tmp_path = None
 
         except IOError as e:
             print(f"Erro de I/O ao salvar o arquivo CSV '{file_path}': {e}")
@@ -334,4 +778,40 @@ class DataRepository:
         except Exception as e:
             print(f"Erro inesperado ao salvar o DataFrame em CSV '{file_path}': {e}")
             raise
+        finally:
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def save_dataframe_to_columnar(self, dataframe, file_path, index: bool = True) -> int:
+        """
+        Grava o DataFrame no formato colunar binário (ver `ColumnarFile`).
+
+        As colunas vão para o disco como os buffers tipados que já estão em
+        memória, sem formatar valor a valor; a troca do arquivo é atômica.
+
+        Args:
+            dataframe: DataFrame a gravar.
+            file_path: caminho de destino (extensão `.dfc`).
+            index: grava o índice no rodapé (acesso direto a cada coluna).
+
+        Returns:
+            Tamanho do arquivo em bytes.
+        """
+        if not isinstance(dataframe, DataFrame):
+            raise TypeError("O argumento 'dataframe' deve ser uma instância da classe DataFrame.")
+        return write_columnar(dataframe, file_path, index)
+
+    def read_columnar_to_dataframe(self, file_path, columns: list = None, copy: bool = False) -> DataFrame:
+        """
+        Lê um arquivo colunar binário via mmap; só as páginas das colunas pedidas são lidas.
+        O DataFrame mantém o arquivo mapeado enquanto existir: use `copy=True` (lê para a
+        memória) quando o mesmo caminho for regravado com ele ainda em uso.
+
+        Raises:
+            FileNotFoundError: se o arquivo não existir.
+        """
+        return read_columnar(file_path, columns, copy=copy)
 
+    def export_columnar_to_csv(self, columnar_path, csv_path) -> None:
+        """Exporta um arquivo colunar para CSV (compatibilidade com o dashboard/pandas)."""
+        self.save_dataframe_to_csv(read_columnar(columnar_path), csv_path)
@@ -0,0 +1,159 @@
+import hashlib
+import os
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+from ColumnarFile import EXTENSION, read_columnar, read_schema, write_columnar
+from ConnectionPool import ConnectionPool
+from DataFrame import DataFrame
+from Query import quote_identifier
+
+# Tabelas de dimensão: crescem devagar, quase só com INSERTs (grpc_server, mock_db)
+DIMENSION_TABLES = ("Content", "Device", "User", "Plan")
+
+# Coluna do snapshot com o rowid de cada linha (marca d'água da leitura incremental)
+ROWID_COLUMN = "_rowid"
+
+# Linhas do snapshot, sorteadas a cada validação, comparadas com o banco
+SAMPLE_ROWS = 256
+
+# Idade máxima (horas) da última leitura completa: depois dela a tabela é relida
+# inteira, o que garante que um UPDATE fora da amostra não dura mais que isso
+MAX_SNAPSHOT_AGE_HOURS = float(os.getenv("DIMENSION_SNAPSHOT_MAX_AGE_HOURS", "24"))
+
+class DimensionCache:
+    """
+    Cache, entre execuções, das tabelas de dimensão (`DIMENSION_TABLES`).
+
+    Cada tabela fica num snapshot colunar (`<directory>/<banco>-<hash>/<tabela>.dfc`,
+    uma pasta por banco), com o rowid de cada linha em `_rowid`. Ao pedir uma
+    tabela:
+
+    - dentro da execução, se o `PRAGMA data_version` não mudou desde a última
+      consulta, nenhuma outra conexão gravou no banco e a cópia em memória vale
+      sem nenhuma leitura;
+    - senão, o snapshot é validado contra o banco com consultas baratas:
+      mesmas colunas; `COUNT(*)` e `MAX(rowid)` até o maior rowid salvo iguais
+      ao snapshot (pega linhas apagadas e rowids reaproveitados); e
+      `SAMPLE_ROWS` linhas sorteadas iguais às do banco. Se confere, só as
+      linhas com rowid maior são lidas e acrescentadas; senão, a tabela é
+      relida inteira.
+
+    Um UPDATE numa linha fora da amostra não é detectado na hora: por isso a
+    tabela também é relida inteira quando a última leitura completa tem mais
+    de `MAX_SNAPSHOT_AGE_HOURS` horas (guardada nos metadados do snapshot).
+    Tabelas que mudam com frequência não deveriam estar em `DIMENSION_TABLES`.
+
+    Só a configuração atravessa um pickle (o `Query` enviado aos workers leva o
+    repositório): as tabelas já vão resolvidas no plano.
+    """
+
+    def __init__(self, db_path: str, directory: str):
+        self.db_path = os.path.abspath(db_path)
+        self.directory = directory
+        # Uma só conexão ociosa: o data_version só é comparável na mesma conexão
+        self._pool = ConnectionPool(self.db_path, max_idle=1)
+        self._frames: Dict[str, DataFrame] = {}
+        self._fresh: set = set()
+        self._full_reads: Dict[str, float] = {}
+        self._version: Optional[Tuple[int, int]] = None
+
+    def __getstate__(self):
+        return {'db_path': self.db_path, 'directory': self.directory}
+
+    def __setstate__(self, state):
+        self.__init__(state['db_path'], state['directory'])
+
+    def snapshot_path(self, table_name: str) -> str:
+        # Uma pasta por banco: snapshots de bancos diferentes não se sobrescrevem
+        digest = hashlib.sha1(self.db_path.encode('utf-8')).hexdigest()[:12]
+        folder = f"{os.path.splitext(os.path.basename(self.db_path))[0]}-{digest}"
+        return os.path.join(self.directory, folder, table_name + EXTENSION)
+
+    def get(self, table_name: str, columns: List[str] = None) -> DataFrame:
+        """
+        Tabela de dimensão atualizada, com as colunas pedidas (todas por padrão)
+        e as colunas de texto com poucos valores codificadas como `category`.
+        """
+        with self._pool.connection() as conn:
+            version = (os.getpid(), conn.execute("PRAGMA data_version").fetchone()[0])
+            if version != self._version:
+                self._version = version
+                self._fresh.clear()
+            if table_name not in self._fresh:
+                self._frames[table_name] = self._refresh(conn, table_name)
+                self._fresh.add(table_name)
+        frame = self._frames[table_name]
+        wanted = columns or [c for c in frame.columns if c != ROWID_COLUMN]
+        return DataFrame._from_column_objects({c: frame[c] for c in wanted}, len(frame)).categorize()
+
+    def _load_snapshot(self, table_name: str) -> Optional[DataFrame]:
+        path = self.snapshot_path(table_name)
+        try:
+            metadata = read_schema(path).get('metadata') or {}
+            # Cópia em memória: o snapshot é regravado em `_refresh` com o frame em uso
+            frame = read_columnar(path, copy=True)
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError) as e:
+            print(f"[dimension_cache] Snapshot de '{table_name}' ilegível ({e}); relendo a tabela.")
+            return None
+        if 'full_read_at' not in metadata:
+            return None
+        self._full_reads[table_name] = metadata['full_read_at']
+        return frame
+
+    def _is_valid(self, conn, table_name: str, frame: DataFrame) -> bool:
+        """O snapshot ainda é um prefixo da tabela (colunas, contagem, maior rowid e amostra)?"""
+        if time.time() - self._full_reads[table_name] > MAX_SNAPSHOT_AGE_HOURS * 3600:
+            return False
+        quoted = quote_identifier(table_name)
+        table_columns = [row[1] for row in conn.execute(f"PRAGMA table_info({quoted})")]
+        if frame.columns != [ROWID_COLUMN] + table_columns:
+            return False
+        if len(frame) == 0:
+            return True
+        hwm = frame[ROWID_COLUMN][len(frame) - 1]
+        count, max_rowid = conn.execute(f"SELECT COUNT(*), MAX(rowid) FROM {quoted} WHERE rowid <= ?",
+                                        (hwm,)).fetchone()
+        if count != len(frame) or max_rowid != hwm:
+            return False
+        # A última linha sempre entra na amostra
+        sample = sorted(set(random.sample(range(len(frame)), min(SAMPLE_ROWS, len(frame)))) | {len(frame) - 1})
+        expected = [tuple(frame[c][i] for c in frame.columns) for i in sample]
+        rowids = [row[0] for row in expected]
+        placeholders = ", ".join("?" * len(rowids))
+        actual = conn.execute(f"SELECT rowid, * FROM {quoted} WHERE rowid IN ({placeholders}) ORDER BY rowid",
+                              rowids).fetchall()
+        return actual == expected
+
+    def _refresh(self, conn, table_name: str) -> DataFrame:
+        frame = self._frames.get(table_name)
+        if frame is None:
+            frame = self._load_snapshot(table_name)
+        if frame is not None and not self._is_valid(conn, table_name, frame):
+            print(f"[dimension_cache] Snapshot de '{table_name}' não confere com o banco "
+                  f"(ou passou da idade máxima); relendo a tabela.")
+            frame = None
+
+        hwm = frame[ROWID_COLUMN][len(frame) - 1] if frame is not None and len(frame) else 0
+        cursor = conn.execute(f"SELECT rowid AS {ROWID_COLUMN}, * FROM {quote_identifier(table_name)} "
+                              f"WHERE rowid > ? ORDER BY rowid", (hwm,))
+        new_rows = DataFrame.from_cursor(cursor)
+        if frame is not None and len(new_rows) == 0:
+            return frame
+
+        # Novo DataFrame em vez de `frame.vconcat`: as colunas já entregues não mudam
+        combined = DataFrame()
+        if frame is not None:
+            combined.vconcat(frame)
+        else:
+            self._full_reads[table_name] = time.time()
+        combined.vconcat(new_rows)
+        if len(combined):
+            write_columnar(combined, self.snapshot_path(table_name),
+                           metadata={'full_read_at': self._full_reads[table_name]})
+        print(f"[dimension_cache] '{table_name}': {len(new_rows)} linhas novas "
+              f"({'incremental' if frame is not None else 'leitura completa'}), {len(combined)} no total.")
+        return combined
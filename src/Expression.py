@@ -0,0 +1,305 @@
+import operator
+from itertools import compress, repeat
+from typing import Any, Callable, Iterable, List, Optional
+
+from Column import Column, CATEGORY, TIMESTAMP, DAY_US, HOUR_US, NULL_EPOCH, from_epoch, to_epoch
+
+
+class Expr:
+    """
+    A column expression evaluated over whole columns of a DataFrame.
+
+    Expressions are built with `col` and `lit` and combined with Python
+    operators, e.g. `(col('start_date') >= cutoff) & (col('event') == 'play')`.
+    Comparisons produce boolean masks; `&`, `|` and `~` combine masks.
+    """
+
+    __hash__ = None
+
+    def evaluate(self, df) -> Iterable[Any]:
+        """
+        Evaluates the expression, returning one value per row of `df`.
+        """
+        raise NotImplementedError
+
+    def mask(self, df) -> List[bool]:
+        """
+        Evaluates a boolean expression into a selection mask over the rows of `df`.
+        """
+        return [bool(v) for v in self.evaluate(df)]
+
+    def indices(self, df) -> List[int]:
+        """
+        Returns the positions of the rows of `df` for which the expression is true.
+        """
+        return list(compress(range(len(df)), self.evaluate(df)))
+
+    def columns(self) -> List[str]:
+        """
+        Returns the names of the columns referenced by the expression.
+        """
+        return []
+
+    def _binary(self, other: Any, op: Callable[[Any, Any], Any], symbol: str) -> 'Expr':
+        return BinaryExpr(self, other if isinstance(other, Expr) else Literal(other), op, symbol)
+
+    def __eq__(self, other: Any) -> 'Expr':  # type: ignore[override]
+        return self._binary(other, operator.eq, '==')
+
+    def __ne__(self, other: Any) -> 'Expr':  # type: ignore[override]
+        return self._binary(other, operator.ne, '!=')
+
+    def __lt__(self, other: Any) -> 'Expr':
+        return self._binary(other, operator.lt, '<')
+
+    def __le__(self, other: Any) -> 'Expr':
+        return self._binary(other, operator.le, '<=')
+
+    def __gt__(self, other: Any) -> 'Expr':
+        return self._binary(other, operator.gt, '>')
+
+    def __ge__(self, other: Any) -> 'Expr':
+        return self._binary(other, operator.ge, '>=')
+
+    def __and__(self, other: 'Expr') -> 'Expr':
+        return self._binary(other, _and, '&')
+
+    def __or__(self, other: 'Expr') -> 'Expr':
+        return self._binary(other, _or, '|')
+
+    def __invert__(self) -> 'Expr':
+        return Apply(self, operator.not_, memoize=False)
+
+    def isin(self, values: Iterable[Any]) -> 'Expr':
+        """
+        Tests membership of each value in `values`.
+        """
+        return IsIn(self, values)
+
+    def apply(self, func: Callable[[Any], Any], memoize: bool = True) -> 'Expr':
+        """
+        Maps `func` over the values of the expression.
+
+        Args:
+            func (Callable[[Any], Any]): The function to apply to each value.
+            memoize (bool): Call `func` once per distinct value. Worth it for
+                repetitive columns such as timestamps or categories. Defaults to True.
+        """
+        return Apply(self, func, memoize)
+
+    def to_timestamp(self) -> 'Expr':
+        """
+        Parses the values (ISO strings or datetimes) into a `timestamp` column.
+
+        Each distinct string is parsed once, and comparing the result with a
+        constant (e.g. `col('start_date').to_timestamp() >= cutoff`) compares
+        epoch integers. Already-parsed `timestamp` columns are used as they are.
+        None parses to a NULL timestamp, which fails every comparison.
+        """
+        return ToTimestamp(self)
+
+    def bucket(self, unit: str) -> 'Expr':
+        """
+        Labels each timestamp with its calendar period: `hour` ('2024-05-01T13'),
+        `day` ('2024-05-01'), `month` ('2024-05') or `year` ('2024').
+
+        The period of a row is found by integer division of its epoch; each
+        distinct period is formatted once. The result is a `category` column;
+        NULL timestamps are labelled None.
+        """
+        return Bucket(self, unit)
+
+
+def _on_categories(operand: Expr, df, predicate: Callable[[Any], bool]) -> Optional[List[bool]]:
+    """
+    Evaluates `predicate` once per category when `operand` is a `category`
+    column and spreads the results over the rows by code. Returns None for
+    any other operand.
+    """
+    if not isinstance(operand, ColumnRef):
+        return None
+    column = df[operand.name]
+    if column.dtype != CATEGORY:
+        return None
+    per_code = [predicate(v) for v in column.categories]
+    return list(map(per_code.__getitem__, column.codes))
+
+
+def _as_timestamps(operand: Expr, df) -> Column:
+    values = operand.evaluate(df)
+    if isinstance(values, Column) and values.dtype == TIMESTAMP:
+        return values
+    return Column(values, dtype=TIMESTAMP)
+
+
+_COMPARISONS = (operator.eq, operator.ne, operator.lt, operator.le, operator.gt, operator.ge)
+
+
+def _and(left: Any, right: Any) -> bool:
+    return bool(left) and bool(right)
+
+
+def _or(left: Any, right: Any) -> bool:
+    return bool(left) or bool(right)
+
+
+class ColumnRef(Expr):
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __repr__(self) -> str:
+        return f"col({self.name!r})"
+
+    def evaluate(self, df) -> Iterable[Any]:
+        return df[self.name]
+
+    def columns(self) -> List[str]:
+        return [self.name]
+
+
+class Literal(Expr):
+    def __init__(self, value: Any) -> None:
+        self.value = value
+
+    def __repr__(self) -> str:
+        return f"lit({self.value!r})"
+
+    def evaluate(self, df) -> Iterable[Any]:
+        return repeat(self.value, len(df))
+
+
+class BinaryExpr(Expr):
+    def __init__(self, left: Expr, right: Expr, op: Callable[[Any, Any], Any], symbol: str) -> None:
+        self.left = left
+        self.right = right
+        self.op = op
+        self.symbol = symbol
+
+    def __repr__(self) -> str:
+        return f"({self.left!r} {self.symbol} {self.right!r})"
+
+    def evaluate(self, df) -> Iterable[Any]:
+        if isinstance(self.right, Literal):
+            op, value = self.op, self.right.value
+            # Equality against a constant runs on the codes of categorical columns.
+            if op in (operator.eq, operator.ne):
+                result = _on_categories(self.left, df, lambda v: op(v, value))
+                if result is not None:
+                    return result
+            left = self.left.evaluate(df)
+            # Timestamps are compared as epoch integers, without decoding a row.
+            if op in _COMPARISONS and isinstance(left, Column) and left.dtype == TIMESTAMP:
+                epochs = left.epochs
+                result = list(map(op, epochs, repeat(to_epoch(value), len(left))))
+                # NULL timestamps never satisfy a comparison, as in SQL.
+                if NULL_EPOCH in epochs:
+                    result = [r and us != NULL_EPOCH for r, us in zip(result, epochs)]
+                return result
+            return list(map(op, left, self.right.evaluate(df)))
+        return list(map(self.op, self.left.evaluate(df), self.right.evaluate(df)))
+
+    def columns(self) -> List[str]:
+        return self.left.columns() + [c for c in self.right.columns() if c not in self.left.columns()]
+
+
+class IsIn(Expr):
+    def __init__(self, operand: Expr, values: Iterable[Any]) -> None:
+        self.operand = operand
+        self.values = frozenset(values)
+
+    def __repr__(self) -> str:
+        return f"{self.operand!r}.isin({sorted(self.values, key=repr)!r})"
+
+    def evaluate(self, df) -> Iterable[Any]:
+        result = _on_categories(self.operand, df, self.values.__contains__)
+        if result is not None:
+            return result
+        return list(map(self.values.__contains__, self.operand.evaluate(df)))
+
+    def columns(self) -> List[str]:
+        return self.operand.columns()
+
+
+class Apply(Expr):
+    def __init__(self, operand: Expr, func: Callable[[Any], Any], memoize: bool) -> None:
+        self.operand = operand
+        self.func = func
+        self.memoize = memoize
+
+    def __repr__(self) -> str:
+        return f"{self.operand!r}.apply({getattr(self.func, '__name__', self.func)})"
+
+    def evaluate(self, df) -> Iterable[Any]:
+        values = self.operand.evaluate(df)
+        if not self.memoize:
+            return list(map(self.func, values))
+        func = self.func
+        cache = {}
+        out = []
+        for v in values:
+            try:
+                out.append(cache[v])
+            except KeyError:
+                cache[v] = result = func(v)
+                out.append(result)
+        return out
+
+    def columns(self) -> List[str]:
+        return self.operand.columns()
+
+
+class ToTimestamp(Expr):
+    def __init__(self, operand: Expr) -> None:
+        self.operand = operand
+
+    def __repr__(self) -> str:
+        return f"{self.operand!r}.to_timestamp()"
+
+    def evaluate(self, df) -> Iterable[Any]:
+        return _as_timestamps(self.operand, df)
+
+    def columns(self) -> List[str]:
+        return self.operand.columns()
+
+
+# Bucket unit: (epoch divisor, label format).
+_BUCKETS = {
+    'hour': (HOUR_US, '%Y-%m-%dT%H'),
+    'day': (DAY_US, '%Y-%m-%d'),
+    'month': (DAY_US, '%Y-%m'),
+    'year': (DAY_US, '%Y'),
+}
+
+
+class Bucket(Expr):
+    def __init__(self, operand: Expr, unit: str) -> None:
+        if unit not in _BUCKETS:
+            raise ValueError(f"Unsupported bucket unit '{unit}'. Expected one of {tuple(_BUCKETS)}.")
+        self.operand = operand
+        self.unit = unit
+
+    def __repr__(self) -> str:
+        return f"{self.operand!r}.bucket({self.unit!r})"
+
+    def evaluate(self, df) -> Iterable[Any]:
+        step, fmt = _BUCKETS[self.unit]
+        periods = [us // step if us != NULL_EPOCH else None for us in _as_timestamps(self.operand, df).epochs]
+        labels = {p: from_epoch(p * step).strftime(fmt) if p is not None else None for p in set(periods)}
+        return Column(map(labels.__getitem__, periods), dtype=CATEGORY)
+
+    def columns(self) -> List[str]:
+        return self.operand.columns()
+
+
+def col(name: str) -> Expr:
+    """
+    Returns an expression referencing the column `name`.
+    """
+    return ColumnRef(name)
+
+
+def lit(value: Any) -> Expr:
+    """
+    Returns an expression holding the constant `value` for every row.
+    """
+    return Literal(value)
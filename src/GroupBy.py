@@ -0,0 +1,320 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from Column import INT64, FLOAT64, STRING, CATEGORY
+from DataFrame import DataFrame
+
+# Aggregation specs are `output_name=(column, function)`, as in
+# `df.groupby('genre').agg(views=('genre', 'count'), revenue=('value', 'sum'))`.
+AggSpec = Tuple[str, str]
+
+_NULL_FREE_DTYPES = (INT64, FLOAT64, STRING)
+
+
+# ---------------------------------------------------------------- kernels ----
+# Each kernel folds one column into one state per group, given the group id of
+# every row. States are plain Python values so partial results pickle cheaply.
+
+def _count(ids: List[int], values: Iterable[Any], num_groups: int, dtype: Optional[str]) -> List[int]:
+    counts = [0] * num_groups
+    if dtype in _NULL_FREE_DTYPES:
+        for g in ids:
+            counts[g] += 1
+    else:
+        for g, v in zip(ids, values):
+            if v is not None:
+                counts[g] += 1
+    return counts
+
+
+def _size(ids: List[int], values: Iterable[Any], num_groups: int, dtype: Optional[str]) -> List[int]:
+    return _count(ids, values, num_groups, STRING)
+
+
+def _sum(ids: List[int], values: Iterable[Any], num_groups: int, dtype: Optional[str]) -> List[Any]:
+    sums = [0] * num_groups
+    for g, v in zip(ids, values):
+        if v is not None:
+            sums[g] += v
+    return sums
+
+
+def _min(ids: List[int], values: Iterable[Any], num_groups: int, dtype: Optional[str]) -> List[Any]:
+    mins = [None] * num_groups
+    for g, v in zip(ids, values):
+        if v is not None:
+            cur = mins[g]
+            if cur is None or v < cur:
+                mins[g] = v
+    return mins
+
+
+def _max(ids: List[int], values: Iterable[Any], num_groups: int, dtype: Optional[str]) -> List[Any]:
+    maxs = [None] * num_groups
+    for g, v in zip(ids, values):
+        if v is not None:
+            cur = maxs[g]
+            if cur is None or v > cur:
+                maxs[g] = v
+    return maxs
+
+
+def _mean(ids: List[int], values: Iterable[Any], num_groups: int, dtype: Optional[str]) -> List[List[Any]]:
+    values = list(values)
+    return [list(pair) for pair in zip(_sum(ids, values, num_groups, dtype),
+                                       _count(ids, values, num_groups, dtype))]
+
+
+def _first(ids: List[int], values: Iterable[Any], num_groups: int, dtype: Optional[str]) -> List[Any]:
+    firsts = [None] * num_groups
+    seen = [False] * num_groups
+    for g, v in zip(ids, values):
+        if not seen[g]:
+            seen[g] = True
+            firsts[g] = v
+    return firsts
+
+
+def _merge_min(a: Any, b: Any) -> Any:
+    return b if a is None or (b is not None and b < a) else a
+
+
+def _merge_max(a: Any, b: Any) -> Any:
+    return b if a is None or (b is not None and b > a) else a
+
+
+def _finalize_mean(state: List[Any]) -> Optional[float]:
+    total, count = state
+    return total / count if count else None
+
+
+def _identity(state: Any) -> Any:
+    return state
+
+
+# function name -> (kernel, merge two states, final value from state)
+_AGGREGATIONS: Dict[str, Tuple[Callable, Callable[[Any, Any], Any], Callable[[Any], Any]]] = {
+    'count': (_count, lambda a, b: a + b, _identity),
+    'size':  (_size,  lambda a, b: a + b, _identity),
+    'sum':   (_sum,   lambda a, b: a + b, _identity),
+    'min':   (_min,   _merge_min, _identity),
+    'max':   (_max,   _merge_max, _identity),
+    'mean':  (_mean,  lambda a, b: [a[0] + b[0], a[1] + b[1]], _finalize_mean),
+    'first': (_first, lambda a, b: a, _identity),
+}
+
+
+class PartialAggregate:
+    """
+    Mergeable per-group aggregation states.
+
+    Workers compute a `PartialAggregate` over their chunk and send it back; the
+    parent merges partials (cost proportional to the number of groups, not rows)
+    and finalizes once with `to_dataframe`.
+
+    Attributes:
+        keys (List[str]): Names of the key columns.
+        specs (Dict[str, AggSpec]): Output column name to `(column, function)`.
+        groups (Dict[Any, List[Any]]): Group key (a tuple for multi-column keys)
+            to one state per aggregation, in `specs` order.
+    """
+
+    def __init__(self, keys: List[str], specs: Dict[str, AggSpec], groups: Optional[Dict[Any, List[Any]]] = None) -> None:
+        self.keys = list(keys)
+        self.specs = dict(specs)
+        self.groups = groups if groups is not None else {}
+
+    def __len__(self) -> int:
+        return len(self.groups)
+
+    def __repr__(self) -> str:
+        return f"PartialAggregate(keys={self.keys}, aggregations={list(self.specs)}, groups={len(self.groups)})"
+
+    def merge(self, other: 'PartialAggregate') -> 'PartialAggregate':
+        """
+        Merges the states of `other` into this partial, in place.
+
+        Args:
+            other (PartialAggregate): A partial computed with the same keys and specs.
+
+        Returns:
+            PartialAggregate: `self`, to allow chaining.
+
+        Raises:
+            ValueError: If the partials were computed with different keys or specs.
+        """
+        if other.keys != self.keys or other.specs != self.specs:
+            raise ValueError("Only partial aggregates with the same keys and aggregations can be merged.")
+        mergers = [_AGGREGATIONS[fn][1] for _, fn in self.specs.values()]
+        groups = self.groups
+        for key, states in other.groups.items():
+            current = groups.get(key)
+            if current is None:
+                groups[key] = list(states)
+            else:
+                groups[key] = [merge(a, b) for merge, a, b in zip(mergers, current, states)]
+        return self
+
+    @classmethod
+    def combine(cls, partials: Iterable['PartialAggregate']) -> Optional['PartialAggregate']:
+        """
+        Merges any number of partials into a new one (None if `partials` is empty).
+        """
+        combined = None
+        for partial in partials:
+            if combined is None:
+                combined = cls(partial.keys, partial.specs, {k: list(v) for k, v in partial.groups.items()})
+            else:
+                combined.merge(partial)
+        return combined
+
+    def to_dataframe(self) -> DataFrame:
+        """
+        Finalizes the states into a DataFrame with the key columns followed by
+        one column per aggregation.
+        """
+        keys = list(self.groups.keys())
+        data: Dict[str, List[Any]] = {}
+        if len(self.keys) == 1:
+            data[self.keys[0]] = keys
+        else:
+            key_columns = list(zip(*keys)) if keys else [()] * len(self.keys)
+            for name, values in zip(self.keys, key_columns):
+                data[name] = list(values)
+
+        states = list(self.groups.values())
+        for i, (out, (_, fn)) in enumerate(self.specs.items()):
+            finalize = _AGGREGATIONS[fn][2]
+            data[out] = [finalize(s[i]) for s in states]
+        return DataFrame.from_columns(data)
+
+    @classmethod
+    def from_dataframe(cls, df: DataFrame, keys: List[str], specs: Dict[str, AggSpec]) -> 'PartialAggregate':
+        """
+        Rebuilds a partial from the output of `to_dataframe`, e.g. aggregation
+        state persisted by a previous run, so it can be merged with new partials.
+
+        Args:
+            df (DataFrame): Key columns plus one column per aggregation in `specs`.
+            keys (List[str]): Names of the key columns.
+            specs (Dict[str, AggSpec]): The aggregations `df` was finalized from.
+
+        Returns:
+            PartialAggregate: A partial with one group per row of `df`.
+
+        Raises:
+            ValueError: If an aggregation's final value is not its state ('mean').
+        """
+        for _, fn in specs.values():
+            if _AGGREGATIONS[fn][2] is not _identity:
+                raise ValueError(f"Aggregation '{fn}' cannot be rebuilt from its final value.")
+        key_values = df[keys[0]] if len(keys) == 1 else zip(*(df[k] for k in keys))
+        states = zip(*(df[out] for out in specs)) if specs else ([] for _ in range(len(df)))
+        return cls(keys, specs, {key: list(state) for key, state in zip(key_values, states)})
+
+
+class GroupBy:
+    """
+    Hash group-by over one or more key columns of a DataFrame.
+
+    Each row is assigned a dense group id with a single hash pass over the key
+    columns; every aggregation then folds its column into per-group states.
+    `category` key columns are hashed by their integer codes and only the
+    distinct keys are decoded.
+    """
+
+    def __init__(self, df: DataFrame, keys: str | Sequence[str], rows: Optional[List[int]] = None) -> None:
+        """
+        Args:
+            df (DataFrame): The DataFrame to group.
+            keys (str | Sequence[str]): The key column name(s).
+            rows (Optional[List[int]]): Positions of the rows to aggregate, e.g. the
+                output of `Expr.indices`. Only the key and aggregated columns are
+                gathered, so a filter followed by an aggregation never materializes
+                the filtered DataFrame. Defaults to None (every row).
+
+        Raises:
+            KeyError: If a key column does not exist.
+            ValueError: If no key column is given.
+        """
+        keys = [keys] if isinstance(keys, str) else list(keys)
+        if not keys:
+            raise ValueError("At least one key column is required to group a DataFrame.")
+        for key in keys:
+            if key not in df.columns:
+                raise KeyError(f"Column '{key}' does not exist in the DataFrame.")
+        self._df = df
+        self._keys = keys
+        self._rows = rows
+
+    def _column(self, name: str):
+        column = self._df[name]
+        return column if self._rows is None else column.take(self._rows)
+
+    def _group_ids(self) -> Tuple[List[int], List[Any]]:
+        columns = [self._column(k) for k in self._keys]
+        dictionaries = [c.categories if c.dtype == CATEGORY else None for c in columns]
+        key_columns = [c.codes if c.dtype == CATEGORY else c for c in columns]
+        key_values = key_columns[0] if len(key_columns) == 1 else zip(*key_columns)
+
+        groups: Dict[Any, int] = {}
+        ids = [groups.setdefault(k, len(groups)) for k in key_values]
+        keys = list(groups.keys())
+        if len(columns) == 1:
+            if dictionaries[0] is not None:
+                keys = [dictionaries[0][code] for code in keys]
+        elif any(d is not None for d in dictionaries):
+            keys = [tuple(v if d is None else d[v] for d, v in zip(dictionaries, key)) for key in keys]
+        return ids, keys
+
+    def partial(self, **aggregations: AggSpec) -> PartialAggregate:
+        """
+        Computes mergeable per-group states, e.g. in a worker process.
+
+        Args:
+            **aggregations (AggSpec): `output_name=(column, function)` with function
+                one of `count` (non-null values), `size` (rows), `sum`, `mean`,
+                `min`, `max` or `first`.
+
+        Returns:
+            PartialAggregate: The per-group states.
+
+        Raises:
+            KeyError: If an aggregated column does not exist.
+            ValueError: If an aggregation function is not supported.
+        """
+        for out, (column, fn) in aggregations.items():
+            if fn not in _AGGREGATIONS:
+                raise ValueError(f"Unsupported aggregation '{fn}' for '{out}'. Expected one of {sorted(_AGGREGATIONS)}.")
+            if column not in self._df.columns:
+                raise KeyError(f"Column '{column}' does not exist in the DataFrame.")
+
+        ids, keys = self._group_ids()
+        per_aggregation = []
+        for column, fn in aggregations.values():
+            values = self._column(column)
+            per_aggregation.append(_AGGREGATIONS[fn][0](ids, values, len(keys), values.dtype))
+
+        groups = {key: [states[g] for states in per_aggregation] for g, key in enumerate(keys)}
+        return PartialAggregate(self._keys, aggregations, groups)
+
+    def agg(self, **aggregations: AggSpec) -> DataFrame:
+        """
+        Aggregates each group and returns one row per group.
+
+        Example:
+            `df.groupby(['date']).agg(revenue=('value', 'sum'), orders=('value', 'count'))`
+
+        Args:
+            **aggregations (AggSpec): `output_name=(column, function)`, see `partial`.
+
+        Returns:
+            DataFrame: Key columns followed by one column per aggregation, with
+                groups in order of first appearance.
+        """
+        return self.partial(**aggregations).to_dataframe()
+
+    def count(self, name: str = 'count') -> DataFrame:
+        """
+        Returns the number of rows in each group, in a column called `name`.
+        """
+        return self.agg(**{name: (self._keys[0], 'size')})
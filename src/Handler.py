@@ -1,150 +1,146 @@
 from datetime import datetime, timedelta, timezone
 from typing import List, Dict, Any, Tuple
-from collections import defaultdict
 from DataFrame import DataFrame
+from Expression import col
+from GroupBy import PartialAggregate
+from Join import JoinIndex, join
+from Query import Query
+from Column import Column, INT64, FLOAT64, TIMESTAMP
 import os
 
 # ======================== Handler: Value Count ========================
 
+def _numeric(df: DataFrame, column: str) -> DataFrame:
+    # Columns read from CSV hold strings; aggregate them as floats.
+    if df[column].dtype in (INT64, FLOAT64):
+        return df
+    return df.with_column(column, Column(df[column], dtype=FLOAT64))
+
+def _timestamps(df: DataFrame, column: str) -> DataFrame:
+    # Converte as strings ISO uma única vez; filtros e buckets usam o epoch inteiro.
+    if df[column].dtype == TIMESTAMP:
+        return df
+    return df.parse_timestamps([column])
+
+# Casas decimais consideradas nas somas antes de truncar (o resto é erro de ponto flutuante)
+SUM_DECIMALS = 6
+
 class HandlerValueCount:
     WINDOW_HOURS = int(os.getenv("EVENT_WINDOW", "1"))
+    EVENT_COUNT_SPEC = {"quantidade": ("event", "size")}
 
-    def count_events_last_hour(self, df: DataFrame) -> DataFrame:
+    def count_events_partial(self, df: DataFrame) -> PartialAggregate:
         if len(df) == 0:
-            return DataFrame(columns=["event", "quantidade"])
+            return PartialAggregate(["event"], self.EVENT_COUNT_SPEC)
 
         time_col  = "time"  if "time"  in df.columns else "timestamp"
         event_col = "event" if "event" in df.columns else "event_type"
 
         cutoff = datetime.now(timezone.utc) - timedelta(hours=self.WINDOW_HOURS)
-        counts: Dict[Any, int] = {}
+        recent = df.where(col(time_col).to_timestamp() >= cutoff)
+        if event_col != "event":
+            recent.rename_column(event_col, "event")
 
-        for i in range(len(df)):
-            raw_ts = df[time_col][i].replace("Z", "+00:00")
-            ts = datetime.fromisoformat(raw_ts).astimezone(timezone.utc)
-            if ts >= cutoff:
-                ev = df[event_col][i]
-                counts[ev] = counts.get(ev, 0) + 1
+        return recent.groupby("event").partial(**self.EVENT_COUNT_SPEC)
 
-        out = DataFrame(columns=["event", "quantidade"])
-        for ev, q in counts.items():
-            out.add_row([ev, q])
-        return out
+    def count_events_last_hour(self, df: DataFrame) -> DataFrame:
+        return self.count_events_partial(df).to_dataframe()
 
-    def group_by_sum(self, df: DataFrame, group_col: str, sum_col: str) -> DataFrame:
+    def sum_by(self, df: DataFrame, group_col: str, sum_col: str) -> DataFrame:
+        # Somas exatas (float para valores fracionários): é o que o estado acumulado guarda
         if not isinstance(df, DataFrame):
             raise TypeError("Argument `df` must be a DataFrame object.")
 
         if group_col not in df.columns or sum_col not in df.columns:
             raise ValueError("Grouping or summing column not found in DataFrame.")
 
-        grouped_data: Dict[Any, float] = {}
-        for i in range(len(df)):
-            key = df[group_col][i]
-            value = float(df[sum_col][i])
-            grouped_data[key] = grouped_data.get(key, 0.0) + value
-
-        result_df = DataFrame(columns=[group_col, sum_col])
-        for key, total_sum in grouped_data.items():
-            result_df.add_row([key, int(total_sum)])
+        return _numeric(df, sum_col).groupby(group_col).agg(**{sum_col: (sum_col, "sum")})
 
-        return result_df
+    def group_by_sum(self, df: DataFrame, group_col: str, sum_col: str) -> DataFrame:
+        # Totais inteiros (truncados). Somas parciais mescladas em outra ordem diferem
+        # no último bit (29549.9999... em vez de 29550.0): arredonda esse ruído antes.
+        sums = self.sum_by(df, group_col, sum_col)
+        return DataFrame.from_columns({
+            group_col: sums[group_col],
+            sum_col: [int(round(total_sum, SUM_DECIMALS)) for total_sum in sums[sum_col]],
+        })
 
 # ======================== Handler: Revenue ========================
 
 class RevenueAnalyzer:
+    REVENUE_SPEC = {"revenue": ("value", "sum")}
+
     def __init__(self, df: DataFrame):
-        self.df = df
+        # `date` é convertida uma vez e reaproveitada pelos três buckets
+        self.df = _timestamps(_numeric(df, "value"), "date") if len(df) else df
+
+    def _revenue_partial(self, unit: str, key: str) -> PartialAggregate:
+        if len(self.df) == 0:
+            return PartialAggregate([key], self.REVENUE_SPEC)
+        keyed = self.df.with_column(key, col("date").bucket(unit))
+        return keyed.groupby(key).partial(**self.REVENUE_SPEC)
 
-    def _parse_date(self, date_str: str) -> datetime:
-        return datetime.strptime(date_str, "%Y-%m-%d")
+    def _analyze_revenue(self, unit: str) -> Dict[str, float]:
+        result = self._revenue_partial(unit, "period").to_dataframe()
+        return dict(zip(result["period"], result["revenue"]))
 
-    def _analyze_revenue(self, time_format: str) -> Dict[str, float]:
-        revenue = defaultdict(float)
-        for i in range(len(self.df)):
-            date_str = self.df["date"][i]
-            value = float(self.df["value"][i])
-            date = self._parse_date(date_str)
-            key = date.strftime(time_format)
-            revenue[key] += value
-        return dict(revenue)
+    def partial_revenue_by_day(self) -> PartialAggregate:
+        return self._revenue_partial('day', 'date')
+
+    def partial_revenue_by_month(self) -> PartialAggregate:
+        return self._revenue_partial('month', 'month')
+
+    def partial_revenue_by_year(self) -> PartialAggregate:
+        return self._revenue_partial('year', 'year')
 
     def analyze_revenue_by_day(self) -> Dict[str, float]:
-        return self._analyze_revenue('%Y-%m-%d')
+        return self._analyze_revenue('day')
 
     def analyze_revenue_by_month(self) -> Dict[str, float]:
-        return self._analyze_revenue('%Y-%m')
+        return self._analyze_revenue('month')
 
     def analyze_revenue_by_year(self) -> Dict[str, float]:
-        return self._analyze_revenue('%Y')
+        return self._analyze_revenue('year')
 
 # ======================== Handler: Join ========================
 
 class HandlerJoin:
-    def join(self, left_df: DataFrame, right_df: DataFrame, left_on: str, right_on: str, select_cols_right: List[str]) -> DataFrame:
-        if len(left_df) == 0 or len(right_df) == 0:
+    def join(self, left_df: DataFrame, right_df: DataFrame | JoinIndex, left_on: str, right_on: str, select_cols_right: List[str]) -> DataFrame:
+        right_len = len(right_df.df) if isinstance(right_df, JoinIndex) else len(right_df)
+        if len(left_df) == 0 or right_len == 0:
             return DataFrame(columns=left_df.columns + select_cols_right)
 
-        lookup = {
-            right_df[right_on][i]: {col: right_df[col][i] for col in select_cols_right}
-            for i in range(len(right_df))
-        }
-
-        joined = DataFrame(columns=left_df.columns + select_cols_right)
-        for i in range(len(left_df)):
-            key = left_df[left_on][i]
-            right_data = lookup.get(key, {col: 'unknown' for col in select_cols_right})
-            joined_row = list(left_df[i].values()) + [right_data[col] for col in select_cols_right]
-            joined.add_row(joined_row)
-
-        return joined
+        return join(left_df, right_df, left_on, how='left', right_on=right_on,
+                    columns=select_cols_right, fill_value='unknown')
 
 class HandlerJoinContent:
-    def join(self, vh_df: DataFrame, content_df: DataFrame) -> DataFrame:
-        if len(vh_df) == 0 or len(content_df) == 0:
-            return DataFrame(columns=vh_df.columns + ['content_genre'])
-
-        genre_lookup = {content_df['content_id'][i]: content_df['content_genre'][i]
-                        for i in range(len(content_df))}
-
-        joined = DataFrame(columns=vh_df.columns + ['content_genre'])
-        for i in range(len(vh_df)):
-            cid = vh_df['content_id'][i]
-            genre = genre_lookup.get(cid, 'unknown')
-            joined.add_row(list(vh_df[i].values()) + [genre])
-        return joined
+    # `content` pode ser um JoinIndex pré-construído, reutilizado entre chunks
+    def join(self, vh_df: DataFrame, content: DataFrame | JoinIndex) -> DataFrame:
+        return HandlerJoin().join(vh_df, content, 'content_id', 'content_id', ['content_genre'])
 
 def join_chunk_worker(args: tuple) -> DataFrame:
     chunk_df, right_df, left_on, right_on, select_cols_right = args
-    lookup = {
-        right_df[right_on][i]: {col: right_df[col][i] for col in select_cols_right}
-        for i in range(len(right_df))
-    }
-    joined_cols = chunk_df.columns + select_cols_right
-    joined_df = DataFrame(columns=joined_cols)
-    for i in range(len(chunk_df)):
-        key = chunk_df[left_on][i]
-        right_data = lookup.get(key, {col: 'unknown' for col in select_cols_right})
-        joined_row = list(chunk_df[i].values()) + [right_data[col] for col in select_cols_right]
-        joined_df.add_row(joined_row)
-    return joined_df
+    return HandlerJoin().join(chunk_df, right_df, left_on, right_on, select_cols_right)
 
 # ======================== Handler: Sorting and Filtering ========================
 
 class HandlerSort:
-    def __init__(self, column: str, reverse: bool = False):
+    # `limit` mantém só as `limit` primeiras linhas (ranking), via heap em vez de ordenar tudo
+    def __init__(self, column: str | list[str], reverse: bool = False, limit: int | None = None):
         self.column = column
         self.reverse = reverse
+        self.limit = limit
 
     def sort(self, df: DataFrame) -> DataFrame:
-        if self.column not in df.columns:
-            raise ValueError(f"Coluna '{self.column}' não encontrada no DataFrame.")
+        columns = [self.column] if isinstance(self.column, str) else self.column
+        for name in columns:
+            if name not in df.columns:
+                raise ValueError(f"Coluna '{name}' não encontrada no DataFrame.")
 
-        indices = sorted(range(len(df)), key=lambda i: df[self.column][i], reverse=self.reverse)
-        sorted_df = DataFrame(columns=df.columns)
-        for i in indices:
-            sorted_df.add_row([df[col][i] for col in df.columns])
-        return sorted_df
+        if self.limit is not None:
+            top = df.nlargest if self.reverse else df.nsmallest
+            return top(self.limit, columns)
+        return df.sort_values(columns, ascending=not self.reverse)
 
 class HandlerDateFilter:
     def __init__(self, days: int | None):
@@ -154,46 +150,34 @@ class HandlerDateFilter:
         if self.days is None or len(df) == 0:
             return df
         cutoff = datetime.now() - timedelta(days=self.days)
-        keep = DataFrame(columns=df.columns)
-        for i in range(len(df)):
-            start = datetime.fromisoformat(df['start_date'][i])
-            if start >= cutoff:
-                keep.add_row(list(df[i].values()))
-        return keep
+        return df.where(col('start_date').to_timestamp() >= cutoff)
 
 # ======================== Handler: Grouping ========================
 
 class HandlerGroupByGenre:
     def group(self, df: DataFrame) -> DataFrame:
-        result = DataFrame(columns=['content_genre', 'views'])
-        counts = {}
-        for i in range(len(df)):
-            g = df['content_genre'][i]
-            counts[g] = counts.get(g, 0) + 1
-        for g, c in counts.items():
-            result.add_row([g, c])
-        return result
+        return df.groupby('content_genre').agg(views=('content_genre', 'size'))
 
 class HandlerUnfinishedByGenre:
-    def group(self, df: DataFrame) -> DataFrame:
-        sessions = {}
-        for i in range(len(df)):
-            key = (df['user_id'][i], df['content_id'][i])
-            event = df['event'][i]
-            genre = df['genre'][i]
-            if key not in sessions:
-                sessions[key] = {'events': [], 'genre': genre}
-            sessions[key]['events'].append(event)
-
-        genre_counts = {}
-        for sess in sessions.values():
-            events = sess['events']
-            genre = sess['genre']
-            if 'play' in events or 'pause' in events:
-                if 'stop' not in events:
-                    genre_counts[genre] = genre_counts.get(genre, 0) + 1
-
-        result = DataFrame(columns=['content_genre', 'unfinished_views'])
-        for genre, count in genre_counts.items():
-            result.add_row([genre, count])
+    SESSION_KEYS = ['user_id', 'content_id']
+    SESSION_SPEC = {'genre': ('genre', 'first'), 'started': ('_started', 'max'), 'stopped': ('_stopped', 'max')}
+
+    def session_query(self, views: Query) -> Query:
+        """Agregação por sessão (user_id, content_id) como etapas de um `Query` com colunas event/genre."""
+        return (views.with_column('_started', col('event').isin(['play', 'pause']))
+                     .with_column('_stopped', col('event') == 'stop')
+                     .groupby(self.SESSION_KEYS).agg(**self.SESSION_SPEC))
+
+    def session_partial(self, df: DataFrame) -> PartialAggregate:
+        """Estado mesclável por sessão (user_id, content_id); chunks diferentes podem ser combinados."""
+        return self.session_query(Query.from_dataframe(df, max(1, len(df)))).partial()
+
+    def count_unfinished(self, sessions: PartialAggregate) -> DataFrame:
+        sessions_df = sessions.to_dataframe()
+        unfinished = sessions_df.where(col('started') & ~col('stopped'))
+        result = unfinished.groupby('genre').agg(unfinished_views=('genre', 'size'))
+        result.rename_column('genre', 'content_genre')
         return result
+
+    def group(self, df: DataFrame) -> DataFrame:
+        return self.count_unfinished(self.session_partial(df))
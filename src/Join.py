@@ -0,0 +1,169 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from Column import Column, CATEGORY
+from DataFrame import DataFrame
+
+JOIN_MODES = ('inner', 'left', 'semi')
+
+
+def _key_values(df: DataFrame, keys: List[str]) -> Iterable[Any]:
+    if len(keys) == 1:
+        return df[keys[0]]
+    return zip(*(df[k] for k in keys))
+
+
+class JoinIndex:
+    """
+    Hash index over the build side of a join, built once and probed many times.
+
+    A worker can build the index for a dimension table (e.g. Content) once and
+    join every incoming chunk against it without rebuilding the lookup.
+
+    Attributes:
+        df (DataFrame): The indexed (build-side) DataFrame.
+        keys (List[str]): The indexed key column(s).
+        unique (bool): True if every key maps to exactly one row.
+        lookup (Dict[Any, int | List[int]]): Key (a tuple for composite keys) to
+            its row position, or to the list of row positions if not unique.
+    """
+
+    def __init__(self, df: DataFrame, on: str | Sequence[str]) -> None:
+        """
+        Args:
+            df (DataFrame): The build-side DataFrame.
+            on (str | Sequence[str]): The key column name(s).
+
+        Raises:
+            KeyError: If a key column does not exist in `df`.
+        """
+        keys = [on] if isinstance(on, str) else list(on)
+        for key in keys:
+            if key not in df.columns:
+                raise KeyError(f"Column '{key}' does not exist in the DataFrame to index.")
+        self.df = df
+        self.keys = keys
+
+        positions: Dict[Any, int] = {}
+        duplicates: Dict[Any, List[int]] = {}
+        for j, key in enumerate(_key_values(df, keys)):
+            first = positions.setdefault(key, j)
+            if first != j:
+                duplicates.setdefault(key, [first]).append(j)
+
+        self.unique = not duplicates
+        if self.unique:
+            self.lookup = positions
+        else:
+            self.lookup = {key: duplicates.get(key, [j]) for key, j in positions.items()}
+
+    def __len__(self) -> int:
+        return len(self.lookup)
+
+    def __repr__(self) -> str:
+        return f"JoinIndex(on={self.keys}, keys={len(self.lookup)}, rows={len(self.df)}, unique={self.unique})"
+
+    def probe(self, left: DataFrame, left_on: Optional[str | Sequence[str]] = None, how: str = 'inner'):
+        """
+        Matches the rows of `left` against the index.
+
+        Args:
+            left (DataFrame): The probe-side DataFrame.
+            left_on (Optional[str | Sequence[str]]): Probe key column(s), one per
+                indexed key. Defaults to the indexed key names.
+            how (str): `inner` (matching pairs), `left` (every left row, None when
+                unmatched) or `semi` (left rows with at least one match).
+
+        Returns:
+            Tuple[List[int], Optional[List[Optional[int]]]]: Left row positions and
+                the matching build-side positions (None for `semi`).
+
+        Raises:
+            ValueError: If `how` is not supported or the key counts differ.
+        """
+        if how not in JOIN_MODES:
+            raise ValueError(f"Unsupported join mode '{how}'. Expected one of {JOIN_MODES}.")
+        left_keys = self.keys if left_on is None else ([left_on] if isinstance(left_on, str) else list(left_on))
+        if len(left_keys) != len(self.keys):
+            raise ValueError(f"Expected {len(self.keys)} probe key column(s), got {len(left_keys)}.")
+        for key in left_keys:
+            if key not in left.columns:
+                raise KeyError(f"Column '{key}' does not exist in the probe DataFrame.")
+
+        get = self.lookup.get
+        probe_column = left[left_keys[0]] if len(left_keys) == 1 else None
+        if probe_column is not None and probe_column.dtype == CATEGORY:
+            # Look each category up once, then resolve the rows by code.
+            per_code = list(map(get, probe_column.categories))
+            matches = list(map(per_code.__getitem__, probe_column.codes))
+        else:
+            matches = list(map(get, _key_values(left, left_keys)))
+
+        if how == 'semi':
+            return [i for i, m in enumerate(matches) if m is not None], None
+
+        if self.unique:
+            if how == 'left':
+                return list(range(len(left))), matches
+            left_idx = [i for i, m in enumerate(matches) if m is not None]
+            return left_idx, [matches[i] for i in left_idx]
+
+        left_idx: List[int] = []
+        right_idx: List[Optional[int]] = []
+        for i, m in enumerate(matches):
+            if m is not None:
+                left_idx.extend([i] * len(m))
+                right_idx.extend(m)
+            elif how == 'left':
+                left_idx.append(i)
+                right_idx.append(None)
+        return left_idx, right_idx
+
+
+def _gather(column: Column, indices: List[Optional[int]], fill_value: Any) -> Column:
+    if None not in indices:
+        return column.take(indices)
+    return Column([fill_value if j is None else column[j] for j in indices],
+                  dtype=CATEGORY if column.dtype == CATEGORY else None)
+
+
+def join(left: DataFrame, right: DataFrame | JoinIndex, on: Optional[str | Sequence[str]] = None,
+         how: str = 'inner', right_on: Optional[str | Sequence[str]] = None,
+         columns: Optional[List[str]] = None, fill_value: Any = None) -> DataFrame:
+    """
+    Hash-joins `left` with `right`, gathering the output column by column.
+
+    Args:
+        left (DataFrame): The probe-side DataFrame.
+        right (DataFrame | JoinIndex): The build side, or a prebuilt index over it.
+        on (Optional[str | Sequence[str]]): Key column(s) of `left`. Defaults to the
+            keys of `right` when it is a `JoinIndex`.
+        how (str): `inner`, `left` or `semi`. Defaults to `inner`.
+        right_on (Optional[str | Sequence[str]]): Key column(s) of `right` when it is
+            a DataFrame and they are named differently. Defaults to `on`.
+        columns (Optional[List[str]]): Right-side columns to include. Defaults to
+            every right column except its keys. Ignored for `semi`.
+        fill_value (Any): Value for right-side columns of unmatched rows in a `left`
+            join. Defaults to None.
+
+    Returns:
+        DataFrame: The left columns followed by the selected right columns. Right
+            columns whose name already exists on the left get a `_right` suffix.
+    """
+    if isinstance(right, JoinIndex):
+        index = right
+    else:
+        build_keys = right_on if right_on is not None else on
+        if build_keys is None:
+            raise ValueError("Join keys must be given when joining with a DataFrame.")
+        index = JoinIndex(right, build_keys)
+    left_idx, right_idx = index.probe(left, on, how)
+
+    data = {name: left[name].take(left_idx) for name in left.columns}
+    if how != 'semi':
+        build = index.df
+        if columns is None:
+            columns = [c for c in build.columns if c not in index.keys]
+        for name in columns:
+            out = name if name not in data else f"{name}_right"
+            data[out] = _gather(build[name], right_idx, fill_value)
+    return DataFrame._from_column_objects(data, len(left_idx))
@@ -0,0 +1,124 @@
+import os
+import sqlite3
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from ColumnarFile import dumps_columnar, loads_columnar
+from DataFrame import DataFrame
+
+class OffsetStore:
+    """
+    Progresso incremental por (consumidor, tabela de origem), em uma tabela SQLite.
+
+    A leitura incremental só *prepara* o novo offset (`stage`); ele vale a
+    partir de `commit`, chamado pela etapa depois de gravar as saídas que
+    produziu. Todos os offsets preparados de um consumidor são gravados numa
+    única transação: se a etapa falhar antes, a próxima execução relê a partir
+    do último offset confirmado.
+
+    Os valores mantêm o tipo original (rowid inteiro, data ISO como texto), de
+    modo que a comparação com a coluna no SELECT é a mesma do SQLite.
+
+    O estado acumulado pelo consumidor (totais, sessões abertas) fica no mesmo
+    banco, como DataFrames no formato colunar (`stage_state`/`load_state`), e
+    entra na mesma transação dos offsets: um estado nunca é gravado sem o
+    offset das linhas que ele já contou, nem o contrário. Uma falha entre os
+    dois não faz a próxima execução contar o mesmo lote duas vezes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._pending: Dict[Tuple[str, str], Any] = {}
+        self._pending_states: Dict[Tuple[str, str], DataFrame] = {}
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS offsets (
+                    consumer   TEXT NOT NULL,
+                    source     TEXT NOT NULL,
+                    value,
+                    updated_at TEXT NOT NULL,
+                    PRIMARY KEY (consumer, source)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS states (
+                    consumer   TEXT NOT NULL,
+                    name       TEXT NOT NULL,
+                    data       BLOB NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    PRIMARY KEY (consumer, name)
+                )
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, consumer: str, source: str, default: Any = None) -> Any:
+        """Último offset confirmado de `consumer` em `source` (ou `default`)."""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT value FROM offsets WHERE consumer = ? AND source = ?",
+                               (consumer, source)).fetchone()
+        finally:
+            conn.close()
+        return default if row is None else row[0]
+
+    def stage(self, consumer: str, source: str, value: Any) -> None:
+        """Prepara o novo offset; só é gravado no `commit` do consumidor."""
+        self._pending[(consumer, source)] = value
+
+    def staged(self, consumer: str, source: str) -> Any:
+        """Offset preparado e ainda não confirmado (None se não houver)."""
+        return self._pending.get((consumer, source))
+
+    def load_state(self, consumer: str, name: str) -> Optional[DataFrame]:
+        """Último estado `name` confirmado por `consumer` (None se nunca foi gravado)."""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT data FROM states WHERE consumer = ? AND name = ?",
+                               (consumer, name)).fetchone()
+        finally:
+            conn.close()
+        return None if row is None else loads_columnar(row[0])
+
+    def stage_state(self, consumer: str, name: str, state: DataFrame) -> None:
+        """Prepara o novo estado `name`; é gravado junto com os offsets no `commit`."""
+        self._pending_states[(consumer, name)] = state
+
+    def commit(self, consumer: str) -> int:
+        """
+        Grava, numa única transação, todos os offsets e estados preparados de `consumer`.
+
+        Returns:
+            Número de offsets e estados gravados.
+        """
+        staged = [(source, value) for (name, source), value in self._pending.items() if name == consumer]
+        states = [(name, state) for (owner, name), state in self._pending_states.items() if owner == consumer]
+        if not staged and not states:
+            return 0
+        now = datetime.now().isoformat(timespec="seconds")
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany("""
+                    INSERT INTO offsets (consumer, source, value, updated_at) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (consumer, source) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at
+                """, [(consumer, source, value, now) for source, value in staged])
+                conn.executemany("""
+                    INSERT INTO states (consumer, name, data, updated_at) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (consumer, name) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at
+                """, [(consumer, name, dumps_columnar(state), now) for name, state in states])
+        finally:
+            conn.close()
+        self.discard(consumer)
+        return len(staged) + len(states)
+
+    def discard(self, consumer: str) -> None:
+        """Descarta os offsets e estados preparados de `consumer` (etapa abortada)."""
+        for key in [key for key in self._pending if key[0] == consumer]:
+            del self._pending[key]
+        for key in [key for key in self._pending_states if key[0] == consumer]:
+            del self._pending_states[key]
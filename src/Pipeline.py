@@ -1,16 +1,25 @@
-import sys, os, time, multiprocessing
-from multiprocessing import JoinableQueue
+import argparse, sys, os, time, multiprocessing
+from multiprocessing import JoinableQueue, Pool
 from datetime import datetime, timedelta
-from typing import Dict
+from typing import Callable, Dict, List, Tuple
 
 from Handler import HandlerValueCount, HandlerUnfinishedByGenre, RevenueAnalyzer
 from DataRepository import DataRepository
 from DataFrame import DataFrame
-from utils.timing import StageTimer, log_stage
+from Expression import col, lit
+from GroupBy import PartialAggregate
+from Query import Query
+from SharedDataFrame import SharedChunk, SharedDataFrame, as_dataframe
+from ColumnarFile import EXTENSION as COLUMNAR_EXTENSION
+from utils.timing import StageTimer, IpcMeter, log_stage, report_worker_memory, worker_reports, init_worker_reports
 
 # === CONFIG ===
 DEFAULT_NUM_PROCESSES = 4
 CHUNK_SIZE = 5_000
+# "workers": cada worker lê e agrega arquivos de log inteiros e devolve só a contagem parcial;
+# "parent": o processo pai lê os logs e envia os chunks (DataFrames) pela fila
+LOG_INGEST = os.getenv("LOG_INGEST", "workers")
+BACKENDS = ("python", "sql")
 
 OUTPUT_EVENT_CSV      = "event_count_last_hour.csv"
 OUTPUT_GENRE_CSV      = "genre_views_last_24h.csv"
@@ -19,399 +28,421 @@ OUTPUT_REVENUE_MONTH  = "revenue_by_month.csv"
 OUTPUT_REVENUE_YEAR   = "revenue_by_year.csv"
 OUTPUT_UNFINISHED_CSV = "unfinished_by_genre.csv"
 
-def _mk(path: str) -> str:
-    os.makedirs(os.path.dirname(path), exist_ok=True); return path
+# Estado de sessões da etapa 4, mesclado a cada execução
+UNFINISHED_SESSIONS   = "unfinished_sessions" + COLUMNAR_EXTENSION
+
+# Consumidores no OffsetStore: cada etapa lê só as linhas após o próprio offset
+# (a etapa 1 registra os arquivos de log já contados) e guarda o estado acumulado
+# na mesma transação do offset
+EVENTS_CONSUMER     = "events"
+REVENUE_CONSUMER    = "revenue"
+GENRE_CONSUMER      = "genre"
+UNFINISHED_CONSUMER = "unfinished"
 
 BASE_DIR       = os.path.dirname(__file__)
-MARKER_DIR     = _mk(os.path.join(BASE_DIR, 'markers'))
-EVENT_MARKER   = _mk(os.path.join(MARKER_DIR, 'ViewHistory.marker'))
-GENRE_MARKER   = _mk(os.path.join(MARKER_DIR, 'Genre.marker'))
-REVENUE_MARKER = _mk(os.path.join(MARKER_DIR, 'Revenue.marker'))
-UNFINISHED_MARKER = _mk(os.path.join(MARKER_DIR,'Unfinished.marker'))
 
 DB_PATH        = os.path.join(BASE_DIR, '..', 'streaming_mock.db')
 TRANSFORMED_DIR= os.path.abspath(os.path.join(BASE_DIR, '..', 'transformed_data'))
 os.makedirs(TRANSFORMED_DIR, exist_ok=True)
 
-def chunk_dataframe(df: DataFrame, size: int):
-    total = len(df); start = 0
-    while start < total:
-        end = min(start + size, total)
-        chunk = DataFrame(columns=df._columns)
-        for i in range(start, end):
-            chunk.add_row([df._data[col][i] for col in df._columns])
-        yield chunk; start = end
+def _previous_state(repo: DataRepository, consumer: str, fname: str) -> DataFrame | None:
+    """
+    Estado confirmado de `consumer` no OffsetStore; versões anteriores o
+    deixavam num arquivo colunar ao lado do CSV (None se não houver nenhum).
+    """
+    state = repo.offsets.load_state(consumer, fname)
+    if state is not None:
+        return state
+    try:
+        return repo.read_columnar_to_dataframe(
+            os.path.join(TRANSFORMED_DIR, os.path.splitext(fname)[0] + COLUMNAR_EXTENSION), copy=True)
+    except FileNotFoundError:
+        return None
 
-def event_worker(tq, rq):
+def _accumulate(repo: DataRepository, consumer: str, acc: DataFrame, key: str, value: str,
+                fname: str) -> DataFrame:
+    """
+    Soma `acc` ao acumulado das execuções anteriores e prepara o novo estado
+    (somas exatas, formato colunar) para o `commit` de `consumer`, que o grava
+    na mesma transação do offset. O CSV é só a exportação (`_export_csv`),
+    feita depois do commit.
+    """
+    prev = _previous_state(repo, consumer, fname)
+    if prev is None:
+        # Estado de versões ainda mais antigas só existe em CSV
+        prev = repo.read_csv_to_dataframe(os.path.join(TRANSFORMED_DIR, fname), [key, value])
+    prev.vconcat(acc)
+    acc = HandlerValueCount().sum_by(prev, key, value)
+    repo.offsets.stage_state(consumer, fname, acc)
+    return acc
+
+def _export_csv(repo: DataRepository, acc: DataFrame, key: str, value: str, fname: str) -> None:
+    """Exporta o acumulado para o dashboard, com os totais truncados para inteiro."""
+    repo.save_dataframe_to_csv(HandlerValueCount().group_by_sum(acc, key, value),
+                               os.path.join(TRANSFORMED_DIR, fname))
+
+def _export_committed(repo: DataRepository, consumer: str, key: str, value: str, fname: str) -> bool:
+    """
+    Reexporta o CSV a partir do estado confirmado (etapa sem dados novos): uma
+    falha entre o commit e a exportação não deixa o CSV desatualizado.
+    """
+    state = repo.offsets.load_state(consumer, fname)
+    if state is None:
+        return False
+    _export_csv(repo, state, key, value, fname)
+    return True
+
+def _save_events(repo: DataRepository, partial: PartialAggregate) -> DataFrame:
+    acc = _accumulate(repo, EVENTS_CONSUMER, partial.to_dataframe(), "event", "quantidade", OUTPUT_EVENT_CSV)
+    repo.offsets.commit(EVENTS_CONSUMER)
+    _export_csv(repo, acc, "event", "quantidade", OUTPUT_EVENT_CSV)
+    return acc
+
+def event_worker(tq, rq, reports=None):
+    init_worker_reports(reports)
     h = HandlerValueCount()
     while True:
         df = tq.get(); tq.task_done()
         if df is None:
             break
-        rq.put(h.count_events_last_hour(df))
+        partial = h.count_events_partial(df)
+        report_worker_memory()
+        rq.put(partial)
+
+def count_log_range(task: tuple) -> tuple:
+    """
+    Worker: lê um trecho (path, byte_range) de um arquivo de log via mmap e conta
+    os eventos localmente. Devolve (task, parcial, None) ou (task, None, erro);
+    nada de DataFrame volta ao pai.
+    """
+    path, byte_range = task
+    h = HandlerValueCount()
+    partial = PartialAggregate(["event"], h.EVENT_COUNT_SPEC)
+    try:
+        for df in DataRepository().iter_log_chunks(path, CHUNK_SIZE, byte_range=byte_range):
+            partial.merge(h.count_events_partial(df))
+    except (OSError, ValueError) as exc:
+        return task, None, str(exc)
+    report_worker_memory()
+    return task, partial, None
 
 def process_event_counts(repo: DataRepository, nproc: int):
+    if LOG_INGEST == "parent":
+        return process_event_counts_from_queue(repo, nproc)
+
+    paths = repo.list_new_log_files()
+    # Arquivos já somados ao estado confirmado, mas não arquivados (falha entre o
+    # commit e a movimentação): só falta arquivá-los, sem contar de novo
+    counted = [p for p in paths if repo.offsets.get(EVENTS_CONSUMER, os.path.basename(p)) is not None]
+    if counted:
+        print(f"Archiving {repo.archive_log_files(counted)} log files counted by a previous run.")
+        paths = [p for p in paths if p not in counted]
+    if not paths:
+        print("  Nenhum log a processar na última hora.")
+        _export_committed(repo, EVENTS_CONSUMER, "event", "quantidade", OUTPUT_EVENT_CSV)
+        return
+    print(f"Found {len(paths)} new log files to process.")
+
+    # Arquivos grandes são divididos em intervalos de bytes alinhados a fim de
+    # linha, para ocuparem todos os workers; os pequenos viram um único intervalo.
+    tasks = []
+    for path in sorted(paths):
+        try:
+            tasks.extend((path, byte_range) for byte_range in repo.split_byte_ranges(path, nproc))
+        except OSError as exc:
+            print(f"Error processing file {path}: {exc}. Skipping file.")
+
+    partials: Dict[tuple, PartialAggregate] = {}
+    failed = set()
+    meter = IpcMeter("events", nproc)
+    with Pool(processes=nproc, initializer=init_worker_reports, initargs=(worker_reports(),)) as pool:
+        chunksize = max(1, len(tasks) // (nproc * 4))
+        for task, range_partial, error in pool.imap_unordered(count_log_range, meter.wrap(tasks), chunksize):
+            if error is not None:
+                print(f"Error processing file {task[0]}: {error}. Skipping file.")
+                failed.add(task[0])
+            else:
+                partials[task] = range_partial
+    meter.log()
+
+    # Um arquivo só conta se todos os seus intervalos foram lidos; a mescla segue
+    # a ordem dos arquivos e intervalos, independente de qual worker terminou primeiro.
+    partial = PartialAggregate(["event"], HandlerValueCount.EVENT_COUNT_SPEC)
+    processed = []
+    for task in tasks:
+        if task[0] in failed:
+            continue
+        partial.merge(partials[task])
+        if not processed or processed[-1] != task[0]:
+            processed.append(task[0])
+    if not processed:
+        return
+
+    # Os arquivos contados entram como offsets na mesma transação do acumulado e
+    # só são arquivados depois dela: uma falha antes do commit deixa os arquivos
+    # para a próxima execução; depois dele, eles são só arquivados.
+    for path in processed:
+        repo.offsets.stage(EVENTS_CONSUMER, os.path.basename(path), os.path.getsize(path))
+    acc = _save_events(repo, partial)
+    archived = repo.archive_log_files(processed)
+    print(f"Processed and archived {archived} of {len(paths)} files.")
+    print(f"[DEBUG] Salvo {OUTPUT_EVENT_CSV} com {len(acc)} linhas.")
+    print(" Event stage complete.")
+
+def process_event_counts_from_queue(repo: DataRepository, nproc: int):
     tq = JoinableQueue(maxsize=nproc * 2)
     rq = multiprocessing.Queue(maxsize=0)          # ilimitado
 
-    procs = [multiprocessing.Process(target=event_worker, args=(tq, rq))
+    procs = [multiprocessing.Process(target=event_worker, args=(tq, rq, worker_reports()))
              for _ in range(nproc)]
     for p in procs: p.start()
 
-    chunk_ct = repo.process_new_log_files(CHUNK_SIZE, tq)
+    meter = IpcMeter("events", nproc)
+    chunk_ct = repo.process_new_log_files(CHUNK_SIZE, meter.wrap_queue(tq))
+    meter.log()
     if chunk_ct == 0:
         print("  Nenhum log a processar na última hora.")
+        _export_committed(repo, EVENTS_CONSUMER, "event", "quantidade", OUTPUT_EVENT_CSV)
         for _ in procs: tq.put(None)
         for p in procs: p.join()
         return                                          # sai limpo
 
     for _ in procs: tq.put(None)                        # poison‑pills
 
-    aggregated = DataFrame(columns=["event", "quantidade"])
+    partial = PartialAggregate(["event"], HandlerValueCount.EVENT_COUNT_SPEC)
     for _ in range(chunk_ct):
-        aggregated.vconcat(rq.get())
+        partial.merge(rq.get())
 
     tq.join()
     for p in procs: p.join()
 
-    acc = HandlerValueCount().group_by_sum(aggregated, "event", "quantidade")
-    path = os.path.join(TRANSFORMED_DIR, OUTPUT_EVENT_CSV)
-    try:
-        prev = repo.read_csv_to_dataframe(path, ["event", "quantidade"])
-        prev.vconcat(acc)
-        acc = HandlerValueCount().group_by_sum(prev, "event", "quantidade")
-    except FileNotFoundError:
-        pass
-    print(f"[DEBUG] Salvando {path} com {len(acc)} linhas.")
-    repo.save_dataframe_to_csv(acc, path)
+    acc = _save_events(repo, partial)
+    print(f"[DEBUG] Salvo {OUTPUT_EVENT_CSV} com {len(acc)} linhas.")
     print(" Event stage complete.")
 
-import traceback
+def analyze_chunk(chunk: DataFrame | SharedChunk):
+    # Pré-agrega no worker; o processo-pai só mescla os parciais (custo ∝ nº de grupos)
+    a = RevenueAnalyzer(as_dataframe(chunk))
+    partials = a.partial_revenue_by_day(), a.partial_revenue_by_month(), a.partial_revenue_by_year()
+    report_worker_memory()
+    return partials
 
-def revenue_worker(tq: multiprocessing.JoinableQueue,
-                   rq: multiprocessing.Queue) -> None:
-    """
-    Consome DataFrames da fila `tq`, calcula as métricas de receita e devolve
-    três DataFrames (dia, mês, ano) na fila `rq`.
+REVENUE_OUTPUTS = [("date", OUTPUT_REVENUE_DAY), ("month", OUTPUT_REVENUE_MONTH), ("year", OUTPUT_REVENUE_YEAR)]
 
-    A função só devolve após receber o *sentinel* `None`.
+def _save_revenue(repo: DataRepository, results: List[Tuple[DataFrame, str, str]]) -> None:
     """
-    while True:
-        df = tq.get()
-
-        # ───────────────────────────────────────────────── sentinel ──
-        if df is None:          # “poison pill” enviado pelo processo‑pai
-            tq.task_done()      # marca o sentinel como processado
-            print("[revenue_worker] Received poison pill. Exiting.")
-            break
-
-        try:
-            print(f"[revenue_worker] Processing chunk with {len(df)} rows…")
-
-            a = RevenueAnalyzer(df)
-            day   = a.analyze_revenue_by_day()
-            month = a.analyze_revenue_by_month()
-            year  = a.analyze_revenue_by_year()
-
-            # Constrói DataFrames coluna‑a‑coluna (mais barato que add_row em loop)
-            df_day   = DataFrame(columns=["date",  "revenue"])
-            df_month = DataFrame(columns=["month", "revenue"])
-            df_year  = DataFrame(columns=["year",  "revenue"])
-
-            for k, v in day.items():   df_day.add_row([k, v])
-            for k, v in month.items(): df_month.add_row([k, v])
-            for k, v in year.items():  df_year.add_row([k, v])
-
-            rq.put((df_day, df_month, df_year))
-            print("[revenue_worker] Chunk done and result enqueued.")
-
-        except Exception as exc:
-            print(f"[ERROR] revenue_worker failed: {exc}")
-            traceback.print_exc()
-
-        finally:
-            # Só damos task_done quando TODOS os passos do chunk terminaram
-            tq.task_done()
-from multiprocessing import Pool
-import time
-
-def analyze_chunk(df: DataFrame):
-    a = RevenueAnalyzer(df)
-    day   = a.analyze_revenue_by_day()
-    month = a.analyze_revenue_by_month()
-    year  = a.analyze_revenue_by_year()
-
-    df_day   = DataFrame(columns=["date",  "revenue"])
-    df_month = DataFrame(columns=["month", "revenue"])
-    df_year  = DataFrame(columns=["year",  "revenue"])
+    Soma os totais (df, chave, arquivo) de cada período ao acumulado e confirma
+    os três estados e o offset numa só transação; os CSVs vêm depois.
+    """
+    totals = [(_accumulate(repo, REVENUE_CONSUMER, df, key, "revenue", fname), key, fname)
+              for df, key, fname in results]
+    repo.offsets.commit(REVENUE_CONSUMER)
+    for acc, key, fname in totals:
+        _export_csv(repo, acc, key, "revenue", fname)
+
+def _no_new_revenue(repo: DataRepository) -> None:
+    print("  Nenhuma receita nova em 'Revenue'.")
+    for key, fname in REVENUE_OUTPUTS:
+        path = os.path.join(TRANSFORMED_DIR, fname)
+        if not _export_committed(repo, REVENUE_CONSUMER, key, "revenue", fname) and not os.path.exists(path):
+            repo.save_dataframe_to_csv(DataFrame(columns=[key, "revenue"]), path)
 
-    for k, v in day.items():   df_day.add_row([k, v])
-    for k, v in month.items(): df_month.add_row([k, v])
-    for k, v in year.items():  df_year.add_row([k, v])
+def process_revenue_reports_sql(repo: DataRepository) -> None:
+    """
+    Backend SQL: o SQLite faz um GROUP BY (strftime sobre `date`) por período,
+    só sobre as linhas novas; as três consultas usam o mesmo limite de offset.
+    """
+    results = []
+    for (key, fname), unit in zip(REVENUE_OUTPUTS, ("day", "month", "year")):
+        query = (repo.scan("Revenue", REVENUE_CONSUMER, chunk_size=CHUNK_SIZE)
+                     .with_column(key, col("date").bucket(unit))
+                     .groupby(key).agg(**RevenueAnalyzer.REVENUE_SPEC))
+        results.append((query.collect(backend="sql"), key, fname))
+        # Depois da execução: o plano mostra o limite incremental (offset preparado) usado
+        print(query.explain(backend="sql"))
+    if len(results[0][0]) == 0:
+        _no_new_revenue(repo)
+        return
 
-    return df_day, df_month, df_year
+    print(f" Revenue aggregated in SQL into {len(results[0][0])} days.")
+    _save_revenue(repo, results)
+    print(" Revenue stage complete.")
 
-def process_revenue_reports(repo: DataRepository, nproc: int) -> None:
+def process_revenue_reports(repo: DataRepository, nproc: int, backend: str = "python") -> None:
     print(" Starting revenue report processing…")
-    if os.path.exists(REVENUE_MARKER):
-        os.remove(REVENUE_MARKER)
+    if backend == "sql":
+        return process_revenue_reports_sql(repo)
 
-    raw = repo.read_table_to_dataframe("Revenue")
-    if raw is None:
-        print("  Tabela 'Revenue' não encontrada.")
-        return
+    # Só as linhas após o offset confirmado; as anteriores já estão no acumulado
+    raw = (repo.scan("Revenue", REVENUE_CONSUMER, chunk_size=CHUNK_SIZE)
+               .select("value", "date").collect().categorize())
 
     if len(raw) == 0:
-        print("  Tabela 'Revenue' vazia.")
-        for key, fname in [("date", OUTPUT_REVENUE_DAY),
-                           ("month", OUTPUT_REVENUE_MONTH),
-                           ("year", OUTPUT_REVENUE_YEAR)]:
-            repo.save_dataframe_to_csv(
-                DataFrame(columns=[key, "revenue"]),
-                os.path.join(TRANSFORMED_DIR, fname)
-            )
-        open(REVENUE_MARKER, "a").close()
+        _no_new_revenue(repo)
         return
 
-    print(f" Revenue data loaded with {len(raw)} rows.")
-    chunks = list(chunk_dataframe(raw, CHUNK_SIZE))
-
-    print(f" Dispatching {len(chunks)} chunks to {nproc} processes.")
-    agg_day   = DataFrame(columns=["date",  "revenue"])
-    agg_month = DataFrame(columns=["month", "revenue"])
-    agg_year  = DataFrame(columns=["year",  "revenue"])
+    print(f" Revenue data loaded with {len(raw)} rows "
+          f"({sum(raw.memory_usage(deep=True).values()) / 2**20:.1f} MB).")
+    # Datas convertidas uma vez aqui: os workers recebem epochs int64 e só fazem aritmética.
+    raw = raw.parse_timestamps(["date"])
+    agg_day   = PartialAggregate(["date"],  RevenueAnalyzer.REVENUE_SPEC)
+    agg_month = PartialAggregate(["month"], RevenueAnalyzer.REVENUE_SPEC)
+    agg_year  = PartialAggregate(["year"],  RevenueAnalyzer.REVENUE_SPEC)
 
     start_time = time.time()
-    with Pool(processes=nproc) as pool:
-        for i, (d, m, y) in enumerate(pool.imap_unordered(analyze_chunk, chunks), 1):
+    meter = IpcMeter("revenue", nproc)
+    # Revenue vai uma única vez para memória compartilhada; os workers recebem
+    # só (segmento, faixa de linhas). O segmento é removido ao sair do `with`.
+    with SharedDataFrame(raw) as shared, \
+            Pool(processes=nproc, initializer=init_worker_reports, initargs=(worker_reports(),)) as pool:
+        chunks = list(shared.chunks(CHUNK_SIZE))
+        print(f" Dispatching {len(chunks)} chunks to {nproc} processes.")
+        for i, (d, m, y) in enumerate(pool.imap_unordered(analyze_chunk, meter.wrap(chunks)), 1):
             print(f" [main] Received result {i}/{len(chunks)}")
-            agg_day.vconcat(d)
-            agg_month.vconcat(m)
-            agg_year.vconcat(y)
+            agg_day.merge(d)
+            agg_month.merge(m)
+            agg_year.merge(y)
+    meter.log()
     print(f" All chunks processed in {time.time() - start_time:.2f}s")
 
-    def _save(df: DataFrame, key: str, fname: str) -> None:
-        acc = HandlerValueCount().group_by_sum(df, key, "revenue")
-        path = os.path.join(TRANSFORMED_DIR, fname)
-        try:
-            prev = repo.read_csv_to_dataframe(path, [key, "revenue"])
-            prev.vconcat(acc)
-            acc = HandlerValueCount().group_by_sum(prev, key, "revenue")
-        except FileNotFoundError:
-            pass
-        repo.save_dataframe_to_csv(acc, path)
-
-    _save(agg_day,   "date",  OUTPUT_REVENUE_DAY)
-    _save(agg_month, "month", OUTPUT_REVENUE_MONTH)
-    _save(agg_year,  "year",  OUTPUT_REVENUE_YEAR)
-
-    open(REVENUE_MARKER, "a").close()
+    _save_revenue(repo, [(agg_day.to_dataframe(),   "date",  OUTPUT_REVENUE_DAY),
+                         (agg_month.to_dataframe(), "month", OUTPUT_REVENUE_MONTH),
+                         (agg_year.to_dataframe(),  "year",  OUTPUT_REVENUE_YEAR)])
     print(" Revenue stage complete.")
 
-def genre_worker(tq, rq, content):
-    """
-    Conta visualizações por gênero nas últimas 24 h.
-    Não depende de HandlerValueCount nem de nome específico de coluna.
-    """
-    cutoff = datetime.now() - timedelta(days=1)
+GENRE_VIEWS_SPEC = {"views": ("genre", "size")}
 
-    while True:
-        df = tq.get()
-        tq.task_done()
 
-        # poison‑pill?
-        if df is None:
-            break
+def _with_genre(views: Query) -> Query:
+    """Junta Content às views, com o gênero em `genre` — etapas comuns de 3 e 4."""
+    # Content é referenciada pelo nome: o backend SQL faz o JOIN no próprio banco
+    return (views.join('Content', 'content_id', columns=['content_genre'])
+                 .rename('content_genre', 'genre'))
 
-        try:
-            # 1) join ViewHistory × Content
-            merged = df.merge(content, "content_id")
-
-            # 2) garante que a coluna de gênero se chame 'genre'
-            if "genre" not in merged._columns:
-                if "content_genre" in merged._columns:
-                    idx = merged._columns.index("content_genre")
-                    merged._columns[idx] = "genre"
-                    merged._data["genre"] = merged._data.pop("content_genre")
-                else:
-                    # nenhuma coluna de gênero → devolve DF vazio
-                    rq.put(DataFrame(columns=["genre", "views"]))
-                    continue
-
-            # 3) filtra views das últimas 24 h e conta por gênero
-            counts: Dict[str, int] = {}
-            for i in range(len(merged)):
-                if datetime.fromisoformat(merged._data["start_date"][i]) >= cutoff:
-                    g = merged._data["genre"][i]
-                    counts[g] = counts.get(g, 0) + 1
-
-            # 4) converte dict → DataFrame e envia
-            out = DataFrame(columns=["genre", "views"])
-            for g, v in counts.items():
-                out.add_row([g, v])
-            rq.put(out)
-
-        except Exception as e:
-            print(f"[ERROR] genre_worker fail2ed: {e}")
-
-from multiprocessing import Pool
-
-def analyze_genre_chunk(args):
-    df, content = args
-    from datetime import datetime, timedelta
+def _views_with_genre(repo: DataRepository, consumer: str) -> Query:
+    """ViewHistory (incremental para `consumer`) × Content — base das etapas 3 e 4."""
+    return _with_genre(repo.scan('ViewHistory', consumer, 'start_date', CHUNK_SIZE))
 
+def _genre_views(views: Query) -> Query:
+    """Etapa 3: views por gênero nas últimas 24 h."""
     cutoff = datetime.now() - timedelta(days=1)
+    return (views.where(col("start_date").to_timestamp() >= cutoff)
+                 .groupby("genre").agg(**GENRE_VIEWS_SPEC))
 
-    try:
-        merged = df.merge(content, "content_id")
-
-        # renomeia coluna para 'genre' se necessário
-        if "genre" not in merged._columns:
-            if "content_genre" in merged._columns:
-                idx = merged._columns.index("content_genre")
-                merged._columns[idx] = "genre"
-                merged._data["genre"] = merged._data.pop("content_genre")
-            else:
-                return DataFrame(columns=["genre", "views"])
-
-        # conta views nas últimas 24h
-        counts = {}
-        for i in range(len(merged)):
-            if datetime.fromisoformat(merged._data["start_date"][i]) >= cutoff:
-                g = merged._data["genre"][i]
-                counts[g] = counts.get(g, 0) + 1
+def _unfinished_sessions(views: Query) -> Query:
+    """Etapa 4: estado por sessão (user_id, content_id)."""
+    # ViewHistory não tem coluna 'event': toda view conta como 'play'
+    return HandlerUnfinishedByGenre().session_query(views.with_column('event', lit('play')))
 
-        out = DataFrame(columns=["genre", "views"])
-        for g, v in counts.items():
-            out.add_row([g, v])
-        return out
 
-    except Exception as e:
-        print(f"[ERROR] analyze_genre_chunk failed: {e}")
-        return DataFrame(columns=["genre", "views"])
+class SharedScan:
+    """
+    Leitura compartilhada de uma tabela incremental por várias agregações.
 
-def process_genre_from_db(repo: DataRepository, nproc: int):
-    print(" Starting genre view processing...")
-    try:
-        os.remove(GENRE_MARKER)
-    except FileNotFoundError:
-        pass
+    Cada chunk novo é lido e passa pelas etapas comuns (`base`, p.ex. o join
+    com Content) uma única vez; o resultado vai para todas as agregações
+    registradas no mesmo passo do worker (`Query.fan_out`).
 
-    content = repo.read_table_to_dataframe('Content')
-    chunks = repo.extract_table_from_db_incremental(
-        DB_PATH, 'ViewHistory', CHUNK_SIZE, None, GENRE_MARKER, 'start_date', dry_run=True
-    )
-    dataframes = chunks['dataframes'] if isinstance(chunks, dict) else chunks
+    Cada agregação mantém o próprio consumidor no OffsetStore. A leitura começa
+    no menor offset entre eles, e uma agregação adiantada (a outra etapa falhou
+    antes do commit) ignora as linhas que já contou. Os offsets ficam só
+    preparados: cada etapa confirma o seu depois de gravar as saídas.
+    """
 
-    if not dataframes:
-        print("  Nenhum dado novo para processar.")
+    def __init__(self, repo: DataRepository, table: str, marker_column: str,
+                 base: Callable[[Query], Query]):
+        self.repo = repo
+        self.table = table
+        self.marker_column = marker_column
+        self.base = base
+        self.branches: Dict[str, Callable[[Query], Query]] = {}
+
+    def register(self, consumer: str, branch: Callable[[Query], Query]) -> None:
+        """Registra a agregação de `consumer`: `branch(views)` termina num groupby/agg."""
+        self.branches[consumer] = branch
+
+    def run(self, nproc: int) -> Dict[str, PartialAggregate]:
+        """Lê as linhas novas uma vez e devolve o parcial de cada consumidor."""
+        offsets = {c: self.repo.offsets.get(c, self.table, "0") for c in self.branches}
+        since = min(offsets.values())
+        branches = {}
+        for consumer, branch in self.branches.items():
+            if offsets[consumer] > since:
+                branch = (lambda q, b=branch, o=offsets[consumer]: b(q.where(col(self.marker_column) > o)))
+            branches[consumer] = branch
+        views = self.base(self.repo.scan(self.table, list(self.branches), self.marker_column, CHUNK_SIZE))
+        return views.fan_out(processes=nproc, **branches)
+
+
+def _save_genre(repo: DataRepository, aggregated: PartialAggregate) -> None:
+    if not aggregated:
+        print("  Nenhum dado novo para processar (gênero).")
+        repo.offsets.commit(GENRE_CONSUMER)   # linhas lidas, mas fora da janela de 24 h
+        _export_committed(repo, GENRE_CONSUMER, 'genre', 'views', OUTPUT_GENRE_CSV)
         return
 
-    # monta args para cada chunk
-    args = [(df, content) for df in dataframes]
-
-    aggregated = DataFrame(columns=['genre', 'views'])
-    with Pool(processes=nproc) as pool:
-        for i, df in enumerate(pool.imap_unordered(analyze_genre_chunk, args), 1):
-            print(f"[main] Genre chunk {i}/{len(args)} received.")
-            aggregated.vconcat(df)
-
-    acc = HandlerValueCount().group_by_sum(aggregated, 'genre', 'views')
-    path = os.path.join(TRANSFORMED_DIR, OUTPUT_GENRE_CSV)
-    try:
-        prev = repo.read_csv_to_dataframe(path, ['genre', 'views'])
-        prev.vconcat(acc)
-        acc = HandlerValueCount().group_by_sum(prev, 'genre', 'views')
-    except FileNotFoundError:
-        pass
-
-    repo.save_dataframe_to_csv(acc, path)
+    acc = _accumulate(repo, GENRE_CONSUMER, aggregated.to_dataframe(), 'genre', 'views', OUTPUT_GENRE_CSV)
+    repo.offsets.commit(GENRE_CONSUMER)
+    _export_csv(repo, acc, 'genre', 'views', OUTPUT_GENRE_CSV)
     print(" Genre stage complete.")
 
+def _save_unfinished(repo: DataRepository, sessions: PartialAggregate) -> None:
+    if not sessions:
+        print("  Nenhum dado novo para processar (sessões).")
+        repo.offsets.commit(UNFINISHED_CONSUMER)
+        committed = repo.offsets.load_state(UNFINISHED_CONSUMER, UNFINISHED_SESSIONS)
+        if committed is not None:
+            _export_unfinished(repo, PartialAggregate.from_dataframe(
+                committed, HandlerUnfinishedByGenre.SESSION_KEYS, HandlerUnfinishedByGenre.SESSION_SPEC))
+        return
+
+    # Sessões podem continuar entre execuções: mescla com o estado salvo
+    # (a anterior primeiro, para `first` manter o gênero já visto)
+    h = HandlerUnfinishedByGenre()
+    previous = _previous_state(repo, UNFINISHED_CONSUMER, UNFINISHED_SESSIONS)
+    if previous is not None:
+        sessions = PartialAggregate.from_dataframe(previous, h.SESSION_KEYS, h.SESSION_SPEC).merge(sessions)
+    # Estado e offset na mesma transação; o CSV é derivado e vem depois
+    repo.offsets.stage_state(UNFINISHED_CONSUMER, UNFINISHED_SESSIONS, sessions.to_dataframe())
+    repo.offsets.commit(UNFINISHED_CONSUMER)
+    _export_unfinished(repo, sessions)
+    print(" Unfinished stage complete.")
 
-def analyze_unfinished_chunk(args):
-    df, content = args
-    try:
-        merged = df.merge(content, 'content_id')
-
-        # corrige nome da coluna se necessário
-        if 'genre' not in merged._columns:
-            if 'content_genre' in merged._columns:
-                idx = merged._columns.index('content_genre')
-                merged._columns[idx] = 'genre'
-                merged._data['genre'] = merged._data.pop('content_genre')
-            else:
-                return DataFrame(columns=['content_genre', 'unfinished_views'])
+def _export_unfinished(repo: DataRepository, sessions: PartialAggregate) -> None:
+    aggregated = HandlerUnfinishedByGenre().count_unfinished(sessions)
+    repo.save_dataframe_to_csv(aggregated, os.path.join(TRANSFORMED_DIR, OUTPUT_UNFINISHED_CSV))
 
-        if 'event' not in merged._columns:
-            merged._columns.append('event')
-            merged._data['event'] = ['play'] * len(merged)
+def process_genre_from_db(repo: DataRepository, nproc: int, backend: str = "python"):
+    print(" Starting genre view processing...")
 
-        h = HandlerUnfinishedByGenre()
-        return h.group(merged)
+    # Plano único: o otimizador lê só as colunas usadas, filtra antes do join
+    # e roda os chunks no pool (memória compartilhada + índice de Content por worker).
+    query = _genre_views(_views_with_genre(repo, GENRE_CONSUMER))
+    aggregated = query.partial(processes=nproc, backend=backend)
+    print(query.explain(backend=backend))   # com o limite incremental usado (offset preparado)
+    _save_genre(repo, aggregated)
 
-    except Exception as e:
-        print(f"[ERROR] analyze_unfinished_chunk failed: {e}")
-        return DataFrame(columns=['content_genre', 'unfinished_views'])
 
 def process_unfinished_by_genre(repo: DataRepository, nproc: int):
     print(" Starting unfinished-by-genre processing...")
-    try:
-        os.remove(UNFINISHED_MARKER)
-    except FileNotFoundError:
-        pass
-
-    content = repo.read_table_to_dataframe('Content')
-    chunks = repo.extract_table_from_db_incremental(
-        DB_PATH, 'ViewHistory', CHUNK_SIZE, None, UNFINISHED_MARKER, 'start_date', dry_run=True
-    )
+    sessions = _unfinished_sessions(_views_with_genre(repo, UNFINISHED_CONSUMER)).partial(processes=nproc)
+    _save_unfinished(repo, sessions)
 
-    if not chunks:
-        print("  Nenhum dado novo para processar.")
-        return
-
-    args = [(df, content) for df in chunks]
-    aggregated = None
 
-    with Pool(processes=nproc) as pool:
-        for i, df in enumerate(pool.imap_unordered(analyze_unfinished_chunk, args), 1):
-            print(f"[main] Unfinished chunk {i}/{len(args)} received.")
-            if aggregated is None:
-                aggregated = df
-            else:
-                aggregated.vconcat(df)
+def process_views_shared(repo: DataRepository, nproc: int):
+    """Etapas 3 e 4 numa só leitura de ViewHistory (e um só join com Content por chunk)."""
+    print(" Starting shared ViewHistory scan (genre + unfinished)...")
+    scan = SharedScan(repo, 'ViewHistory', 'start_date', _with_genre)
+    scan.register(GENRE_CONSUMER, _genre_views)
+    scan.register(UNFINISHED_CONSUMER, _unfinished_sessions)
+    partials = scan.run(nproc)
+    _save_genre(repo, partials[GENRE_CONSUMER])
+    _save_unfinished(repo, partials[UNFINISHED_CONSUMER])
 
-    if aggregated is None:
-        aggregated = DataFrame(columns=['content_genre', 'unfinished_views'])
-
-    path = os.path.join(TRANSFORMED_DIR, OUTPUT_UNFINISHED_CSV)
-    repo.save_dataframe_to_csv(aggregated, path)
-    open(UNFINISHED_MARKER, 'a').close()
-    print(" Unfinished stage complete.")
-
-
-def unfinished_worker(tq, rq, content):
-    h = HandlerUnfinishedByGenre()
-    while True:
-        df = tq.get()
-        tq.task_done()
-        if df is None:
-            break
-        try:
-            merged = df.merge(content, 'content_id')
-            if 'genre' not in merged.columns:
-                merged._columns.append('genre')
-                merged._data['genre'] = merged._data['content_genre'].copy()
-            if 'event' not in merged.columns:
-                merged._columns.append('event')
-                merged._data['event'] = ['play'] * len(merged)
-            rq.put(h.group(merged))
-        except Exception as e:
-            print(f"[ERROR] unfinished_worker failed: {e}")
-
-def main_pipeline(num_processes: int):
+def main_pipeline(num_processes: int, backend: str = "python"):
     t0_pipeline = time.time()
     repo = DataRepository()
+    repo.ensure_indexes()   # leituras incrementais sem índice ordenariam a tabela inteira
 
     print(" Stage 1: Event Counts")
     with StageTimer("events", num_processes):
@@ -419,20 +450,30 @@ def main_pipeline(num_processes: int):
 
     print(" Stage 2: Revenue Reports")
     with StageTimer("revenue", num_processes):
-        process_revenue_reports(repo, max(1, num_processes))
-
-    print(" Stage 3: Genre Views")
-    with StageTimer("genre", num_processes):
-        process_genre_from_db(repo, max(1, num_processes))
-
-    print(" Stage 4: Unfinished by Genre")
-    with StageTimer("unfinished", num_processes):
-        process_unfinished_by_genre(repo, max(1, num_processes))
+        process_revenue_reports(repo, max(1, num_processes), backend)
+
+    # Etapas 3 e 4 medidas juntas como "views" nos dois backends (o backend python
+    # as roda numa só leitura), para o stage_metrics.csv ser comparável entre eles
+    print(" Stages 3+4: Genre Views + Unfinished by Genre")
+    with StageTimer("views", num_processes):
+        if backend == "sql":
+            # O GROUP BY de gênero roda no SQLite; só a etapa 4 lê as linhas
+            process_genre_from_db(repo, max(1, num_processes), backend)
+            process_unfinished_by_genre(repo, max(1, num_processes))
+        else:
+            process_views_shared(repo, max(1, num_processes))
 
     total_secs = time.time() - t0_pipeline
     log_stage("pipeline_total", num_processes, total_secs)   # registra o total também
     print(f" Pipeline done in {total_secs:.2f}s")
 
 if __name__ == '__main__':
-    n = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_NUM_PROCESSES
-    main_pipeline(n)
+    parser = argparse.ArgumentParser(description="Executa as quatro etapas do pipeline.")
+    parser.add_argument("processes", nargs="?", type=int, default=DEFAULT_NUM_PROCESSES,
+                        help="número de processos (padrão: %(default)s)")
+    parser.add_argument("--backend", choices=BACKENDS, default="python",
+                        help="onde rodar as agregações de receita e gênero: 'sql' empurra o "
+                             "GROUP BY para o SQLite (com fallback para Python), 'python' usa o "
+                             "motor de DataFrames (padrão)")
+    args = parser.parse_args()
+    main_pipeline(args.processes, args.backend)
@@ -0,0 +1,849 @@
+from collections import deque
+from datetime import date, datetime
+from functools import reduce
+from itertools import islice
+from multiprocessing import Pool, resource_tracker
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from Column import from_epoch, to_epoch
+from DataFrame import DataFrame
+from Expression import _BUCKETS, BinaryExpr, Bucket, ColumnRef, Expr, IsIn, Literal, ToTimestamp
+from GroupBy import AggSpec, GroupBy, PartialAggregate
+from Join import JoinIndex, join
+from SharedDataFrame import SharedChunk, SharedDataFrame, as_dataframe
+from utils.timing import init_worker_reports, report_worker_memory, worker_reports
+
+DEFAULT_CHUNK_SIZE = 5_000
+
+# Chunks handed to the pool and not yet merged, per worker process. Bounds the
+# memory of a parallel run: the source is read only as fast as workers finish.
+IN_FLIGHT_PER_PROCESS = 2
+
+# Expression symbol -> SQL operator, for the predicates that can be pushed into
+# the SELECT. `!=` and `~` are left out on purpose: SQL drops rows where the
+# column is NULL, while Python keeps them.
+_SQL_OPERATORS = {'==': '=', '<': '<', '<=': '<=', '>': '>', '>=': '>=', '&': 'AND', '|': 'OR'}
+_SQL_LITERAL_TYPES = (str, int, float)
+_SQL_COMPARISONS = ('==', '<', '<=', '>', '>=')
+_SQL_TIMESTAMP_TYPES = (str, int, datetime, date)
+
+# Aggregations whose partial state is the SQL aggregate's result (see
+# `PartialAggregate.from_dataframe`). 'first' has no deterministic SQL
+# equivalent and 'mean' keeps a (sum, count) state, so both stay in Python.
+# SQL's SUM of only NULLs is NULL; the Python kernel gives 0, hence COALESCE.
+_SQL_AGGREGATES = {'size': 'COUNT(*)', 'count': 'COUNT({})', 'sum': 'COALESCE(SUM({}), 0)',
+                   'min': 'MIN({})', 'max': 'MAX({})'}
+
+
+def quote_identifier(name: str) -> str:
+    """
+    Quotes a table or column name for use in an SQLite statement.
+    """
+    return '"' + name.replace('"', '""') + '"'
+
+
+def to_sql(expr: Expr, env: Optional[Dict[str, Tuple[str, List[Any]]]] = None) -> Optional[Tuple[str, List[Any]]]:
+    """
+    Translates a column expression into an SQL expression with `?` parameters.
+
+    Only column references, str/int/float literals, comparisons, `&`, `|`,
+    `isin`, `bucket` and comparisons of `to_timestamp()` against a constant are
+    translated. Timestamps are compared with SQLite's `julianday`, which reads
+    ISO-8601 text at millisecond precision.
+
+    Args:
+        expr (Expr): The expression to translate.
+        env (Optional[Dict[str, Tuple[str, List[Any]]]]): SQL for each column
+            name (e.g. derived columns of a query). Defaults to None (every
+            column is a column of the table, referenced by name).
+
+    Returns:
+        Optional[Tuple[str, List[Any]]]: The SQL text and its parameters, or None
+            if some part of the expression has no SQL equivalent (e.g. `apply`).
+    """
+    if isinstance(expr, ColumnRef):
+        if env is None:
+            return quote_identifier(expr.name), []
+        return env.get(expr.name)
+    if isinstance(expr, Literal) and type(expr.value) in _SQL_LITERAL_TYPES:
+        return '?', [expr.value]
+    if isinstance(expr, BinaryExpr) and isinstance(expr.left, ToTimestamp):
+        if expr.symbol not in _SQL_COMPARISONS or not isinstance(expr.right, Literal) \
+                or not isinstance(expr.right.value, _SQL_TIMESTAMP_TYPES):
+            return None
+        operand = to_sql(expr.left.operand, env)
+        if operand is None:
+            return None
+        # The constant goes in as the same local wall-clock time the Python engine compares against.
+        value = from_epoch(to_epoch(expr.right.value)).isoformat()
+        return (f"(julianday({operand[0]}) {_SQL_OPERATORS[expr.symbol]} julianday(?))",
+                operand[1] + [value])
+    if isinstance(expr, BinaryExpr) and expr.symbol in _SQL_OPERATORS:
+        left, right = to_sql(expr.left, env), to_sql(expr.right, env)
+        if left is None or right is None:
+            return None
+        return f"({left[0]} {_SQL_OPERATORS[expr.symbol]} {right[0]})", left[1] + right[1]
+    if isinstance(expr, IsIn) and expr.values and all(type(v) in _SQL_LITERAL_TYPES for v in expr.values):
+        operand = to_sql(expr.operand, env) if isinstance(expr.operand, ColumnRef) else None
+        if operand is None:
+            return None
+        values = sorted(expr.values, key=repr)
+        placeholders = ', '.join('?' * len(values))
+        return f"({operand[0]} IN ({placeholders}))", operand[1] + values
+    if isinstance(expr, Bucket):
+        operand = to_sql(expr.operand, env)
+        if operand is None:
+            return None
+        return f"strftime('{_BUCKETS[expr.unit][1]}', {operand[0]})", operand[1]
+    return None
+
+
+class SqlAggregate:
+    """
+    An aggregation query compiled to a single SQLite statement (see
+    `Query.partial(backend='sql')`).
+
+    Attributes:
+        table (str): The source table, aliased `t`.
+        names (List[str]): Output column names: the keys, then the aggregations.
+        select (List[Tuple[str, List[Any]]]): SQL and parameters per output column.
+        joins (List[str]): JOIN clauses, in order.
+        where (List[Tuple[str, List[Any]]]): Conditions, combined with AND.
+        num_keys (int): How many leading output columns are group keys.
+    """
+
+    def __init__(self, table: str, names: List[str], select: List[Tuple[str, List[Any]]],
+                 joins: List[str], where: List[Tuple[str, List[Any]]], num_keys: int) -> None:
+        self.table = table
+        self.names = names
+        self.select = select
+        self.joins = joins
+        self.where = where
+        self.num_keys = num_keys
+
+    def statement(self, extra_where: Sequence[Tuple[str, List[Any]]] = ()) -> Tuple[str, List[Any]]:
+        """
+        Returns the SQL text and parameters, with `extra_where` conditions
+        (e.g. an incremental offset on `t`) added to the WHERE clause.
+        """
+        columns = ', '.join(f"{sql} AS {quote_identifier(name)}" for name, (sql, _) in zip(self.names, self.select))
+        params = [p for _, ps in self.select for p in ps]
+        sql = f"SELECT {columns} FROM {quote_identifier(self.table)} AS t"
+        sql += ''.join(f" {clause}" for clause in self.joins)
+        conditions = list(extra_where) + self.where
+        if conditions:
+            sql += " WHERE " + ' AND '.join(c for c, _ in conditions)
+            params += [p for _, ps in conditions for p in ps]
+        if self.num_keys:
+            sql += " GROUP BY " + ', '.join(str(i + 1) for i in range(self.num_keys))
+        return sql, params
+
+
+def _conjuncts(expr: Expr) -> List[Expr]:
+    if isinstance(expr, BinaryExpr) and expr.symbol == '&':
+        return _conjuncts(expr.left) + _conjuncts(expr.right)
+    return [expr]
+
+
+def _conjunction(exprs: List[Expr]) -> Expr:
+    return reduce(lambda a, b: a & b, exprs)
+
+
+# ---------------------------------------------------------------- sources ----
+
+class TableScan:
+    """
+    Reads a SQLite table through a `DataRepository`, optionally incrementally.
+
+    Attributes:
+        repo (DataRepository): The repository owning the database.
+        table (str): The table to read.
+        consumer (Optional[str | List[str]]): If set, only rows past this consumer's
+            last committed offset are read, and the new offset is staged in the
+            repository's `OffsetStore` (see `DataRepository.iter_table_incremental`).
+            Several consumers share one read starting at the smallest offset.
+        marker_column (Optional[str]): Column compared against the offset (rowid if None).
+        chunk_size (int): Rows per chunk.
+    """
+
+    supports_sql = True
+
+    def __init__(self, repo, table: str, consumer: Optional[str] = None,
+                 marker_column: Optional[str] = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+        self.repo = repo
+        self.table = table
+        self.consumer = consumer
+        self.marker_column = marker_column
+        self.chunk_size = chunk_size
+
+    def describe(self) -> str:
+        marker = f", incremental on {self.marker_column or 'rowid'}" if self.consumer else ''
+        return f"TableScan({self.table}{marker})"
+
+    def chunks(self, columns: Optional[List[str]], where: Optional[Tuple[str, List[Any]]]) -> Iterator[DataFrame]:
+        if self.consumer:
+            yield from self.repo.iter_table_incremental(
+                self.repo.db_path, self.table, self.chunk_size, self.consumer,
+                self.marker_column, columns=columns, where=where,
+            )
+            return
+        select = '*' if columns is None else ', '.join(map(quote_identifier, columns))
+        sql = f"SELECT {select} FROM {quote_identifier(self.table)}"
+        params: List[Any] = []
+        if where is not None:
+            sql += f" WHERE {where[0]}"
+            params = where[1]
+        df = self.repo.execute_query_to_dataframe(sql, params=params)
+        for start in range(0, len(df), self.chunk_size):
+            yield df.slice(start, start + self.chunk_size)
+
+    def table_columns(self, table: Optional[str] = None) -> List[str]:
+        """
+        Returns the column names of `table` (defaults to the scanned table).
+        """
+        return self.repo.table_columns(table or self.table)
+
+    def read_table(self, table: str, columns: List[str]) -> DataFrame:
+        """
+        Reads `columns` of another table of the same database (the right side
+        of a join by table name), with low-cardinality columns categorized.
+        Dimension tables come from the repository's cross-run cache.
+        """
+        return self.repo.read_table_to_dataframe(table, columns)
+
+    def sql_bounds(self) -> List[Tuple[str, List[Any]]]:
+        """
+        Returns the incremental bound `aggregate` adds to the WHERE clause
+        (none without a consumer).
+        """
+        if not self.consumer:
+            return []
+        return self.repo.incremental_where(self.table, self.consumer, self.marker_column)
+
+    def aggregate(self, compiled: SqlAggregate) -> DataFrame:
+        """
+        Runs a compiled aggregation inside the database, incrementally when the
+        scan has a consumer (see `DataRepository.aggregate_table_sql`).
+        """
+        return self.repo.aggregate_table_sql(compiled, self.consumer, self.marker_column)
+
+
+class FrameScan:
+    """
+    Reads an in-memory DataFrame in chunks of `chunk_size` rows.
+    """
+
+    supports_sql = False
+
+    def __init__(self, df: DataFrame, chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+        self.df = df
+        self.chunk_size = chunk_size
+
+    def describe(self) -> str:
+        return f"FrameScan({len(self.df)} rows)"
+
+    def chunks(self, columns: Optional[List[str]], where: Optional[Tuple[str, List[Any]]]) -> Iterator[DataFrame]:
+        df = self.df
+        if columns is not None:
+            df = DataFrame._from_column_objects({c: df[c] for c in columns}, len(df))
+        for start in range(0, len(df), self.chunk_size):
+            yield df.slice(start, start + self.chunk_size)
+
+
+# ------------------------------------------------------------------ query ----
+
+class Query:
+    """
+    A lazy query: records operations and runs them only on `collect`/`partial`.
+
+    Before running, the plan is optimized:
+
+    - predicates (split on `&`) that only use source columns move before joins
+      and derived columns; those expressible in SQL go into the table's SELECT;
+    - only the columns some operation needs are read from the source;
+    - a filter directly before an aggregation is fused into it (the filtered
+      rows are never materialized);
+    - chunks are streamed from the source; with more than one process they run
+      on a worker pool, at most `IN_FLIGHT_PER_PROCESS` chunks per worker at a time.
+
+    Example:
+        ```
+        views = (repo.scan('ViewHistory')
+                     .join(content, 'content_id', columns=['content_genre'])
+                     .where(col('content_genre') == 'drama')
+                     .groupby('content_genre').count('views')
+                     .collect(processes=4))
+        ```
+    """
+
+    def __init__(self, source: 'TableScan | FrameScan', ops: Tuple[Tuple[Any, ...], ...] = (),
+                 aggregate: Optional[Tuple[List[str], Dict[str, AggSpec]]] = None) -> None:
+        self._source = source
+        self._ops = ops
+        self._aggregate = aggregate
+
+    @classmethod
+    def from_dataframe(cls, df: DataFrame, chunk_size: int = DEFAULT_CHUNK_SIZE) -> 'Query':
+        """
+        Starts a query over an in-memory DataFrame.
+        """
+        return cls(FrameScan(df, chunk_size))
+
+    def _then(self, *op: Any) -> 'Query':
+        if self._aggregate is not None:
+            raise ValueError("No operation can follow an aggregation in a query.")
+        return Query(self._source, self._ops + (op,))
+
+    def where(self, condition: Expr) -> 'Query':
+        """
+        Keeps the rows for which `condition` is true (see `DataFrame.where`).
+        """
+        return self._then('where', condition)
+
+    def select(self, *columns: str) -> 'Query':
+        """
+        Keeps only `columns`, in the given order.
+        """
+        return self._then('select', list(columns))
+
+    def with_column(self, name: str, values: Expr) -> 'Query':
+        """
+        Adds (or replaces) a column computed from an expression.
+        """
+        return self._then('with_column', name, values)
+
+    def rename(self, old_name: str, new_name: str) -> 'Query':
+        """
+        Renames a column.
+        """
+        return self._then('rename', old_name, new_name)
+
+    def join(self, right: DataFrame | JoinIndex | str, on: str | Sequence[str], how: str = 'inner',
+             columns: Optional[List[str]] = None, fill_value: Any = None) -> 'Query':
+        """
+        Hash-joins each chunk with `right` (see `Join.join`). The index over
+        `right` is built once per process, not once per chunk.
+
+        `right` may also name a table of the scanned database: the Python
+        engine reads `on` + `columns` of it once, while the SQL backend joins
+        it inside the database. `columns` is then required.
+
+        Raises:
+            ValueError: If `right` is a table name and `columns` is not given.
+        """
+        if isinstance(right, str) and columns is None:
+            raise ValueError("Joining a table by name requires the `columns` to take from it.")
+        return self._then('join', right, [on] if isinstance(on, str) else list(on), how, columns, fill_value)
+
+    def groupby(self, keys: str | List[str]) -> 'GroupedQuery':
+        """
+        Groups the rows by `keys`; finish with `agg` or `count`.
+        """
+        return GroupedQuery(self, [keys] if isinstance(keys, str) else list(keys))
+
+    def explain(self, backend: str = 'python') -> str:
+        """
+        Returns the optimized plan, one step per line, in execution order. With
+        `backend='sql'`, the compiled statement when the query can run in SQL,
+        including the incremental bound of the scan: the staged offset once the
+        query has run, otherwise the current one.
+        """
+        compiled = self._compile_sql() if backend == 'sql' else None
+        if compiled is not None:
+            sql, params = compiled.statement(self._source.sql_bounds())
+            return f"{self._source.describe()}\n  SQL {sql}  params={params}"
+        return self._optimize().describe()
+
+    def collect(self, processes: int = 1, backend: str = 'python') -> DataFrame:
+        """
+        Runs the query and returns the result as a DataFrame.
+
+        Args:
+            processes (int): Worker processes to run the chunks on. Defaults to 1
+                (run in this process).
+            backend (str): 'python' or 'sql' (see `partial`). Defaults to 'python'.
+        """
+        if backend == 'sql' and self._aggregate is not None:
+            return self.partial(processes, backend).to_dataframe()
+        result = self._optimize().execute(processes)
+        return result.to_dataframe() if isinstance(result, PartialAggregate) else result
+
+    def partial(self, processes: int = 1, backend: str = 'python') -> PartialAggregate:
+        """
+        Runs an aggregation query and returns the mergeable partial result.
+
+        Args:
+            processes (int): Worker processes for the Python engine. Defaults to 1.
+            backend (str): 'python' runs the chunks in this engine; 'sql' compiles
+                the whole query (filters, derived columns, joins by table name and
+                the aggregation) into one GROUP BY statement run by SQLite, and
+                falls back to the Python engine when some step has no SQL
+                equivalent. Defaults to 'python'.
+
+        Raises:
+            ValueError: If the query does not end with an aggregation, or the
+                backend is unknown.
+        """
+        if self._aggregate is None:
+            raise ValueError("Only queries ending with an aggregation have a partial result.")
+        if backend not in ('python', 'sql'):
+            raise ValueError(f"Unknown backend '{backend}'. Expected 'python' or 'sql'.")
+        compiled = self._compile_sql() if backend == 'sql' else None
+        if compiled is not None:
+            keys, specs = self._aggregate
+            return PartialAggregate.from_dataframe(self._source.aggregate(compiled), keys, specs)
+        return self._optimize().execute(processes)
+
+    def fan_out(self, processes: int = 1, **branches: Callable[['Query'], 'Query']) -> Dict[str, PartialAggregate]:
+        """
+        Runs several aggregations over a single pass of this query.
+
+        Each chunk is read and goes through this query's steps (e.g. a join)
+        once; the result is handed to every branch in the same worker pass. Only
+        the columns some branch needs are read.
+
+        Example:
+            ```
+            views = repo.scan('ViewHistory').join(content, 'content_id', columns=['content_genre'])
+            partials = views.fan_out(processes=4,
+                                     by_genre=lambda q: q.groupby('content_genre').count('views'),
+                                     by_user=lambda q: q.groupby('user_id').count('views'))
+            ```
+
+        Args:
+            processes (int): Worker processes to run the chunks on. Defaults to 1.
+            **branches (Callable[[Query], Query]): `name=build`, where `build(query)`
+                appends steps ending with an aggregation to `query`.
+
+        Returns:
+            Dict[str, PartialAggregate]: The partial result of each branch, by name.
+
+        Raises:
+            ValueError: If this query already aggregates, or a branch does not
+                end with an aggregation.
+        """
+        if self._aggregate is not None:
+            raise ValueError("Only a query without an aggregation can fan out.")
+        plans: Dict[str, _Plan] = {}
+        needed: Optional[Set[str]] = set()
+        for name, build in branches.items():
+            branch = build(Query(FrameScan(DataFrame())))
+            if branch._aggregate is None:
+                raise ValueError(f"Branch '{name}' does not end with an aggregation.")
+            plans[name] = branch._optimize()
+            columns = plans[name].columns
+            needed = None if needed is None or columns is None else needed | set(columns)
+        base = self if needed is None else self.select(*sorted(needed))
+        return _FanOutPlan(base._optimize(), plans).execute(processes)
+
+    def _compile_sql(self) -> Optional[SqlAggregate]:
+        """
+        Compiles the query into one SQL aggregation, or returns None if some
+        step cannot be expressed in SQL.
+        """
+        source = self._source
+        if not source.supports_sql or self._aggregate is None:
+            return None
+        env = {c: (f"t.{quote_identifier(c)}", []) for c in source.table_columns()}
+        joins: List[str] = []
+        where: List[Tuple[str, List[Any]]] = []
+
+        for op in self._ops:
+            kind = op[0]
+            if kind == 'where':
+                condition = to_sql(op[1], env)
+                if condition is None:
+                    return None
+                where.append(condition)
+            elif kind == 'with_column':
+                value = to_sql(op[2], env)
+                if value is None:
+                    return None
+                env[op[1]] = value
+            elif kind == 'rename':
+                if op[1] not in env:
+                    return None
+                env[op[2]] = env.pop(op[1])
+            elif kind == 'select':
+                if any(c not in env for c in op[1]):
+                    return None
+                env = {c: env[c] for c in op[1]}
+            elif kind == 'join':
+                _, right, on, how, columns, fill_value = op
+                if not isinstance(right, str) or how not in ('inner', 'left') \
+                        or any(k not in env or env[k][1] for k in on) \
+                        or (fill_value is not None and type(fill_value) not in _SQL_LITERAL_TYPES):
+                    return None
+                alias = f"j{len(joins)}"
+                conditions = ' AND '.join(f"{env[k][0]} = {alias}.{quote_identifier(k)}" for k in on)
+                joins.append(f"{'LEFT JOIN' if how == 'left' else 'JOIN'} {quote_identifier(right)} AS {alias} ON {conditions}")
+                matched = f"{alias}.{quote_identifier(on[0])} IS NOT NULL"
+                for column in columns:
+                    name = column if column not in env else f"{column}_right"
+                    ref = f"{alias}.{quote_identifier(column)}"
+                    # Like `Join.join`, only unmatched rows get the fill value.
+                    env[name] = ((f"CASE WHEN {matched} THEN {ref} ELSE ? END", [fill_value])
+                                 if how == 'left' and fill_value is not None else (ref, []))
+
+        keys, specs = self._aggregate
+        select = []
+        for name in keys:
+            if name not in env:
+                return None
+            select.append(env[name])
+        for column, fn in specs.values():
+            template = _SQL_AGGREGATES.get(fn)
+            if template is None or column not in env:
+                return None
+            sql, params = env[column]
+            select.append((template.format(sql), params if '{}' in template else []))
+        return SqlAggregate(source.table, list(keys) + list(specs), select, joins, where, len(keys))
+
+    # ------------------------------------------------------------ optimizer --
+
+    def _optimize(self) -> '_Plan':
+        scan_filters: List[Expr] = []
+        steps: List[Tuple[Any, ...]] = []
+        derived: Set[str] = set()
+        hidden: Set[str] = set()         # source columns renamed away
+        kept: Optional[Set[str]] = None  # columns left by the last select
+
+        # Predicate pushdown: a conjunct that only reads source columns still
+        # visible unchanged runs before every join/derived column (or in SQL,
+        # decided below). Any other conjunct stays in place, so a filter on a
+        # renamed or dropped column fails as it does on a DataFrame.
+        for op in self._ops:
+            kind = op[0]
+            if kind == 'where':
+                for conjunct in _conjuncts(op[1]):
+                    columns = conjunct.columns()
+                    if derived.isdisjoint(columns) and hidden.isdisjoint(columns) \
+                            and (kept is None or kept.issuperset(columns)):
+                        scan_filters.append(conjunct)
+                    else:
+                        steps.append(('where', conjunct))
+                continue
+            steps.append(op)
+            if kind == 'with_column':
+                derived.add(op[1])
+            elif kind == 'rename':
+                hidden.add(op[1])
+                derived.add(op[2])
+            elif kind == 'select':
+                kept = set(op[1]) if kept is None else kept & set(op[1])
+            elif kind == 'join':
+                derived.update(_join_outputs(op))
+
+        sql_filters: List[Tuple[str, List[Any]]] = []
+        chunk_filters: List[Expr] = []
+        for conjunct in scan_filters:
+            translated = to_sql(conjunct) if self._source.supports_sql else None
+            if translated is not None:
+                sql_filters.append(translated)
+            else:
+                chunk_filters.append(conjunct)
+        steps = [('where', f) for f in chunk_filters] + steps
+
+        # Filter + aggregate fusion: trailing filters become a row selection
+        # handed to the group-by.
+        fused: List[Expr] = []
+        if self._aggregate is not None:
+            while steps and steps[-1][0] == 'where':
+                fused.insert(0, steps.pop()[1])
+
+        where = None
+        if sql_filters:
+            where = (' AND '.join(sql for sql, _ in sql_filters), [p for _, params in sql_filters for p in params])
+        columns = self._required_columns(steps, fused)
+        return _Plan(self._source, columns, where, steps,
+                     _conjunction(fused) if fused else None, self._aggregate)
+
+    def _required_columns(self, steps: List[Tuple[Any, ...]], fused: List[Expr]) -> Optional[List[str]]:
+        """
+        Projection pushdown: walks the steps backwards collecting the source
+        columns they read. None means every column is needed.
+        """
+        if self._aggregate is None:
+            needed: Optional[Set[str]] = None
+        else:
+            keys, specs = self._aggregate
+            needed = set(keys) | {column for column, _ in specs.values()}
+            for expr in fused:
+                needed.update(expr.columns())
+
+        for op in reversed(steps):
+            kind = op[0]
+            if kind == 'select':
+                needed = set(op[1])
+            elif needed is None:
+                continue
+            elif kind == 'where':
+                needed.update(op[1].columns())
+            elif kind == 'with_column':
+                needed.discard(op[1])
+                needed.update(op[2].columns())
+            elif kind == 'rename':
+                if op[2] in needed:
+                    needed.discard(op[2])
+                    needed.add(op[1])
+            elif kind == 'join':
+                right_columns = _join_columns(op)
+                # Keep the left column a right column clashed with, so the
+                # `_right` suffix is applied exactly as without the projection.
+                clashes = {c for c in right_columns if f"{c}_right" in needed}
+                needed -= set(_join_outputs(op))
+                needed |= clashes | set(op[2])
+        return sorted(needed) if needed is not None else None
+
+
+class GroupedQuery:
+    """
+    A query grouped by key columns, waiting for its aggregation.
+    """
+
+    def __init__(self, query: Query, keys: List[str]) -> None:
+        self._query = query
+        self._keys = keys
+
+    def agg(self, **aggregations: AggSpec) -> Query:
+        """
+        Aggregates each group, see `GroupBy.partial` for the supported functions.
+        """
+        query = self._query
+        return Query(query._source, query._ops, (self._keys, aggregations))
+
+    def count(self, name: str = 'count') -> Query:
+        """
+        Counts the rows of each group into a column called `name`.
+        """
+        return self.agg(**{name: (self._keys[0], 'size')})
+
+
+def _join_columns(op: Tuple[Any, ...]) -> List[str]:
+    _, right, on, _, columns, _ = op
+    if columns is not None:
+        return list(columns)
+    build = right.df if isinstance(right, JoinIndex) else right
+    keys = right.keys if isinstance(right, JoinIndex) else on
+    return [c for c in build.columns if c not in keys]
+
+
+def _join_outputs(op: Tuple[Any, ...]) -> List[str]:
+    columns = _join_columns(op)
+    return columns + [f"{c}_right" for c in columns]
+
+
+# ------------------------------------------------------------------- plan ----
+
+class _Plan:
+    """
+    An optimized query: what to read from the source and what to run per chunk.
+    """
+
+    def __init__(self, source, columns: Optional[List[str]], where: Optional[Tuple[str, List[Any]]],
+                 steps: List[Tuple[Any, ...]], fused: Optional[Expr],
+                 aggregate: Optional[Tuple[List[str], Dict[str, AggSpec]]]) -> None:
+        self.source = source
+        self.columns = columns
+        self.where = where
+        self.steps = steps
+        self.fused = fused
+        self.aggregate = aggregate
+        self._indexes: Dict[int, JoinIndex] = {}
+
+    def describe(self) -> str:
+        lines = [self.source.describe()]
+        lines.append(f"  read columns: {'*' if self.columns is None else ', '.join(self.columns)}")
+        if self.where is not None:
+            lines.append(f"  SQL WHERE {self.where[0]}  params={self.where[1]}")
+        for op in self.steps:
+            kind = op[0]
+            if kind == 'where':
+                lines.append(f"Filter {op[1]!r}")
+            elif kind == 'join':
+                table = f" table {op[1]}" if isinstance(op[1], str) else ''
+                lines.append(f"HashJoin({op[3]}){table} on {op[2]} -> {_join_columns(op)}")
+            elif kind == 'with_column':
+                lines.append(f"WithColumn {op[1]} = {op[2]!r}")
+            elif kind == 'rename':
+                lines.append(f"Rename {op[1]} -> {op[2]}")
+            elif kind == 'select':
+                lines.append(f"Select {op[1]}")
+        if self.aggregate is not None:
+            keys, specs = self.aggregate
+            fused = f" over rows where {self.fused!r}" if self.fused is not None else ''
+            lines.append(f"Aggregate by {keys}: {specs}{fused}")
+        return '\n'.join(lines)
+
+    def prepare(self) -> None:
+        """
+        Builds the join indexes (once per process).
+        """
+        for i, op in enumerate(self.steps):
+            if op[0] == 'join' and i not in self._indexes:
+                right, on = op[1], op[2]
+                self._indexes[i] = right if isinstance(right, JoinIndex) else JoinIndex(right, on)
+
+    def run_chunk(self, df: DataFrame) -> DataFrame | PartialAggregate:
+        """
+        Runs the per-chunk steps and, for aggregations, the fused aggregate.
+        """
+        for i, op in enumerate(self.steps):
+            kind = op[0]
+            if kind == 'where':
+                df = df.where(op[1])
+            elif kind == 'join':
+                _, _, on, how, columns, fill_value = op
+                df = join(df, self._indexes[i], on, how, columns=columns, fill_value=fill_value)
+            elif kind == 'with_column':
+                df = df.with_column(op[1], op[2])
+            elif kind == 'rename':
+                df = _renamed(df, op[1], op[2])
+            elif kind == 'select':
+                df = DataFrame._from_column_objects({c: df[c] for c in op[1]}, len(df))
+        if self.aggregate is None:
+            return df
+        keys, specs = self.aggregate
+        rows = self.fused.indices(df) if self.fused is not None else None
+        return GroupBy(df, keys, rows).partial(**specs)
+
+    def combine(self, results: Iterable[DataFrame | PartialAggregate]) -> DataFrame | PartialAggregate:
+        if self.aggregate is not None:
+            partial = PartialAggregate(*self.aggregate)
+            for result in results:
+                partial.merge(result)
+            return partial
+        combined = DataFrame()
+        for result in results:
+            combined.vconcat(result)
+        return combined
+
+    def resolve_tables(self, source=None) -> None:
+        """
+        Reads the tables joined by name (once, before any worker is started)
+        through `source` (defaults to this plan's source).
+
+        Raises:
+            ValueError: If a table is joined by name over a source that is not a table.
+        """
+        source = source if source is not None else self.source
+        for i, op in enumerate(self.steps):
+            if op[0] == 'join' and isinstance(op[1], str):
+                if not hasattr(source, 'read_table'):
+                    raise ValueError(f"Table '{op[1]}' can only be joined by name in a query over a database table.")
+                _, table, on, how, columns, fill_value = op
+                right = source.read_table(table, list(on) + [c for c in columns if c not in on])
+                self.steps[i] = ('join', right, on, how, columns, fill_value)
+
+    def execute(self, processes: int) -> DataFrame | PartialAggregate:
+        self.resolve_tables()
+        chunks = self.source.chunks(self.columns, self.where)
+        head = list(islice(chunks, 2))
+        if processes <= 1 or len(head) <= 1:
+            self.prepare()
+            return self.combine(self.run_chunk(chunk) for chunk in _chain(head, chunks))
+        return self.combine(self._run_pooled(_chain(head, chunks), processes))
+
+    def _run_pooled(self, chunks: Iterator[DataFrame], processes: int) -> Iterator[DataFrame | PartialAggregate]:
+        """
+        Runs the chunks on a worker pool as the source yields them.
+
+        Each chunk goes to its own shared memory segment, released once its
+        result is back; at most `processes * IN_FLIGHT_PER_PROCESS` chunks are
+        in flight, so the next chunk is only read when a worker has caught up.
+        Results come back in source order. Each worker receives the plan in the
+        pool initializer and builds the join indexes once per process.
+        """
+        window = processes * IN_FLIGHT_PER_PROCESS
+        in_flight: deque = deque()
+        # The segments are created after the fork: start the resource tracker
+        # first so the workers share it, instead of each starting its own that
+        # later reports the parent's unlinked segments as leaked.
+        resource_tracker.ensure_running()
+        try:
+            with Pool(processes=processes, initializer=_init_worker_plan, initargs=(self, worker_reports())) as pool:
+                for chunk in chunks:
+                    shared = SharedDataFrame(chunk)
+                    descriptor = SharedChunk(shared.name, 0, len(shared))
+                    in_flight.append((shared, pool.apply_async(_run_worker_chunk, (descriptor,))))
+                    if len(in_flight) >= window:
+                        yield _take_result(in_flight)
+                while in_flight:
+                    yield _take_result(in_flight)
+        finally:
+            for shared, _ in in_flight:
+                shared.close()
+
+
+class _FanOutPlan(_Plan):
+    """
+    A plan whose per-chunk result feeds several branch plans (see `Query.fan_out`).
+    """
+
+    def __init__(self, base: _Plan, branches: Dict[str, _Plan]) -> None:
+        super().__init__(base.source, base.columns, base.where, base.steps, base.fused, None)
+        self.branches = branches
+
+    def describe(self) -> str:
+        lines = [super().describe()]
+        for name, plan in self.branches.items():
+            lines.append(f"Branch {name}:")
+            lines.extend(f"  {line}" for line in plan.describe().splitlines()[2:])
+        return '\n'.join(lines)
+
+    def resolve_tables(self, source=None) -> None:
+        # Branches run over in-memory chunks: their joins by name read through the base source
+        super().resolve_tables(source)
+        for plan in self.branches.values():
+            plan.resolve_tables(self.source)
+
+    def prepare(self) -> None:
+        super().prepare()
+        for plan in self.branches.values():
+            plan.prepare()
+
+    def run_chunk(self, df: DataFrame) -> Dict[str, PartialAggregate]:
+        df = super().run_chunk(df)
+        return {name: plan.run_chunk(df) for name, plan in self.branches.items()}
+
+    def combine(self, results: Iterable[Dict[str, PartialAggregate]]) -> Dict[str, PartialAggregate]:
+        partials = {name: PartialAggregate(*plan.aggregate) for name, plan in self.branches.items()}
+        for result in results:
+            for name, partial in result.items():
+                partials[name].merge(partial)
+        return partials
+
+
+def _chain(head: List[DataFrame], rest: Iterator[DataFrame]) -> Iterator[DataFrame]:
+    while head:
+        yield head.pop(0)   # not kept alive for the rest of the run
+    yield from rest
+
+
+def _take_result(in_flight: deque) -> DataFrame | PartialAggregate:
+    shared, result = in_flight.popleft()
+    try:
+        return result.get()
+    finally:
+        shared.close()
+
+
+def _renamed(df: DataFrame, old_name: str, new_name: str) -> DataFrame:
+    data = {(new_name if c == old_name else c): df[c] for c in df.columns}
+    return DataFrame._from_column_objects(data, len(df))
+
+
+_WORKER_PLAN: Optional[_Plan] = None
+
+
+def _init_worker_plan(plan: _Plan, reports=None) -> None:
+    global _WORKER_PLAN
+    init_worker_reports(reports)
+    _WORKER_PLAN = plan
+    plan.prepare()
+
+
+def _run_worker_chunk(chunk: SharedChunk) -> DataFrame | PartialAggregate:
+    result = _WORKER_PLAN.run_chunk(as_dataframe(chunk))
+    report_worker_memory()
+    return result
@@ -0,0 +1,198 @@
+import pickle
+import struct
+from multiprocessing import shared_memory
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from DataFrame import DataFrame
+
+# Segment layout: the length of the pickled frame and the number of buffers,
+# one `(offset, length)` pair per buffer, the pickled frame (with its buffers
+# out-of-band), then the buffers, each on an 8-byte boundary.
+_HEADER = struct.Struct('<qq')
+_SPAN = struct.Struct('<qq')
+_ALIGN = 8
+
+
+def _align(n: int) -> int:
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+class SharedChunk(NamedTuple):
+    """
+    A picklable descriptor of the rows `[start, stop)` of a `SharedDataFrame`.
+
+    This is all that is sent to a worker; the worker maps the segment and
+    reads the rows in place.
+    """
+    name: str
+    start: int
+    stop: int
+
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+    def to_dataframe(self) -> DataFrame:
+        """
+        Returns the described rows as a zero-copy view over the shared segment.
+        """
+        return _attach(self.name).slice(self.start, self.stop)
+
+
+class SharedDataFrame:
+    """
+    A DataFrame whose column buffers live in one `multiprocessing.shared_memory`
+    segment, so worker processes can scan row ranges of it without the rows
+    ever being pickled or copied.
+
+    The creating (parent) process owns the segment: it is unlinked by `close`,
+    which runs when the `with` block exits, whether the stage finished or a
+    worker failed.
+
+    Example:
+        ```
+        with SharedDataFrame(df) as shared, Pool(4) as pool:
+            results = pool.map(work, shared.chunks(5_000))  # work(chunk): chunk.to_dataframe()
+        ```
+
+    Attributes:
+        name (str): Name of the shared memory segment.
+        num_rows (int): Number of rows in the shared DataFrame.
+        nbytes (int): Size of the segment in bytes.
+    """
+
+    def __init__(self, df: DataFrame) -> None:
+        """
+        Copies the column buffers of `df` into a new shared memory segment.
+
+        Numeric, string and category columns are placed in the segment as raw
+        buffers (see `Column.__reduce_ex__`); `object` columns are pickled
+        into the segment along with the column metadata.
+
+        Args:
+            df (DataFrame): The DataFrame to share.
+
+        Raises:
+            TypeError: If `df` is not a DataFrame.
+        """
+        if not isinstance(df, DataFrame):
+            raise TypeError("SharedDataFrame can only share a DataFrame object.")
+        buffers: List[pickle.PickleBuffer] = []
+        frame = pickle.dumps(df, protocol=5, buffer_callback=buffers.append)
+        raws = [b.raw() for b in buffers]
+
+        frame_start = _HEADER.size + _SPAN.size * len(raws)
+        spans: List[Tuple[int, int]] = []
+        offset = _align(frame_start + len(frame))
+        for raw in raws:
+            spans.append((offset, raw.nbytes))
+            offset = _align(offset + raw.nbytes)
+
+        self.num_rows = len(df)
+        self._shm: Optional[shared_memory.SharedMemory] = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        try:
+            buf = self._shm.buf
+            _HEADER.pack_into(buf, 0, len(frame), len(raws))
+            for i, span in enumerate(spans):
+                _SPAN.pack_into(buf, _HEADER.size + i * _SPAN.size, *span)
+            buf[frame_start:frame_start + len(frame)] = frame
+            for (start, length), raw in zip(spans, raws):
+                buf[start:start + length] = raw
+            del buf
+        except BaseException:
+            self.close()
+            raise
+        finally:
+            for raw in raws:
+                raw.release()
+        self.name = self._shm.name
+        self.nbytes = self._shm.size
+
+    @classmethod
+    def from_frames(cls, frames: List[DataFrame]) -> 'SharedDataFrame':
+        """
+        Concatenates `frames` (e.g. the chunks of an incremental extraction)
+        into a single shared DataFrame.
+        """
+        combined = DataFrame()
+        for frame in frames:
+            combined.vconcat(frame)
+        return cls(combined)
+
+    def __len__(self) -> int:
+        return self.num_rows
+
+    def __repr__(self) -> str:
+        return f"SharedDataFrame(name={self.name!r}, rows={self.num_rows}, bytes={self.nbytes})"
+
+    def __enter__(self) -> 'SharedDataFrame':
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def chunks(self, size: int) -> Iterator[SharedChunk]:
+        """
+        Yields descriptors covering the rows in consecutive ranges of `size` rows.
+
+        Raises:
+            ValueError: If `size` is not positive.
+        """
+        if size <= 0:
+            raise ValueError("Chunk size must be a positive integer.")
+        for start in range(0, self.num_rows, size):
+            yield SharedChunk(self.name, start, min(start + size, self.num_rows))
+
+    def close(self) -> None:
+        """
+        Releases and unlinks the segment. Safe to call more than once.
+        """
+        if self._shm is None:
+            return
+        shm, self._shm = self._shm, None
+        shm.close()
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+# Segments attached by this (worker) process, with the DataFrame mapped over
+# them. Attaching a new segment detaches the previous ones, so a long-lived
+# worker holds at most one stage's table at a time.
+_ATTACHED: Dict[str, Tuple[shared_memory.SharedMemory, DataFrame]] = {}
+
+
+def _attach(name: str) -> DataFrame:
+    attached = _ATTACHED.get(name)
+    if attached is not None:
+        return attached[1]
+    _detach_all()
+
+    shm = shared_memory.SharedMemory(name=name)
+    buf = shm.buf
+    frame_size, num_buffers = _HEADER.unpack_from(buf, 0)
+    spans = [_SPAN.unpack_from(buf, _HEADER.size + i * _SPAN.size) for i in range(num_buffers)]
+    frame_start = _HEADER.size + _SPAN.size * num_buffers
+    frame = buf[frame_start:frame_start + frame_size]
+    df = pickle.loads(frame, buffers=[buf[start:start + length] for start, length in spans])
+    frame.release()
+    _ATTACHED[name] = (shm, df)
+    return df
+
+
+def _detach_all() -> None:
+    while _ATTACHED:
+        _, (shm, df) = _ATTACHED.popitem()
+        del df
+        try:
+            shm.close()
+        except BufferError:
+            # A view over the segment is still alive; the mapping goes away with it.
+            pass
+
+
+def as_dataframe(chunk: DataFrame | SharedChunk) -> DataFrame:
+    """
+    Returns `chunk` itself if it is a DataFrame, or the rows it describes.
+    """
+    return chunk if isinstance(chunk, DataFrame) else chunk.to_dataframe()
@@ -0,0 +1,60 @@
+"""
+Confere se os backends 'python' e 'sql' dão o mesmo resultado.
+
+Roda as agregações das etapas 2 e 3 (receita por dia/mês/ano e views por
+gênero) sobre a tabela inteira, sem consumidor (nenhum offset é lido ou
+preparado), uma vez em cada backend, e compara as linhas. Sai com código 1
+se alguma diferir.
+
+Uso: python src/check_backends.py [caminho do banco] [processos]
+"""
+import math
+import sys
+
+from DataRepository import DataRepository
+from Expression import col
+from Handler import RevenueAnalyzer
+from Pipeline import GENRE_VIEWS_SPEC
+
+def _queries(repo: DataRepository) -> dict:
+    queries = {}
+    for unit in ("day", "month", "year"):
+        queries[f"revenue_by_{unit}"] = (repo.scan("Revenue")
+                                             .with_column(unit, col("date").bucket(unit))
+                                             .groupby(unit).agg(**RevenueAnalyzer.REVENUE_SPEC))
+    queries["genre_views"] = (repo.scan("ViewHistory")
+                                  .join("Content", "content_id", columns=["content_genre"])
+                                  .rename("content_genre", "genre")
+                                  .groupby("genre").agg(**GENRE_VIEWS_SPEC))
+    return queries
+
+def _rows(df) -> dict:
+    """{chave: valores}; a ordem dos grupos não importa."""
+    columns = [df[c] for c in df.columns]
+    return {row[0]: row[1:] for row in zip(*columns)}
+
+def _same(a, b) -> bool:
+    if isinstance(a, float) or isinstance(b, float):
+        return a is not None and b is not None and math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-6)
+    return a == b
+
+def main(db_path: str = None, processes: int = 1) -> int:
+    repo = DataRepository(db_path)
+    failures = 0
+    for name, query in _queries(repo).items():
+        python = _rows(query.collect(processes=processes, backend="python"))
+        sql = _rows(query.collect(backend="sql"))
+        diffs = [key for key in python.keys() | sql.keys()
+                 if key not in python or key not in sql
+                 or not all(_same(a, b) for a, b in zip(python[key], sql[key]))]
+        if diffs:
+            failures += 1
+            print(f" {name}: {len(diffs)} grupo(s) diferentes, ex.: {diffs[0]!r} "
+                  f"python={python.get(diffs[0])} sql={sql.get(diffs[0])}")
+        else:
+            print(f" {name}: {len(python)} grupo(s) iguais nos dois backends")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1] if len(sys.argv) > 1 else None,
+                  int(sys.argv[2]) if len(sys.argv) > 2 else 1))
@@ -32,11 +32,15 @@ def main():
     # 3. Remove banco de dados
     remover_arquivo("streaming_mock.db")
 
-    # 5. Remove marcadores de progresso (se existirem)
+    # 4. Remove os snapshots das tabelas de dimensão
+    remover_pasta(os.path.join("src", "markers", "dimensions"))
+
+    # 5. Remove marcadores de progresso e o banco de offsets, que guarda também
+    #    o estado acumulado das etapas (se existirem)
     marcador_dir = os.path.join(ROOT_DIR, "src", "markers")
     if os.path.exists(marcador_dir):
         for f in os.listdir(marcador_dir):
-            if f.endswith(".marker"):
+            if f.endswith((".marker", ".sqlite")):
                 remover_arquivo(os.path.join("src", "markers", f))
     else:
         print(" Pasta de marcadores não encontrada.")
@@ -1,28 +1,219 @@
 # utils/timing.py
 from time import perf_counter
 from datetime import datetime
-import csv, os
+import csv, os, sys, threading, tracemalloc, multiprocessing
+try:
+    import resource
+except ImportError:     # Windows
+    resource = None
 
 _METRIC_FILE = os.path.join(
     os.path.dirname(__file__), "..", "transformed_data", "stage_metrics.csv"
 )
 os.makedirs(os.path.dirname(_METRIC_FILE), exist_ok=True)
 
-def log_stage(stage: str, procs: int, seconds: float) -> None:
-    """Acrescenta uma linha no CSV de métricas."""
+# Colunas de stage_metrics.csv (o arquivo não tem cabeçalho; o dashboard usa estes nomes).
+# Linhas sem medição de memória (ex.: pipeline_total) só têm as 4 primeiras.
+STAGE_METRIC_FIELDS = ["start_time", "stage", "processes", "duration_sec",
+                       "parent_rss_mb", "parent_tracemalloc_mb",
+                       "workers", "worker_rss_mb", "worker_tracemalloc_mb"]
+
+def log_stage(stage: str, procs: int, seconds: float, memory: tuple = ()) -> None:
+    """Acrescenta uma linha no CSV de métricas; `memory` segue STAGE_METRIC_FIELDS[4:]."""
     with open(_METRIC_FILE, "a", newline="") as f:
         csv.writer(f).writerow(
-            [datetime.now().isoformat(timespec="seconds"), stage, procs, round(seconds, 3)]
+            [datetime.now().isoformat(timespec="seconds"), stage, procs, round(seconds, 3), *memory]
         )
 
 class StageTimer:
-    """Context‑manager para medir e já registrar o tempo."""
+    """
+    Context‑manager para medir e já registrar o tempo e a memória do estágio.
+
+    Registra o pico de RSS do processo‑pai durante o estágio e o maior pico
+    entre os workers (que o reportam via `report_worker_memory`). Com
+    MEM_TRACE=1 também registra o pico do tracemalloc (alocações Python).
+    """
     def __init__(self, stage: str, procs: int):
         self.stage = stage
         self.procs = procs
     def __enter__(self):
-        from time import perf_counter
+        global _WORKER_REPORTS
+        self._previous = _WORKER_REPORTS
+        self._workers = _WorkerMemory()
+        _WORKER_REPORTS = self._workers.queue   # repassada aos workers (ver init_worker_reports)
+        _reset_peak_rss()
+        self._tracing = MEM_TRACE and not tracemalloc.is_tracing()
+        if self._tracing:
+            tracemalloc.start()
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
         self._t0 = perf_counter()
+        return self
     def __exit__(self, *exc):
+        global _WORKER_REPORTS
         dt = perf_counter() - self._t0
-        log_stage(self.stage, self.procs, dt)
+        parent = (_peak_rss_kb(), tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None)
+        if self._tracing:
+            tracemalloc.stop()
+        _WORKER_REPORTS = self._previous
+        workers = self._workers.close()
+
+        log_stage(self.stage, self.procs, dt, (
+            _mb(_kb_to_bytes(parent[0])), _mb(parent[1]), len(workers),
+            _mb(max((w[0] * 1024 for w in workers.values() if w[0] is not None), default=None)),
+            _mb(max((w[1] for w in workers.values() if w[1] is not None), default=None)),
+        ))
+        _log_memory(self.stage, os.getpid(), "parent", *parent)
+        for pid, (rss_kb, traced) in workers.items():
+            _log_memory(self.stage, pid, "worker", rss_kb, traced)
+
+# ---------------------------------------------------------------- memória ----
+# O pico de RSS vem do VmHWM do Linux, zerado no início de cada estágio; nos
+# workers (processos novos via fork) ele já começa do zero. O tracemalloc deixa
+# as alocações bem mais lentas, por isso só liga com MEM_TRACE=1.
+_MEMORY_METRIC_FILE = os.path.join(os.path.dirname(_METRIC_FILE), "memory_metrics.csv")
+MEM_TRACE = os.getenv("MEM_TRACE", "0") == "1"
+_WORKER_REPORTS = None
+
+def _mb(nbytes) -> float | str:
+    return "" if nbytes is None else round(nbytes / 2**20, 1)
+
+def _kb_to_bytes(kb):
+    return None if kb is None else kb * 1024
+
+def _reset_peak_rss() -> None:
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass    # fora do Linux o pico vale desde o início do processo
+
+def _peak_rss_kb() -> int | None:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    if resource is None:
+        return None     # sem /proc nem getrusage (Windows): pico não medido
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+def _reset_tracemalloc_in_child() -> None:
+    # O worker herda o estado do tracemalloc do pai; o pico passa a contar do fork.
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_tracemalloc_in_child)
+
+def worker_reports():
+    """Fila do StageTimer em andamento (None fora de um estágio), para repassar aos workers."""
+    return _WORKER_REPORTS
+
+def init_worker_reports(queue) -> None:
+    """
+    Initializer dos workers: passa a reportar em `queue` (de `worker_reports()`).
+    Com spawn (Windows, macOS) o global do pai não é herdado, então a fila tem
+    de chegar por aqui (initializer do Pool ou argumento do Process).
+    """
+    global _WORKER_REPORTS
+    _WORKER_REPORTS = queue
+
+def report_worker_memory() -> None:
+    """
+    Chamado pelos workers ao fim de cada tarefa: envia (pid, pico de RSS em kB,
+    pico do tracemalloc) ao StageTimer do estágio em andamento. Sem estágio, não faz nada.
+    """
+    if _WORKER_REPORTS is None:
+        return
+    traced = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None
+    _WORKER_REPORTS.put((os.getpid(), _peak_rss_kb(), traced))
+
+class _WorkerMemory:
+    """Recebe os picos reportados pelos workers numa thread do pai, para o pipe nunca encher."""
+    def __init__(self):
+        self.queue = multiprocessing.SimpleQueue()
+        self.peaks = {}
+        self._thread = threading.Thread(target=self._collect, daemon=True)
+        self._thread.start()
+    def _collect(self):
+        while True:
+            report = self.queue.get()
+            if report is None:
+                return
+            # Os picos só crescem: o último valor de cada worker é o maior.
+            pid, rss_kb, traced = report
+            self.peaks[pid] = (rss_kb, traced)
+    def close(self) -> dict:
+        """Encerra a coleta (os workers do estágio já terminaram) e devolve {pid: (RSS kB, tracemalloc)}."""
+        self.queue.put(None)
+        self._thread.join()
+        self.queue.close()
+        return self.peaks
+
+def _log_memory(stage: str, pid: int, role: str, rss_kb: int, traced) -> None:
+    """Grava [ts, estágio, pid, papel, pico RSS MB, pico tracemalloc MB] em memory_metrics.csv."""
+    with open(_MEMORY_METRIC_FILE, "a", newline="") as f:
+        csv.writer(f).writerow([
+            datetime.now().isoformat(timespec="seconds"), stage, pid, role,
+            _mb(_kb_to_bytes(rss_kb)), _mb(traced),
+        ])
+
+# ---------------------------------------------------------------- IPC ----
+# Bytes e tempo de serialização dos chunks enviados aos workers. Medir exige
+# serializar cada chunk uma segunda vez, por isso só liga com IPC_METRICS=1.
+_IPC_METRIC_FILE = os.path.join(os.path.dirname(_METRIC_FILE), "ipc_metrics.csv")
+IPC_METRICS = os.getenv("IPC_METRICS", "0") == "1"
+
+def pickle_stats(obj) -> tuple:
+    """Retorna (bytes, segundos) para serializar `obj` como o multiprocessing faz."""
+    from multiprocessing.reduction import ForkingPickler
+    t0 = perf_counter()
+    payload = ForkingPickler.dumps(obj)
+    return len(payload), perf_counter() - t0
+
+class IpcMeter:
+    """Acumula bytes/tempo de serialização dos objetos enviados aos workers de um estágio."""
+    def __init__(self, stage: str, procs: int, enabled: bool = IPC_METRICS):
+        self.stage = stage
+        self.procs = procs
+        self.enabled = enabled
+        self.chunks = 0
+        self.nbytes = 0
+        self.seconds = 0.0
+
+    def measure(self, obj):
+        if self.enabled:
+            nbytes, seconds = pickle_stats(obj)
+            self.chunks += 1
+            self.nbytes += nbytes
+            self.seconds += seconds
+        return obj
+
+    def wrap(self, iterable):
+        """Mede cada item de `iterable` (ex.: os chunks passados a `imap_unordered`)."""
+        return map(self.measure, iterable) if self.enabled else iterable
+
+    def wrap_queue(self, queue):
+        """Mede cada objeto colocado em `queue` via `put`."""
+        return _MeteredQueue(queue, self) if self.enabled else queue
+
+    def log(self) -> None:
+        """Grava [ts, estágio, procs, chunks, bytes/chunk, ms/chunk] em ipc_metrics.csv."""
+        if not self.enabled or not self.chunks:
+            return
+        with open(_IPC_METRIC_FILE, "a", newline="") as f:
+            csv.writer(f).writerow([
+                datetime.now().isoformat(timespec="seconds"), self.stage, self.procs, self.chunks,
+                self.nbytes // self.chunks, round(1000 * self.seconds / self.chunks, 3),
+            ])
+
+class _MeteredQueue:
+    def __init__(self, queue, meter: IpcMeter):
+        self._queue = queue
+        self._meter = meter
+    def put(self, obj, *args, **kwargs):
+        self._queue.put(self._meter.measure(obj), *args, **kwargs)
@@ -0,0 +1,23 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+# The modules live flat in src/ and import each other by name (`from DataFrame import DataFrame`)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from DataRepository import DataRepository
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """A DataRepository over a small ViewHistory table, with offsets and snapshots under `tmp_path`."""
+    db_path = tmp_path / 'views.db'
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE ViewHistory (user_id TEXT, content_id TEXT, watched INTEGER)")
+    conn.executemany("INSERT INTO ViewHistory VALUES (?, ?, ?)",
+                     [('u1', 'c1', 10), ('u2', 'c1', 20), ('u1', 'c2', 30), ('u3', 'c3', 40)])
+    conn.commit()
+    conn.close()
+    return DataRepository(str(db_path), str(tmp_path / 'offsets.sqlite'), str(tmp_path / 'dimensions'))
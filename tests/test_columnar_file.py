@@ -0,0 +1,59 @@
+import pytest
+
+from ColumnarFile import dumps_columnar, loads_columnar, read_columnar, read_schema, write_columnar
+from DataFrame import DataFrame
+
+
+def _frame():
+    df = DataFrame.from_columns({
+        'id': [1, 2, 3],
+        'price': [9.5, 0.0, -1.25],
+        'title': ['a', 'ção', ''],
+        'genre': ['drama', 'drama', 'sci-fi, drama'],
+        'extra': [None, 'x', 7],
+        'seen_at': ['2024-01-01T10:00:00', None, '2024-02-29'],
+    }, dtypes={'id': 'int64', 'price': 'float64', 'title': 'string', 'genre': 'category', 'extra': 'object'})
+    return df.parse_timestamps(['seen_at'])
+
+
+def _assert_same(actual, expected):
+    assert actual.columns == expected.columns
+    assert actual.dtypes == expected.dtypes
+    for name in expected.columns:
+        assert list(actual[name]) == list(expected[name]), name
+
+
+@pytest.mark.parametrize('index', [True, False])
+def test_file_round_trip(tmp_path, index):
+    df = _frame()
+    path = str(tmp_path / 'frame.dfc')
+    write_columnar(df, path, index=index)
+    _assert_same(read_columnar(path), df)
+    _assert_same(read_columnar(path, copy=True), df)
+
+
+def test_file_round_trip_of_selected_columns_and_metadata(tmp_path):
+    df = _frame()
+    path = str(tmp_path / 'frame.dfc')
+    write_columnar(df, path, metadata={'full_read_at': 1.5})
+    selected = read_columnar(path, columns=['genre', 'id'])
+    assert selected.columns == ['genre', 'id']
+    assert list(selected['genre']) == list(df['genre'])
+    schema = read_schema(path)
+    assert schema['num_rows'] == 3
+    assert schema['metadata'] == {'full_read_at': 1.5}
+
+
+def test_bytes_round_trip():
+    df = _frame()
+    _assert_same(loads_columnar(dumps_columnar(df)), df)
+    _assert_same(loads_columnar(dumps_columnar(DataFrame(columns=['a', 'b']))), DataFrame(columns=['a', 'b']))
+
+
+def test_rejects_other_formats(tmp_path):
+    path = tmp_path / 'frame.csv'
+    path.write_text('id,title\n1,a\n')
+    with pytest.raises(ValueError):
+        read_columnar(str(path))
+    with pytest.raises(ValueError):
+        loads_columnar(b'not a columnar frame')
@@ -0,0 +1,51 @@
+import pytest
+
+from DataFrame import DataFrame
+from GroupBy import GroupBy, PartialAggregate
+
+SPECS = {'n': ('v', 'count'), 'total': ('v', 'sum'), 'low': ('v', 'min'), 'high': ('v', 'max'),
+         'avg': ('v', 'mean')}
+
+
+def _frame():
+    return DataFrame.from_columns({
+        'g': ['a', 'b', 'a', 'c', 'b', 'a', 'c', 'a'],
+        'v': [1.5, 2.0, None, 4.0, -1.0, 6.0, 7.5, 3.0],
+    }, dtypes={'v': 'object'})
+
+
+def _rows(df):
+    return sorted(zip(*(df[c] for c in df.columns)))
+
+
+def test_merged_partials_match_single_pass():
+    df = _frame()
+    expected = GroupBy(df, 'g').agg(**SPECS)
+    partials = [GroupBy(df.slice(start, start + 3), 'g').partial(**SPECS) for start in range(0, len(df), 3)]
+    merged = PartialAggregate.combine(partials).to_dataframe()
+    assert merged.columns == expected.columns
+    assert _rows(merged) == _rows(expected)
+
+
+def test_merge_order_does_not_change_the_result():
+    df = _frame()
+    first = GroupBy(df.slice(0, 5), 'g').partial(**SPECS)
+    second = GroupBy(df.slice(5, len(df)), 'g').partial(**SPECS)
+    forward = PartialAggregate.combine([first, second]).to_dataframe()
+    backward = PartialAggregate.combine([second, first]).to_dataframe()
+    assert _rows(forward) == _rows(backward)
+
+
+def test_state_rebuilt_from_dataframe_merges_like_the_partial():
+    df = _frame()
+    specs = {'total': ('v', 'sum'), 'n': ('v', 'size')}
+    saved = GroupBy(df.slice(0, 4), 'g').partial(**specs).to_dataframe()
+    rebuilt = PartialAggregate.from_dataframe(saved, ['g'], specs)
+    rebuilt.merge(GroupBy(df.slice(4, len(df)), 'g').partial(**specs))
+    assert _rows(rebuilt.to_dataframe()) == _rows(GroupBy(df, 'g').agg(**specs))
+
+
+def test_merge_rejects_different_specs():
+    df = _frame()
+    with pytest.raises(ValueError):
+        GroupBy(df, 'g').partial(total=('v', 'sum')).merge(GroupBy(df, 'g').partial(n=('v', 'count')))
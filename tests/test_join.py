@@ -0,0 +1,44 @@
+from DataFrame import DataFrame
+from Join import JoinIndex, join
+
+
+def _left():
+    return DataFrame.from_columns({'k': ['a', 'b', 'a', 'z'], 'x': [1, 2, 3, 4]})
+
+
+def _right():
+    # 'a' appears twice on the build side, 'z' not at all
+    return DataFrame.from_columns({'k': ['a', 'b', 'a', 'c'], 'y': ['a1', 'b1', 'a2', 'c1']})
+
+
+def _rows(df):
+    return sorted(zip(*(df[c] for c in df.columns)), key=repr)
+
+
+def test_inner_join_with_duplicate_keys_pairs_every_match():
+    result = join(_left(), _right(), 'k')
+    assert result.columns == ['k', 'x', 'y']
+    assert _rows(result) == sorted([('a', 1, 'a1'), ('a', 1, 'a2'), ('b', 2, 'b1'),
+                                    ('a', 3, 'a1'), ('a', 3, 'a2')], key=repr)
+
+
+def test_left_join_with_duplicate_keys_keeps_unmatched_rows():
+    result = join(_left(), _right(), 'k', how='left', fill_value='-')
+    assert _rows(result) == sorted([('a', 1, 'a1'), ('a', 1, 'a2'), ('b', 2, 'b1'),
+                                    ('a', 3, 'a1'), ('a', 3, 'a2'), ('z', 4, '-')], key=repr)
+
+
+def test_semi_join_with_duplicate_keys_keeps_each_left_row_once():
+    result = join(_left(), _right(), 'k', how='semi')
+    assert result.columns == ['k', 'x']
+    assert list(result['x']) == [1, 2, 3]
+
+
+def test_prebuilt_index_and_category_keys_give_the_same_join():
+    index = JoinIndex(_right(), 'k')
+    assert not index.unique
+    plain = join(_left(), index, how='left')
+    left = _left().categorize(['k'])
+    assert left.dtypes['k'] == 'category'
+    categorized = join(left, index, how='left')
+    assert _rows(plain) == _rows(categorized)
@@ -0,0 +1,54 @@
+from DataFrame import DataFrame
+from OffsetStore import OffsetStore
+
+
+def _store(tmp_path):
+    return OffsetStore(str(tmp_path / 'markers' / 'offsets.sqlite'))
+
+
+def _state(total):
+    return DataFrame.from_columns({'genre': ['drama', 'comedy'], 'total': [total, 1]})
+
+
+def test_staged_offset_and_state_are_invisible_until_commit(tmp_path):
+    store = _store(tmp_path)
+    store.stage('genre', 'ViewHistory', '2024-01-02')
+    store.stage_state('genre', 'totals', _state(5))
+    assert store.staged('genre', 'ViewHistory') == '2024-01-02'
+    assert store.get('genre', 'ViewHistory') is None
+    assert store.load_state('genre', 'totals') is None
+
+    assert store.commit('genre') == 2
+    assert store.staged('genre', 'ViewHistory') is None
+    assert store.get('genre', 'ViewHistory') == '2024-01-02'
+    assert list(store.load_state('genre', 'totals')['total']) == [5, 1]
+
+
+def test_commit_survives_a_new_store_and_keeps_value_types(tmp_path):
+    store = _store(tmp_path)
+    store.stage('revenue', 'Revenue', 42)
+    store.commit('revenue')
+    store.stage('revenue', 'Revenue', 50)
+    store.stage_state('revenue', 'totals', _state(9))
+    store.commit('revenue')
+
+    reopened = _store(tmp_path)
+    assert reopened.get('revenue', 'Revenue') == 50
+    assert list(reopened.load_state('revenue', 'totals')['total']) == [9, 1]
+
+
+def test_discard_drops_only_that_consumer(tmp_path):
+    store = _store(tmp_path)
+    store.stage('genre', 'ViewHistory', 10)
+    store.commit('genre')
+    store.stage('genre', 'ViewHistory', 20)
+    store.stage_state('genre', 'totals', _state(7))
+    store.stage('revenue', 'Revenue', 3)
+
+    store.discard('genre')
+    assert store.commit('genre') == 0
+    assert store.get('genre', 'ViewHistory') == 10
+    assert store.load_state('genre', 'totals') is None
+    assert store.commit('revenue') == 1
+    assert store.get('revenue', 'Revenue') == 3
+    assert store.get('genre', 'Missing', default=0) == 0
@@ -0,0 +1,50 @@
+import pytest
+
+from DataFrame import DataFrame
+from Expression import col
+from Query import Query
+
+
+def _frame():
+    return DataFrame.from_columns({'a': [1, 2, 3, 4], 'g': ['x', 'y', 'x', 'y'], 'v': [10, 20, 30, 40]})
+
+
+def test_filter_on_renamed_column_runs_after_the_rename():
+    query = Query.from_dataframe(_frame(), chunk_size=2).rename('a', 'b').where(col('b') > 2)
+    plan = query.explain().splitlines()
+    assert plan.index("Rename a -> b") < plan.index("Filter (col('b') > lit(2))")
+    assert list(query.collect()['b']) == [3, 4]
+
+
+def test_filter_on_old_name_after_rename_fails_like_a_dataframe():
+    query = Query.from_dataframe(_frame()).rename('a', 'b').where(col('a') > 2)
+    with pytest.raises(KeyError):
+        query.collect()
+
+
+def test_filter_on_dropped_column_fails_like_a_dataframe():
+    query = Query.from_dataframe(_frame()).select('g', 'v').where(col('a') > 2)
+    with pytest.raises(KeyError):
+        query.collect()
+
+
+def test_filter_on_untouched_column_moves_before_rename():
+    query = Query.from_dataframe(_frame(), chunk_size=3).rename('a', 'b').where(col('g') == 'x')
+    plan = query.explain().splitlines()
+    assert plan.index("Filter (col('g') == lit('x'))") < plan.index("Rename a -> b")
+    assert list(query.collect()['b']) == [1, 3]
+
+
+def test_sql_pushdown_stops_at_rename_and_select(repo):
+    renamed = repo.scan('ViewHistory').rename('watched', 'seconds') \
+        .where(col('seconds') > 15).where(col('user_id') == 'u1')
+    plan = renamed.explain()
+    assert 'SQL WHERE ("user_id" = ?)' in plan
+    assert "Filter (col('seconds') > lit(15))" in plan
+    assert list(renamed.collect()['seconds']) == [30]
+
+    selected = repo.scan('ViewHistory').select('user_id', 'watched').where(col('watched') > 15)
+    plan = selected.explain()
+    assert 'read columns: user_id, watched' in plan
+    assert 'SQL WHERE ("watched" > ?)' in plan
+    assert sorted(selected.collect()['watched']) == [20, 30, 40]